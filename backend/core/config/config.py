@@ -13,6 +13,35 @@ class Settings:
     
     # AI
     GEMINI_API_KEY: Optional[str] = os.getenv('GEMINI_API_KEY')
+    # Provider router: comma-separated "provider[:model]" backends for answers and for
+    # reformulation / digest analysis (defaults to the answer backends). When AI_PROVIDERS
+    # is empty the single AI_PROVIDER is used without routing
+    AI_PROVIDERS: str = os.getenv('AI_PROVIDERS', '')
+    AI_FAST_PROVIDERS: str = os.getenv('AI_FAST_PROVIDERS', '')
+    # Seconds to wait for a backend's first chunk before failing over to the next one
+    AI_FIRST_CHUNK_TIMEOUT_SECONDS: float = float(os.getenv('AI_FIRST_CHUNK_TIMEOUT_SECONDS', '15'))
+    AI_RATE_LIMIT_COOLDOWN_SECONDS: float = float(os.getenv('AI_RATE_LIMIT_COOLDOWN_SECONDS', '30'))
+    # Gemini context caching of the system prompt and answer instructions (the provider
+    # rejects heads under its minimum size; those are sent in full)
+    GEMINI_CONTEXT_CACHE_ENABLED: bool = os.getenv('GEMINI_CONTEXT_CACHE_ENABLED', 'true').lower() == 'true'
+    GEMINI_CONTEXT_CACHE_TTL_SECONDS: float = float(os.getenv('GEMINI_CONTEXT_CACHE_TTL_SECONDS', '3600'))
+    GEMINI_CONTEXT_CACHE_MIN_TOKENS: int = int(os.getenv('GEMINI_CONTEXT_CACHE_MIN_TOKENS', '1024'))
+    # Local question classifier that skips the reformulation call for clearly legal questions.
+    # Model trained with scripts/train-question-classifier.py (prior weights when missing);
+    # the threshold overrides the trained one
+    QUESTION_CLASSIFIER_MODEL_PATH: Optional[str] = os.getenv('QUESTION_CLASSIFIER_MODEL_PATH')
+    QUESTION_CLASSIFIER_THRESHOLD: Optional[float] = float(os.getenv('QUESTION_CLASSIFIER_THRESHOLD')) if os.getenv('QUESTION_CLASSIFIER_THRESHOLD') else None
+    # Tokens of retrieved norma text allowed in the answer prompt (lowest scoring chunks dropped first)
+    LEGAL_CONTEXT_TOKEN_BUDGET: int = int(os.getenv('LEGAL_CONTEXT_TOKEN_BUDGET', '6000'))
+    # Conversation history sent to the LLM: last N messages within a token budget; older turns
+    # are folded into a rolling summary stored on the conversation
+    HISTORY_MAX_MESSAGES: int = int(os.getenv('HISTORY_MAX_MESSAGES', '20'))
+    HISTORY_TOKEN_BUDGET: int = int(os.getenv('HISTORY_TOKEN_BUDGET', '4000'))
+    HISTORY_SUMMARY_ENABLED: bool = os.getenv('HISTORY_SUMMARY_ENABLED', 'true').lower() == 'true'
+    # Reformulation outputs cached by prompt hash (REFORMULATION_CACHE_ENABLED=false to bypass for evaluation)
+    REFORMULATION_CACHE_ENABLED: bool = os.getenv('REFORMULATION_CACHE_ENABLED', 'true').lower() == 'true'
+    REFORMULATION_CACHE_TTL_SECONDS: float = float(os.getenv('REFORMULATION_CACHE_TTL_SECONDS', '3600'))
+    REFORMULATION_CACHE_MAX_ENTRIES: int = int(os.getenv('REFORMULATION_CACHE_MAX_ENTRIES', '5000'))
     
     # Database
     DATABASE_URL: Optional[str] = os.getenv('DATABASE_URL')
@@ -20,10 +49,18 @@ class Settings:
     # Email
     RESEND_API_KEY: Optional[str] = os.getenv('RESEND_API_KEY')
     EMAIL_FROM: Optional[str] = os.getenv('EMAIL_FROM')
+    # Resend allows 2 requests/second per account (a batch request sends up to 100 emails)
+    EMAIL_REQUESTS_PER_SECOND: float = float(os.getenv('EMAIL_REQUESTS_PER_SECOND', '2'))
+    # Processes sharing that rate, each with its own limiter (0: the API plus JOB_WORKERS)
+    EMAIL_SENDER_PROCESSES: int = int(os.getenv('EMAIL_SENDER_PROCESSES', '0'))
+    EMAIL_MAX_CONCURRENCY: int = int(os.getenv('EMAIL_MAX_CONCURRENCY', '4'))
     
     # Feedback
     FEEDBACK_EMAILS: Optional[str] = os.getenv('FEEDBACK_EMAILS')
     
+    # Admins (comma-separated emails allowed to inspect every background job)
+    ADMIN_EMAILS: Optional[str] = os.getenv('ADMIN_EMAILS')
+    
     # Contact
     CONTACT_EMAILS: Optional[str] = os.getenv('CONTACT_EMAILS')
     
@@ -40,6 +77,45 @@ class Settings:
     VECTORIAL_API_HOST: str = os.getenv('VECTORIAL_API_HOST', 'http://localhost:8001')
     EMBEDDER_API_HOST: str = os.getenv('EMBEDDER_API_HOST', 'http://localhost:8001')
 
+    # Days between full rebuilds of the normas statistics summary; the daily delta only
+    # counts new normas, so estado changes and deletions show up after the next rebuild
+    NORMAS_STATS_FULL_REBUILD_DAYS: float = float(os.getenv('NORMAS_STATS_FULL_REBUILD_DAYS', '7'))
+
+    # Private directory for files the app writes and reads back (created with mode 0700)
+    APP_DATA_DIR: str = os.getenv('APP_DATA_DIR', os.path.join(os.path.expanduser('~'), '.simpla'))
+    # Normas relationship graph snapshot (defaults to APP_DATA_DIR/normas_graph.bin)
+    NORMAS_GRAPH_SNAPSHOT_PATH: Optional[str] = os.getenv('NORMAS_GRAPH_SNAPSHOT_PATH')
+
+    # Background jobs (worker processes started by the API; 0 to run them separately)
+    JOB_WORKERS: int = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv('JOB_POLL_INTERVAL_SECONDS', '2'))
+
+    # Batch LLM scheduler quota (digests); keep slightly under the provider limits
+    LLM_REQUESTS_PER_MINUTE: int = int(os.getenv('LLM_REQUESTS_PER_MINUTE', '14'))
+    LLM_TOKENS_PER_MINUTE: int = int(os.getenv('LLM_TOKENS_PER_MINUTE', '900000'))
+    LLM_MAX_CONCURRENCY: int = int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+    # Days an unused cached per-norma LLM result is kept
+    LLM_CACHE_RETENTION_DAYS: int = int(os.getenv('LLM_CACHE_RETENTION_DAYS', '180'))
+
+    # Usage counters for rate limiting: written to user_usage every flush interval.
+    # REDIS_URL shares the counters between API workers; either way counters are
+    # refreshed from the database after USAGE_COUNTER_TTL_SECONDS.
+    # A flush interval of 0 writes each message's usage through immediately
+    REDIS_URL: Optional[str] = os.getenv('REDIS_URL')
+    USAGE_FLUSH_INTERVAL_SECONDS: float = float(os.getenv('USAGE_FLUSH_INTERVAL_SECONDS', '5'))
+    USAGE_COUNTER_TTL_SECONDS: float = float(os.getenv('USAGE_COUNTER_TTL_SECONDS', '30'))
+
+    # Rate limit engine: 'fixed' (calendar hour/day buckets from the usage counters),
+    # 'sliding_window' or 'gcra' (rolling windows; use REDIS_URL with several API workers).
+    # GCRA lets up to RATE_LIMIT_BURST_RATIO of a limit through at once (1: the whole
+    # limit, then one unit back every window/limit; 0.5 gives a 20 messages/hour tier 10 in a row)
+    RATE_LIMIT_ENGINE: str = os.getenv('RATE_LIMIT_ENGINE', 'fixed')
+    RATE_LIMIT_BURST_RATIO: float = float(os.getenv('RATE_LIMIT_BURST_RATIO', '1.0'))
+
+    # Seconds a user's effective subscription limits / the tier definitions are cached
+    SUBSCRIPTION_LIMITS_TTL_SECONDS: float = float(os.getenv('SUBSCRIPTION_LIMITS_TTL_SECONDS', '60'))
+    SUBSCRIPTION_TIERS_TTL_SECONDS: float = float(os.getenv('SUBSCRIPTION_TIERS_TTL_SECONDS', '600'))
+
     # JWT Configuration
     JWT_SECRET_KEY: str = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
     JWT_ALGORITHM: str = os.getenv('JWT_ALGORITHM', 'HS256')
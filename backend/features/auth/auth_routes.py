@@ -1,5 +1,6 @@
 """New authentication router with JWT-based authentication."""
 
+import asyncio
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
@@ -12,6 +13,7 @@ from core.utils.db_logging import log_database_operation, log_database_error
 from core.database.base import get_db
 from features.auth.auth_models import User, RefreshToken
 from features.subscription.subscription_models import SubscriptionTier, UserSubscription
+from features.subscription.rate_limit_service import RateLimitService
 from features.auth.auth_utils import (
     get_password_hash, 
     verify_password, 
@@ -147,7 +149,7 @@ async def register(
         
         # Send verification email
         try:
-            send_verification_email(email=request.email, token=raw_token)
+            await asyncio.to_thread(send_verification_email, email=request.email, token=raw_token)
             logger.info(f"Verification email sent to: {user.email}")
         except Exception as e:
             logger.error(f"Failed to send verification email to {user.email}: {str(e)}")
@@ -218,6 +220,9 @@ async def login(
     db.add(refresh_token_record)
     db.commit()
     
+    # Warm the subscription limits cache for the chat requests that follow
+    await RateLimitService(db).get_user_limits(str(user.id))
+    
     # Set refresh token as httpOnly cookie
     # Use environment variable to determine secure flag (True in production)
     is_production = settings.FRONTEND_SITE_URL.startswith('https://')
@@ -316,6 +321,9 @@ async def google_login(
     db.add(refresh_token_record)
     db.commit()
     
+    # Warm the subscription limits cache for the chat requests that follow
+    await RateLimitService(db).get_user_limits(str(user.id))
+    
     # Set refresh token as httpOnly cookie
     # Use environment variable to determine secure flag (True in production)
     is_production = settings.FRONTEND_SITE_URL.startswith('https://')
@@ -548,7 +556,7 @@ async def forgot_password(
     
     # Send email
     try:
-        send_reset_password_email(email=request.email, token=raw_token)
+        await asyncio.to_thread(send_reset_password_email, email=request.email, token=raw_token)
         return {"message": "If the email exists, a reset link has been sent."}
     except Exception as e:
         # Log the error but don't reveal it to the user
@@ -718,7 +726,7 @@ async def resend_verification_email(
         
         # Send verification email
         try:
-            send_verification_email(email=email, token=raw_token)
+            await asyncio.to_thread(send_verification_email, email=email, token=raw_token)
             logger.info(f"Verification email resent to: {user.email}")
             return {"message": "If the email exists and is unverified, a new verification email has been sent."}
         except Exception as e:
@@ -809,6 +817,12 @@ async def delete_account(
         db.delete(current_user)
         db.commit()
         
+        # Drop cached limits and usage not yet written for the deleted user
+        from features.subscription.limits_cache import get_limits_cache
+        from features.subscription.usage_accumulator import get_usage_accumulator
+        get_limits_cache().invalidate(user_id)
+        get_usage_accumulator().forget(user_id)
+        
         logger.info(f"Account successfully deleted for user: {user_email}")
         
         return {
@@ -126,6 +126,14 @@ def get_current_user_optional(
         return None
 
 
+def is_admin(user: User) -> bool:
+    """Whether ``user`` is listed in ADMIN_EMAILS."""
+    if not settings.ADMIN_EMAILS or not user.email:
+        return False
+    admin_emails = {email.strip().lower() for email in settings.ADMIN_EMAILS.split(',') if email.strip()}
+    return user.email.lower() in admin_emails
+
+
 def create_user_id() -> uuid.UUID:
     """Generate a unique user ID."""
     return uuid.uuid4()
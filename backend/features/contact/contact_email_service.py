@@ -1,8 +1,7 @@
 """Email service for contact functionality."""
 
-import time
-import resend
 from core.config.config import settings
+from shared.utils.email_dispatch import get_email_dispatcher, default_sender
 
 
 def send_contact_email(name: str, email: str, phone: str = None, message: str = None) -> None:
@@ -29,8 +28,6 @@ def send_contact_email(name: str, email: str, phone: str = None, message: str =
     if not contact_emails:
         return
         
-    resend.api_key = settings.RESEND_API_KEY
-    
     # Prepare email content
     phone_info = f"<p><strong>Teléfono:</strong> {phone}</p>" if phone else ""
     
@@ -56,18 +53,13 @@ def send_contact_email(name: str, email: str, phone: str = None, message: str =
     </div>
     """
     
-    # Retry logic for reliability
-    for attempt in range(3):
-        try:
-            resend.Emails.send({
-                "from": f"Contacto Simpla <{settings.EMAIL_FROM or 'no-reply@simplalegal.com'}>",
-                "to": contact_emails,
-                "subject": f"Nuevo mensaje de contacto de {name}",
-                "html": html_content,
-            })
-            return
-        except Exception as e:
-            if attempt == 2:  # Last attempt
-                raise e
-            # Small delay between attempts
-            time.sleep(0.5)
+    # Retries with backoff and rate limiting are handled by the dispatcher
+    get_email_dispatcher().send(
+        {
+            "from": default_sender("Contacto Simpla"),
+            "to": contact_emails,
+            "subject": f"Nuevo mensaje de contacto de {name}",
+            "html": html_content,
+        },
+        category="contact"
+    )
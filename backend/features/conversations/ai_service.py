@@ -2,6 +2,8 @@
 
 import os
 from typing import Optional
+from core.config.config import settings
+from core.utils.logging_config import get_logger
 from .ai_services import (
     BaseAIService,
     Message,
@@ -9,23 +11,75 @@ from .ai_services import (
     EchoAIService,
     ClaudeAIService,
     OpenAIService,
+    FakeAIService,
+    AIProviderRouter,
 )
+from .ai_services.base import ROUTE_ANSWER, ROUTE_FAST
 
+logger = get_logger(__name__)
 
-def get_ai_service() -> BaseAIService:
-    """Factory function to get AI service based on configuration."""
-    provider = os.getenv("AI_PROVIDER", "gemini").lower()
 
+def _create_provider(provider: str, model: Optional[str] = None) -> BaseAIService:
+    """Create one provider service (``model`` only applies to gemini)."""
     if provider == "gemini":
-        return GeminiAIService()
+        return GeminiAIService(model)
     elif provider == "claude":
         return ClaudeAIService()
     elif provider == "openai":
         return OpenAIService()
     elif provider == "echo":
         return EchoAIService()
+    elif provider == "fake":
+        return FakeAIService(name=model or "fake")
     else:
-        raise ValueError(f"Unknown AI provider: {provider}. Supported providers: gemini, echo, claude, openai")
+        raise ValueError(f"Unknown AI provider: {provider}. Supported providers: gemini, echo, claude, openai, fake")
+
+
+def _parse_backends(spec: str):
+    """``"gemini:gemini-2.0-flash,echo"`` -> [("gemini:gemini-2.0-flash", "gemini", "gemini-2.0-flash"), ...]"""
+    backends = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if entry:
+            provider, _, model = entry.partition(":")
+            backends.append((entry, provider.lower(), model or None))
+    return backends
+
+
+def _create_router() -> AIProviderRouter:
+    """Router over AI_PROVIDERS (answers) and AI_FAST_PROVIDERS (reformulation, digests)."""
+    answer_specs = _parse_backends(settings.AI_PROVIDERS)
+    fast_specs = _parse_backends(settings.AI_FAST_PROVIDERS) or answer_specs
+
+    route_classes = {}
+    for name, provider, model in answer_specs:
+        route_classes.setdefault((name, provider, model), set()).add(ROUTE_ANSWER)
+    for name, provider, model in fast_specs:
+        route_classes.setdefault((name, provider, model), set()).add(ROUTE_FAST)
+
+    backends = []
+    for (name, provider, model), classes in route_classes.items():
+        try:
+            backends.append((name, _create_provider(provider, model), classes))
+        except Exception as e:
+            # e.g. a placeholder provider or a missing API key: route around it
+            logger.warning(f"Skipping AI backend {name}: {str(e)}")
+
+    logger.info(f"AI provider router with backends: {[(name, sorted(classes)) for name, _, classes in backends]}")
+    return AIProviderRouter(
+        backends,
+        first_chunk_timeout=settings.AI_FIRST_CHUNK_TIMEOUT_SECONDS,
+        rate_limit_cooldown=settings.AI_RATE_LIMIT_COOLDOWN_SECONDS
+    )
+
+
+def get_ai_service() -> BaseAIService:
+    """Factory function to get AI service based on configuration."""
+    if settings.AI_PROVIDERS:
+        return _create_router()
+
+    provider = os.getenv("AI_PROVIDER", "gemini").lower()
+    return _create_provider(provider)
 
 
 # Global AI service instance
@@ -38,4 +92,3 @@ def get_ai_service_instance() -> BaseAIService:
     if _ai_service is None:
         _ai_service = get_ai_service()
     return _ai_service
-
@@ -1,16 +1,22 @@
 """AI services package."""
 
-from .base import BaseAIService, Message
+from .base import BaseAIService, Message, TokenUsage, PromptPrefix
 from .gemini_service import GeminiAIService
 from .echo_service import EchoAIService
 from .claude_service import ClaudeAIService
 from .openai_service import OpenAIService
+from .fake_service import FakeAIService
+from .provider_router import AIProviderRouter
 
 __all__ = [
     "BaseAIService",
     "Message",
+    "TokenUsage",
+    "PromptPrefix",
     "GeminiAIService",
     "EchoAIService",
     "ClaudeAIService",
     "OpenAIService",
+    "FakeAIService",
+    "AIProviderRouter",
 ]
@@ -4,6 +4,14 @@ from abc import ABC, abstractmethod
 from typing import List, AsyncGenerator, Any, Optional, Dict
 
 
+# Routing classes (see AIProviderRouter); other services ignore the route_class kwarg
+ROUTE_ANSWER = "answer"  # user-facing answers: strongest model
+ROUTE_FAST = "fast"      # reformulation, digest analysis: cheap fast model
+
+# Providers report streaming failures in-band as a response starting with this prefix
+INBAND_ERROR_PREFIX = "Error:"
+
+
 class FilePart:
     """Represents a file part in a message."""
     
@@ -21,6 +29,47 @@ class Message:
         self.files = files or []
 
 
+class TokenUsage:
+    """Tokens consumed by one generation.
+
+    Pass an instance as ``usage=`` to ``generate_stream``; providers that
+    report usage fill it in when the stream completes (``source`` becomes
+    "provider"). Otherwise it is left for the caller to estimate locally.
+    """
+
+    def __init__(self, prompt_tokens: int = 0, output_tokens: int = 0, source: str = "estimate"):
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+        self.source = source
+
+    @property
+    def reported(self) -> bool:
+        return self.source == "provider"
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.output_tokens
+
+
+class PromptPrefix:
+    """Static instructions the last user message starts with.
+
+    Pass as ``prompt_prefix=`` to ``generate_stream``. Providers with context
+    caching register the system prompt and these instructions once per
+    ``version`` and send only the rest of the message; the others send the
+    message as is. ``version`` must change whenever ``text`` does.
+
+    With caching the instructions reach the model ahead of the conversation
+    history instead of inside the last message, so the rest of the message
+    must read as a complete message on its own (``build_enhanced_prompt``
+    starts it with "Pregunta del usuario: <pregunta_usuario>...").
+    """
+
+    def __init__(self, version: str, text: str):
+        self.version = version
+        self.text = text
+
+
 class BaseAIService(ABC):
     """Abstract base class for all AI providers."""
 
@@ -1,6 +1,7 @@
 """Echo AI service that returns exactly what the user wrote."""
 
 from typing import List, AsyncGenerator, Any
+from shared.utils.token_counting import count_tokens
 from .base import BaseAIService, Message
 
 
@@ -29,9 +30,7 @@ class EchoAIService(BaseAIService):
 
     def count_tokens(self, text: str) -> int:
         """Count tokens (approximate)."""
-        if not text:
-            return 0
-        return len(text) // 4
+        return count_tokens(text)
 
     def format_messages_for_provider(
         self,
@@ -0,0 +1,75 @@
+"""Fake AI provider with injectable latency and failures, for testing the provider router."""
+
+import asyncio
+import random
+from typing import List, AsyncGenerator, Any, Optional
+from shared.utils.token_counting import count_tokens
+from .base import BaseAIService, Message, INBAND_ERROR_PREFIX
+
+
+class FakeAIService(BaseAIService):
+    """
+    Streams a canned answer after ``first_chunk_latency`` seconds, then one
+    chunk every ``chunk_latency`` seconds. With probability ``error_rate`` the
+    call fails before the first chunk, in-band like the real providers
+    (``Error: <error>``) or by raising when ``inband_errors`` is False.
+    """
+
+    def __init__(
+        self,
+        name: str = "fake",
+        first_chunk_latency: float = 0.0,
+        chunk_latency: float = 0.0,
+        chunks: Optional[List[str]] = None,
+        error_rate: float = 0.0,
+        error: str = "429 Resource has been exhausted (e.g. check quota).",
+        inband_errors: bool = True,
+        seed: Optional[int] = None
+    ):
+        self.name = name
+        self.first_chunk_latency = first_chunk_latency
+        self.chunk_latency = chunk_latency
+        self.chunks = chunks or ["Respuesta ", "de ", f"{name}."]
+        self.error_rate = error_rate
+        self.error = error
+        self.inband_errors = inband_errors
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def generate_stream(
+        self,
+        messages: List[Message],
+        system_prompt: str,
+        **kwargs
+    ) -> AsyncGenerator[str, None]:
+        """Stream the canned answer with the configured latency and failures."""
+        self.calls += 1
+        await asyncio.sleep(self.first_chunk_latency)
+        if self.rng.random() < self.error_rate:
+            if not self.inband_errors:
+                raise RuntimeError(self.error)
+            yield f"{INBAND_ERROR_PREFIX} No se pudo generar la respuesta. {self.error}"
+            return
+
+        for index, chunk in enumerate(self.chunks):
+            if index:
+                await asyncio.sleep(self.chunk_latency)
+            yield chunk
+
+        usage = kwargs.get("usage")
+        if usage is not None:
+            usage.prompt_tokens = count_tokens(system_prompt) + sum(count_tokens(m.content) for m in messages)
+            usage.output_tokens = count_tokens("".join(self.chunks))
+            usage.source = "provider"
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens (approximate)."""
+        return count_tokens(text)
+
+    def format_messages_for_provider(
+        self,
+        messages: List[Message],
+        system_prompt: str
+    ) -> Any:
+        """Format messages (not needed for the fake service)."""
+        return messages
@@ -0,0 +1,145 @@
+"""Gemini context caching for the static head of prompts."""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import google.generativeai as genai
+from google.generativeai import caching
+
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+from shared.utils.token_counting import count_tokens
+
+logger = get_logger(__name__)
+
+# Stop using a cached content this long before it expires
+_EXPIRY_MARGIN_SECONDS = 60
+
+
+class GeminiContextCache:
+    """
+    Cached contents holding the static head of a conversation (system prompt
+    and instructions), registered once and referenced by later calls.
+
+    - Cached contents are named ``simpla-<version>-<hash>``, so every API
+      worker reuses the one already registered by another worker and a new
+      prompt version gets its own.
+    - Each one lives ``ttl_seconds`` and is registered again after expiry.
+    - Heads under ``min_tokens`` (the provider minimum) are not cached.
+      When the provider rejects a head (model without caching support,
+      quota) it is sent in full for ``retry_seconds`` before trying again.
+    """
+
+    def __init__(self, ttl_seconds: float, min_tokens: int, retry_seconds: float = 600.0):
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.retry_seconds = retry_seconds
+        self._models: Dict[tuple, tuple] = {}
+        self._hits = 0
+        self._full_prompts = 0
+        self._lock = threading.Lock()
+        self._create_lock = threading.Lock()
+
+    @staticmethod
+    def cache_name(version: str, model_name: str, contents: List[Dict[str, Any]]) -> str:
+        digest = hashlib.sha256(json.dumps([model_name, contents], ensure_ascii=False).encode("utf-8"))
+        return f"simpla-{version}-{digest.hexdigest()[:16]}"
+
+    def _lookup(self, key: tuple):
+        entry = self._models.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry
+        return None
+
+    def get_model(
+        self,
+        model_name: str,
+        contents: List[Dict[str, Any]],
+        version: str
+    ) -> Optional[genai.GenerativeModel]:
+        """
+        Model whose context is ``contents``, or None when the head has to be
+        sent with the request. Blocking: call it off the event loop.
+        """
+        name = self.cache_name(version, model_name, contents)
+        key = (model_name, name)
+        with self._lock:
+            entry = self._lookup(key)
+        if entry is None:
+            with self._create_lock:
+                entry = self._lookup(key)
+                if entry is None:
+                    entry = self._register(model_name, name, contents)
+                    with self._lock:
+                        self._models[key] = entry
+
+        with self._lock:
+            if entry[1] is not None:
+                self._hits += 1
+            else:
+                self._full_prompts += 1
+        return entry[1]
+
+    def invalidate(self, model_name: str, contents: List[Dict[str, Any]], version: str):
+        """Forget the cached content for ``contents``; the next call registers it again."""
+        with self._lock:
+            self._models.pop((model_name, self.cache_name(version, model_name, contents)), None)
+
+    def _register(self, model_name: str, name: str, contents: List[Dict[str, Any]]) -> tuple:
+        text = "".join(part for message in contents for part in message["parts"] if isinstance(part, str))
+        if count_tokens(text) < self.min_tokens:
+            # Static for this key: never worth asking again
+            return (float("inf"), None)
+
+        try:
+            now = datetime.now(timezone.utc)
+            cached = next(
+                (
+                    c for c in caching.CachedContent.list()
+                    if c.display_name == name and c.model == model_name
+                    and c.expire_time > now + timedelta(seconds=_EXPIRY_MARGIN_SECONDS)
+                ),
+                None
+            )
+            if cached is None:
+                cached = caching.CachedContent.create(
+                    model=model_name,
+                    display_name=name,
+                    contents=contents,
+                    ttl=timedelta(seconds=self.ttl_seconds)
+                )
+                logger.info(f"Registered Gemini cached content {name} for {model_name}")
+            remaining = (cached.expire_time - datetime.now(timezone.utc)).total_seconds()
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+            return (time.monotonic() + remaining - _EXPIRY_MARGIN_SECONDS, model)
+        except Exception as e:
+            logger.warning(f"Gemini context caching unavailable for {model_name}, sending full prompts: {str(e)}")
+            return (time.monotonic() + self.retry_seconds, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._hits + self._full_prompts
+            return {
+                "cached_contents": sum(1 for _, model in self._models.values() if model is not None),
+                "cached_calls": self._hits,
+                "full_prompt_calls": self._full_prompts,
+                "cached_rate": self._hits / calls if calls else 0.0
+            }
+
+
+_cache_instance = None
+
+
+def get_gemini_context_cache() -> GeminiContextCache:
+    """Get a singleton instance of the GeminiContextCache."""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = GeminiContextCache(
+            ttl_seconds=settings.GEMINI_CONTEXT_CACHE_TTL_SECONDS,
+            min_tokens=settings.GEMINI_CONTEXT_CACHE_MIN_TOKENS
+        )
+    return _cache_instance
@@ -1,12 +1,16 @@
 """Google Gemini AI service implementation."""
 
 import os
-import asyncio
 import base64
-from typing import List, AsyncGenerator, Dict, Any
+from contextlib import aclosing
+from typing import List, AsyncGenerator, Dict, Any, Optional
 import google.generativeai as genai
+from core.config.config import settings
 from core.utils.logging_config import get_logger
-from .base import BaseAIService, Message, FilePart
+from shared.utils.token_counting import count_tokens
+from .base import BaseAIService, Message, FilePart, PromptPrefix
+from .streaming import iterate_in_thread
+from .gemini_context_cache import get_gemini_context_cache
 
 logger = get_logger(__name__)
 
@@ -14,13 +18,19 @@ logger = get_logger(__name__)
 class GeminiAIService(BaseAIService):
     """Google Gemini implementation."""
 
-    def __init__(self):
-        """Initialize Gemini service."""
+    def __init__(self, model_name: Optional[str] = None):
+        """Initialize Gemini service (``model_name`` overrides the default model)."""
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable is required")
 
         genai.configure(api_key=api_key)
+        self.context_cache = get_gemini_context_cache() if settings.GEMINI_CONTEXT_CACHE_ENABLED else None
+
+        if model_name:
+            self.model = genai.GenerativeModel(model_name)
+            logger.info(f"Using Gemini model {model_name}")
+            return
 
         # Use gemini-2.0-flash-exp if available, fallback to gemini-1.5-pro
         try:
@@ -85,6 +95,41 @@ class GeminiAIService(BaseAIService):
 
         return formatted_messages
 
+    def _split_static_head(
+        self,
+        messages: List[Message],
+        system_prompt: str,
+        prompt_prefix: Optional[PromptPrefix]
+    ) -> Optional[tuple]:
+        """
+        (static contents, remaining contents, version) for context caching,
+        or None when there is nothing static to cache.
+
+        The static head is the system prompt turn plus the instructions the
+        last user message starts with (``prompt_prefix``); the remaining
+        contents are the history and the rest of that message. This moves
+        the instructions from the last turn to the front, ahead of the
+        history (the model reads them as part of the system turn), and the
+        last turn keeps only the question and the normas, which form a
+        complete message of their own. Without a ``prompt_prefix`` only the
+        system turn is cached, which is a true prefix of the contents.
+        """
+        if self.context_cache is None or not system_prompt or not messages:
+            return None
+        last = messages[-1]
+        remainder = last.content[len(prompt_prefix.text):].strip() if prompt_prefix else ""
+        if prompt_prefix and last.role == "user" and last.content.startswith(prompt_prefix.text) and remainder:
+            head = f"{system_prompt}\n\n{prompt_prefix.text}"
+            rest = messages[:-1] + [Message(role="user", content=remainder, files=last.files)]
+            version = prompt_prefix.version
+        else:
+            head, rest, version = system_prompt, messages, "system"
+        return (
+            self.format_messages_for_provider([], head),
+            self.format_messages_for_provider(rest, ""),
+            version
+        )
+
     async def generate_stream(
         self,
         messages: List[Message],
@@ -95,36 +140,59 @@ class GeminiAIService(BaseAIService):
         try:
             # Format messages for Gemini
             formatted_messages = self.format_messages_for_provider(messages, system_prompt)
-
-            # Start chat session
-            chat = self.model.start_chat(history=formatted_messages[:-1] if len(formatted_messages) > 1 else [])
-
-            # Get the last user message - it could have multiple parts (files + text)
-            last_message = formatted_messages[-1] if formatted_messages else {"parts": []}
-            user_parts = last_message.get("parts", [])
-
-            # Stream response - send all parts together
-            response = await asyncio.to_thread(
-                chat.send_message,
-                user_parts if user_parts else [""],
-                stream=True
-            )
-
-            # Yield chunks as they come
-            for chunk in response:
-                if chunk.text:
-                    yield chunk.text
+            cacheable = self._split_static_head(messages, system_prompt, kwargs.get("prompt_prefix"))
+
+            usage = kwargs.get("usage")
+
+            def _stream_text():
+                # Runs on the producer thread: the cache lookup, the request and every read of the stream block
+                def _send(model, contents):
+                    # Start chat session
+                    chat = model.start_chat(history=contents[:-1] if len(contents) > 1 else [])
+
+                    # Get the last user message - it could have multiple parts (files + text)
+                    last_message = contents[-1] if contents else {"parts": []}
+                    user_parts = last_message.get("parts", [])
+                    return chat.send_message(user_parts if user_parts else [""], stream=True)
+
+                cached_model = None
+                if cacheable is not None:
+                    static_contents, dynamic_contents, version = cacheable
+                    cached_model = self.context_cache.get_model(self.model.model_name, static_contents, version)
+
+                if cached_model is None:
+                    response = _send(self.model, formatted_messages)
+                else:
+                    try:
+                        response = _send(cached_model, dynamic_contents)
+                    except Exception as e:
+                        # Cached content deleted or expired early: send the full prompt this time
+                        logger.warning(f"Gemini cached content rejected, sending the full prompt: {str(e)}")
+                        self.context_cache.invalidate(self.model.model_name, static_contents, version)
+                        response = _send(self.model, formatted_messages)
+
+                metadata = None
+                for chunk in response:
+                    # The final chunk carries the token counts for the whole generation
+                    metadata = getattr(chunk, "usage_metadata", None) or metadata
+                    if chunk.text:
+                        yield chunk.text
+                if usage is not None and metadata and metadata.prompt_token_count:
+                    usage.prompt_tokens = metadata.prompt_token_count
+                    usage.output_tokens = metadata.candidates_token_count or 0
+                    usage.source = "provider"
+
+            # Yield chunks as they come, without blocking the event loop between them.
+            # aclosing stops the producer thread as soon as this generator is closed
+            async with aclosing(iterate_in_thread(_stream_text, name="gemini-stream")) as stream:
+                async for text in stream:
+                    yield text
 
         except Exception as e:
             logger.error(f"Error in Gemini streaming: {str(e)}")
             yield f"Error: No se pudo generar la respuesta. {str(e)}"
 
     def count_tokens(self, text: str) -> int:
-        """Count tokens for Gemini (approximate)."""
-        # Gemini uses a different tokenization, this is an approximation
-        # For more accurate counting, you could use the Gemini API's count_tokens method
-        if not text:
-            return 0
-
-        # Rough approximation: 1 token ≈ 4 characters for Spanish text
-        return len(text) // 4
+        """Count tokens for Gemini (local approximation, see shared.utils.token_counting)."""
+        # Exact counts come from the usage metadata reported with each stream (TokenUsage)
+        return count_tokens(text)
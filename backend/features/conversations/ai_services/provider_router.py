@@ -0,0 +1,208 @@
+"""Routes generations across several AI providers by latency and error rate."""
+
+import asyncio
+import hashlib
+import random
+import time
+from contextlib import aclosing
+from typing import List, AsyncGenerator, Any, Dict, Iterable, Optional, Tuple
+
+from core.utils.logging_config import get_logger
+from shared.utils.llm_scheduler import is_rate_limit_error
+from .base import BaseAIService, Message, ROUTE_ANSWER, INBAND_ERROR_PREFIX
+
+logger = get_logger(__name__)
+
+
+class _Backend:
+    """One provider behind the router, with its observed health."""
+
+    __slots__ = ("name", "service", "route_classes", "ttft", "error_rate", "cooldown_until", "requests", "failures")
+
+    def __init__(self, name: str, service: BaseAIService, route_classes: Iterable[str]):
+        self.name = name
+        self.service = service
+        self.route_classes = frozenset(route_classes)
+        self.ttft: Optional[float] = None  # EWMA of seconds to first chunk
+        self.error_rate = 0.0              # EWMA of failed calls
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+
+class AIProviderRouter(BaseAIService):
+    """
+    A BaseAIService that spreads generations over several backends.
+
+    - Each call names a routing class (``route_class=``, default ROUTE_ANSWER);
+      only backends serving that class are candidates.
+    - Candidates are tried fastest first, by the moving average of their
+      time-to-first-token scaled up by their error rate. A small share of
+      calls goes to another candidate so the averages stay current.
+    - Until the first chunk arrives the call can fail over: an exception,
+      an in-band ``Error:`` response or no chunk within
+      ``first_chunk_timeout`` moves on to the next candidate. Once a chunk
+      has been streamed the backend is kept to the end.
+    - A rate-limited backend sits out ``rate_limit_cooldown`` seconds.
+    """
+
+    def __init__(
+        self,
+        backends: List[Tuple[str, BaseAIService, Iterable[str]]],
+        first_chunk_timeout: float = 15.0,
+        rate_limit_cooldown: float = 30.0,
+        explore_ratio: float = 0.05,
+        smoothing: float = 0.2,
+        rng: Optional[random.Random] = None
+    ):
+        if not backends:
+            raise ValueError("AIProviderRouter needs at least one backend")
+        self.backends = [_Backend(name, service, classes) for name, service, classes in backends]
+        self.first_chunk_timeout = first_chunk_timeout
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self.explore_ratio = explore_ratio
+        self.smoothing = smoothing
+        self.rng = rng or random.Random()
+
+    # ------------------------------------------------------------------
+    # Routing
+    # ------------------------------------------------------------------
+
+    def _score(self, backend: _Backend) -> float:
+        # Unmeasured backends get an optimistic prior so they are tried early
+        ttft = backend.ttft if backend.ttft is not None else 0.5
+        return ttft * (1 + 4 * backend.error_rate)
+
+    def candidates(self, route_class: str) -> List[_Backend]:
+        """Backends to try for ``route_class``, in order."""
+        serving = [b for b in self.backends if route_class in b.route_classes] or list(self.backends)
+        now = time.monotonic()
+        ordered = sorted(serving, key=lambda b: (b.cooldown_until > now, self._score(b)))
+        healthy = [b for b in ordered if b.cooldown_until <= now]
+        if len(healthy) > 1 and self.rng.random() < self.explore_ratio:
+            explored = self.rng.choice(healthy[1:])
+            ordered.remove(explored)
+            ordered.insert(0, explored)
+        return ordered
+
+    def model_name_for(self, route_class: str) -> str:
+        """
+        Identifier of the backends serving ``route_class``, for cache keys:
+        changes whenever the set of models that may answer the class does.
+        """
+        names = sorted(b.name for b in self.backends if route_class in b.route_classes) or \
+            sorted(b.name for b in self.backends)
+        model_name = "router:" + "+".join(names)
+        if len(model_name) > 100:
+            # Cache tables store the model in a VARCHAR(100)
+            model_name = "router:" + hashlib.sha256(model_name.encode("utf-8")).hexdigest()[:32]
+        return model_name
+
+    def _record_success(self, backend: _Backend, ttft: float):
+        backend.requests += 1
+        backend.ttft = ttft if backend.ttft is None else backend.ttft + self.smoothing * (ttft - backend.ttft)
+        backend.error_rate -= self.smoothing * backend.error_rate
+
+    def _record_failure(self, backend: _Backend, error: BaseException, ttft: Optional[float] = None):
+        backend.requests += 1
+        backend.failures += 1
+        backend.error_rate += self.smoothing * (1 - backend.error_rate)
+        if ttft is not None:
+            # A timeout is a lower bound of the real time-to-first-token
+            backend.ttft = ttft if backend.ttft is None else backend.ttft + self.smoothing * (ttft - backend.ttft)
+        if is_rate_limit_error(error):
+            cooldown = getattr(error, "retry_after", None) or self.rate_limit_cooldown
+            backend.cooldown_until = time.monotonic() + cooldown
+            logger.warning(f"AI backend {backend.name} rate limited, cooling down for {cooldown:.0f}s")
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Observed health of every backend."""
+        now = time.monotonic()
+        return [
+            {
+                "name": b.name,
+                "route_classes": sorted(b.route_classes),
+                "ttft_seconds": round(b.ttft, 3) if b.ttft is not None else None,
+                "error_rate": round(b.error_rate, 3),
+                "cooling_down": b.cooldown_until > now,
+                "requests": b.requests,
+                "failures": b.failures
+            }
+            for b in self.backends
+        ]
+
+    # ------------------------------------------------------------------
+    # BaseAIService
+    # ------------------------------------------------------------------
+
+    async def generate_stream(
+        self,
+        messages: List[Message],
+        system_prompt: str,
+        **kwargs
+    ) -> AsyncGenerator[str, None]:
+        """Stream from the best backend for ``route_class``, failing over before the first chunk."""
+        route_class = kwargs.get("route_class", ROUTE_ANSWER)
+        candidates = self.candidates(route_class)
+        last_error = None
+
+        for index, backend in enumerate(candidates):
+            is_last = index == len(candidates) - 1
+            started = time.monotonic()
+            stream = backend.service.generate_stream(messages, system_prompt, **kwargs)
+            async with aclosing(stream):
+                try:
+                    if is_last or not self.first_chunk_timeout:
+                        first_chunk = await stream.__anext__()
+                    else:
+                        first_chunk = await asyncio.wait_for(stream.__anext__(), self.first_chunk_timeout)
+                except StopAsyncIteration:
+                    self._record_success(backend, time.monotonic() - started)
+                    return
+                except asyncio.TimeoutError:
+                    last_error = TimeoutError(f"no response from {backend.name} in {self.first_chunk_timeout:.0f}s")
+                    self._record_failure(backend, last_error, ttft=self.first_chunk_timeout)
+                    logger.warning(f"AI backend {backend.name} timed out before the first chunk, failing over")
+                    continue
+                except Exception as e:
+                    last_error = e
+                    self._record_failure(backend, e)
+                    logger.warning(f"AI backend {backend.name} failed before the first chunk: {str(e)}")
+                    continue
+
+                if first_chunk.startswith(INBAND_ERROR_PREFIX):
+                    last_error = Exception(first_chunk)
+                    self._record_failure(backend, last_error)
+                    logger.warning(f"AI backend {backend.name} returned an error: {first_chunk[:200]}")
+                    if not is_last:
+                        continue
+                    yield first_chunk
+                    return
+
+                self._record_success(backend, time.monotonic() - started)
+                if index:
+                    logger.info(f"Failed over to AI backend {backend.name} for route '{route_class}'")
+                yield first_chunk
+                try:
+                    async for chunk in stream:
+                        yield chunk
+                except Exception as e:
+                    self._record_failure(backend, e)
+                    raise
+                return
+
+        # Every backend failed before streaming anything: report it in-band like the providers do
+        logger.error(f"All AI backends failed for route '{route_class}': {str(last_error)}")
+        yield f"{INBAND_ERROR_PREFIX} No se pudo generar la respuesta. {str(last_error)}"
+
+    def count_tokens(self, text: str) -> int:
+        """Count tokens with the primary backend."""
+        return self.backends[0].service.count_tokens(text)
+
+    def format_messages_for_provider(
+        self,
+        messages: List[Message],
+        system_prompt: str
+    ) -> Any:
+        """Format messages for the primary backend."""
+        return self.backends[0].service.format_messages_for_provider(messages, system_prompt)
@@ -0,0 +1,85 @@
+"""Bridge blocking provider streams to the event loop."""
+
+import asyncio
+import threading
+from typing import AsyncGenerator, Callable, Iterable, TypeVar
+
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+_ITEM = 0
+_ERROR = 1
+_DONE = 2
+
+
+async def iterate_in_thread(
+    make_iterable: Callable[[], Iterable[T]],
+    max_buffered: int = 32,
+    name: str = "ai-stream"
+) -> AsyncGenerator[T, None]:
+    """
+    Run a blocking stream on its own thread and yield its items on the event loop.
+
+    - ``make_iterable`` is called on the producer thread, so the request that
+      opens the stream does not block the loop either.
+    - At most ``max_buffered`` items wait in the queue; the producer blocks
+      (off the loop) until the consumer catches up.
+    - When the consumer stops early (client disconnected, task cancelled) the
+      producer stops reading and closes the provider stream.
+
+    A dedicated thread is used instead of the default executor so long
+    generations can't exhaust the pool shared by ``asyncio.to_thread`` calls.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(max_buffered)
+    stopped = threading.Event()
+
+    def _emit(kind: int, value=None) -> bool:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (kind, value))
+            return True
+        except RuntimeError:
+            # Event loop closed under us
+            stopped.set()
+            return False
+
+    def _produce():
+        iterator = None
+        try:
+            iterator = iter(make_iterable())
+            for item in iterator:
+                while not slots.acquire(timeout=0.5):
+                    if stopped.is_set():
+                        break
+                if stopped.is_set() or not _emit(_ITEM, item):
+                    break
+            else:
+                _emit(_DONE)
+        except Exception as e:
+            _emit(_ERROR, e)
+        finally:
+            close = getattr(iterator, "close", None)
+            if stopped.is_set() and close:
+                try:
+                    close()
+                except Exception as e:
+                    logger.debug(f"Error closing abandoned stream: {str(e)}")
+
+    thread = threading.Thread(target=_produce, name=name, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            kind, value = await queue.get()
+            if kind == _DONE:
+                return
+            if kind == _ERROR:
+                raise value
+            slots.release()
+            yield value
+    finally:
+        stopped.set()
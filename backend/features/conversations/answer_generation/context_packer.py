@@ -0,0 +1,205 @@
+"""Compact serialization of retrieved normas for the answer prompt."""
+
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from core.utils.logging_config import get_logger
+from shared.utils.token_counting import count_tokens
+
+logger = get_logger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Norma fields shown in the header line, in order
+_HEADER_FIELDS = ("tipo_norma", "numero", "titulo_resumido", "titulo_sumario", "dependencia", "sancion", "publicacion", "estado")
+
+
+def entity_scores(search_results: List[Dict[str, Any]]) -> Dict[Tuple[str, Any], float]:
+    """
+    Best vector search score per retrieved entity, keyed by
+    ("article" | "division", id) and by ("norma", source_id).
+    """
+    scores: Dict[Tuple[str, Any], float] = {}
+    for result in search_results:
+        metadata = result.get("metadata", {}) or {}
+        score = result.get("score") or 0.0
+        keys = []
+        try:
+            keys.append((metadata.get("document_type", ""), int(metadata.get("document_id"))))
+        except (TypeError, ValueError):
+            pass
+        try:
+            keys.append(("norma", int(metadata.get("source_id"))))
+        except (TypeError, ValueError):
+            pass
+        for key in keys:
+            scores[key] = max(score, scores.get(key, score))
+    return scores
+
+
+def _clean(text: Any) -> str:
+    return _WHITESPACE.sub(" ", str(text)).strip() if text else ""
+
+
+def _norma_key(item: Dict[str, Any]) -> Any:
+    norma = item.get("norma") if isinstance(item.get("norma"), dict) else item
+    return norma.get("infoleg_id") or norma.get("norma_id") or norma.get("id") or id(item)
+
+
+def _header(item: Dict[str, Any]) -> str:
+    norma = item.get("norma") if isinstance(item.get("norma"), dict) else item
+    fields = dict(norma)
+    referencia = norma.get("referencia")
+    if isinstance(referencia, dict):
+        fields.setdefault("numero", referencia.get("numero"))
+        fields.setdefault("dependencia", referencia.get("dependencia"))
+    parts = []
+    if fields.get("infoleg_id"):
+        parts.append(f"infoleg {fields['infoleg_id']}")
+    for name in _HEADER_FIELDS:
+        value = _clean(fields.get(name))
+        if value and value not in parts:
+            parts.append(value if name not in ("sancion", "publicacion") else f"{name} {value}")
+    return f"[{' | '.join(parts) or f'norma {_norma_key(item)}'}]"
+
+
+def _article_chunks(articles: List[Dict[str, Any]]) -> Iterator[Tuple[str, Any, str, str]]:
+    for article in articles or []:
+        ordinal = _clean(article.get("ordinal"))
+        yield "article", article.get("id"), f"Art. {ordinal}" if ordinal else "Art.", _clean(article.get("body"))
+        yield from _article_chunks(article.get("child_articles"))
+
+
+def _division_chunks(divisions: List[Dict[str, Any]]) -> Iterator[Tuple[str, Any, str, str]]:
+    for division in divisions or []:
+        label = " ".join(
+            part for part in (_clean(division.get("name")), _clean(division.get("ordinal"))) if part
+        ) or "Sección"
+        title = _clean(division.get("title"))
+        if title:
+            label = f"{label} - {title}"
+        yield "division", division.get("id"), label, _clean(division.get("body"))
+        yield from _article_chunks(division.get("articles"))
+        yield from _division_chunks(division.get("child_divisions"))
+
+
+def _item_chunks(item: Dict[str, Any]) -> List[Tuple[str, Any, str, str]]:
+    """(entity type, id, label, text) of every article and division in a batch item."""
+    if not any(field in item for field in ("tipo_norma", "titulo_sumario", "infoleg_id", "divisions")):
+        # A single article or division, with its norma attached under "norma" when available
+        if item.get("type", "article" if "division_id" in item else "division") == "article":
+            return list(_article_chunks([item]))
+        return list(_division_chunks([item]))
+
+    chunks = list(_division_chunks(item.get("divisions"))) + list(_article_chunks(item.get("articles")))
+    if not any(text for _, _, _, text in chunks):
+        for field in ("texto_resumido", "texto_norma_actualizado", "texto_norma"):
+            if item.get(field):
+                return [("norma", _norma_key(item), "Texto", _clean(item[field]))]
+    return chunks
+
+
+class PackedContext:
+    """Result of ``pack_legal_context``."""
+
+    __slots__ = ("text", "tokens", "original_tokens", "chunks", "dropped_chunks")
+
+    def __init__(self, text: str, tokens: int, original_tokens: int, chunks: int, dropped_chunks: int):
+        self.text = text
+        self.tokens = tokens
+        self.original_tokens = original_tokens
+        self.chunks = chunks
+        self.dropped_chunks = dropped_chunks
+
+    @property
+    def compression_ratio(self) -> float:
+        return self.original_tokens / self.tokens if self.tokens else 0.0
+
+
+def pack_legal_context(
+    normas_data: List[Dict[str, Any]],
+    scores: Optional[Dict[Tuple[str, Any], float]] = None,
+    token_budget: int = 6000
+) -> PackedContext:
+    """
+    Serialize retrieved normas compactly for the prompt.
+
+    - Hits are grouped by norma: one header line per norma (type, number,
+      title, dates, status), then its articles and divisions in document
+      order, one line each.
+    - Repeated text (the same hit returned twice, a division body quoting
+      its own articles) is emitted once.
+    - Chunks are admitted by retrieval score (``entity_scores``), best
+      first, until ``token_budget`` is spent; the lowest scoring ones are
+      dropped. A norma with no admitted chunk is left out.
+    """
+    scores = scores or {}
+    normas: Dict[Any, Dict[str, Any]] = {}
+    chunks: Dict[str, list] = {}
+
+    for item in normas_data or []:
+        if not isinstance(item, dict):
+            continue
+        key = _norma_key(item)
+        normas.setdefault(key, {"header": _header(item), "lines": []})
+        norma_score = scores.get(("norma", key), 0.0)
+        for entity_type, entity_id, label, text in _item_chunks(item):
+            if not text:
+                continue
+            score = scores.get((entity_type, entity_id), norma_score)
+            if text in chunks:
+                # Same text hit twice: keep it once, with the best score
+                chunks[text][0] = max(chunks[text][0], score)
+            else:
+                chunks[text] = [score, len(chunks), key, f"{label}: {text}"]
+
+    # Text quoted inside a longer chunk of the same norma (a division body repeating its
+    # articles) is dropped; the longer chunk inherits its score
+    candidates = []
+    for text in sorted(chunks, key=len, reverse=True):
+        key = chunks[text][2]
+        container = next((c for c in candidates if c[2] == key and text in c[4]), None)
+        if container is not None:
+            container[0] = max(container[0], chunks[text][0])
+        else:
+            candidates.append(chunks[text] + [text])
+
+    admitted = []
+    used = 0
+    headers_used = set()
+    for score, order, key, line, _ in sorted(candidates, key=lambda c: (-c[0], c[1])):
+        cost = count_tokens(line) + 1
+        if key not in headers_used:
+            cost += count_tokens(normas[key]["header"]) + 1
+        if used + cost > token_budget:
+            continue
+        used += cost
+        headers_used.add(key)
+        admitted.append((order, key, score, line))
+
+    best_score: Dict[Any, float] = {}
+    for _, key, score, _ in admitted:
+        best_score[key] = max(score, best_score.get(key, score))
+    for order, key, _, line in sorted(admitted):
+        normas[key]["lines"].append(line)
+
+    blocks = [
+        "\n".join([normas[key]["header"]] + normas[key]["lines"])
+        for key in sorted(best_score, key=lambda k: -best_score[k])
+    ]
+    text = "\n\n".join(blocks)
+
+    packed = PackedContext(
+        text=text,
+        tokens=count_tokens(text),
+        original_tokens=count_tokens(json.dumps(normas_data, indent=2, ensure_ascii=False)),
+        chunks=len(admitted),
+        dropped_chunks=len(candidates) - len(admitted)
+    )
+    logger.info(
+        f"Packed legal context: {len(blocks)} normas, {packed.chunks} chunks "
+        f"({packed.dropped_chunks} over budget), {packed.original_tokens} -> {packed.tokens} tokens "
+        f"({packed.compression_ratio:.1f}x)"
+    )
+    return packed
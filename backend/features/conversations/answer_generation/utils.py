@@ -3,17 +3,24 @@ from core.clients.vectorial import search_vectors
 from core.clients.relational import fetch_batch_entities
 
 import json
+from functools import lru_cache
+from typing import Optional
 from fastapi import HTTPException
 
 from core.utils.logging_config import get_logger
+from shared.utils.token_counting import static_segment
+from core.config.config import settings
+from features.conversations.ai_services.base import PromptPrefix
+from .context_packer import entity_scores, pack_legal_context
 logger = get_logger(__name__)
 
-def fetch_and_parse_legal_context(user_question: str) -> tuple[list, list]:
+def fetch_and_parse_legal_context(user_question: str) -> tuple[list, list, dict]:
     """
     Fetch relevant legal context based on user question.
 
     Returns:
-        Tuple of (normas_data, norma_ids)
+        Tuple of (normas_data, norma_ids, scores), scores being the best search
+        score per retrieved entity (see context_packer.entity_scores)
     """
     # Generate embedding for user question
     embedding_result = get_embedding(user_question)
@@ -51,7 +58,7 @@ def fetch_and_parse_legal_context(user_question: str) -> tuple[list, list]:
         logger.info(f"Raw normas_json string: {normas_json_str}")
         normas_data = []
 
-    return normas_data, norma_ids
+    return normas_data, norma_ids, entity_scores(search_results.get("results", []))
 
 
 def _extract_norma_ids_from_search_results(search_results: list) -> list:
@@ -81,9 +88,14 @@ def _extract_norma_ids_from_search_results(search_results: list) -> list:
     return list(norma_ids)
 
 
-def build_enhanced_prompt(user_question: str, normas_data: list, tone: str = "default") -> str:
-    """Build an enhanced prompt with legal context for the AI."""
-    prompt = f"""
+# Bump when the instruction block changes: provider-side caches are keyed by it
+ENHANCED_PROMPT_VERSION = "1"
+
+
+@lru_cache(maxsize=8)
+def _enhanced_prompt_instructions(tone: str) -> str:
+    """Instruction block of the enhanced prompt, identical on every call for a given tone."""
+    return static_segment(f"""
     Eres un asistente experto en derecho y normativa argentina. 
     Tu tarea es responder con precisión, claridad y neutralidad a consultas sobre leyes, decretos, disposiciones y reglamentaciones de la República Argentina.
 
@@ -150,11 +162,32 @@ def build_enhanced_prompt(user_question: str, normas_data: list, tone: str = "de
 
     El seguimiento debe ser **una única oración breve y natural**, no una lista de opciones.
 
-    Pregunta del usuario:
+    """)
+
+
+def enhanced_prompt_prefix(tone: str = "default") -> PromptPrefix:
+    """Static head of ``build_enhanced_prompt`` for ``tone``, for provider-side context caching."""
+    return PromptPrefix(f"enhanced-{ENHANCED_PROMPT_VERSION}-{tone}", _enhanced_prompt_instructions(tone))
+
+
+def build_enhanced_prompt(
+    user_question: str,
+    normas_data: list,
+    tone: str = "default",
+    scores: Optional[dict] = None
+) -> str:
+    """Build an enhanced prompt with legal context for the AI."""
+    # One header per norma and its chunks, deduplicated and cut to the token budget by score
+    context = pack_legal_context(normas_data, scores, token_budget=settings.LEGAL_CONTEXT_TOKEN_BUDGET)
+    # The part after the instructions is sent on its own when they are cached
+    # (see PromptPrefix), so it opens its own tags
+    prompt = _enhanced_prompt_instructions(tone) + f"""Pregunta del usuario:
     <pregunta_usuario>{user_question}</pregunta_usuario>
 
     Normas relevantes:
-    <normas_relevantes>{json.dumps(normas_data, indent=2, ensure_ascii=False)}</normas_relevantes>
+    <normas_relevantes>
+{context.text}
+    </normas_relevantes>
 
     Elabora la mejor respuesta posible cumpliendo las reglas anteriores.
     """
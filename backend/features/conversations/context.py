@@ -0,0 +1,42 @@
+"""Per-message conversation context, loaded once and shared by every pipeline step."""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from .models import Conversation, Message
+from .history import ConversationHistory
+
+
+class ConversationContext:
+    """
+    What one chat message needs from its conversation.
+
+    Read when the message arrives with two bounded queries (the
+    conversation row and its last messages), then handed to reformulation,
+    retrieval and generation instead of each step loading the conversation
+    again. Nothing is written until ``ConversationService.save_turn``
+    stores the whole turn in one transaction.
+    """
+
+    __slots__ = ("conversation", "session_id", "recent_messages", "history", "received_at")
+
+    def __init__(self, conversation: Conversation, recent_messages: List[Message], history: ConversationHistory):
+        self.conversation = conversation
+        # Read once: the conversation row expires when the turn is committed
+        self.session_id = str(conversation.id)
+        # Last messages of the conversation, oldest first
+        self.recent_messages = recent_messages
+        self.history = history
+        # Creation time of the user message, so it sorts before the answer stored with it
+        self.received_at = datetime.now(timezone.utc)
+
+    def reformulation_messages(self, count: int = 3) -> Optional[List[Dict[str, Any]]]:
+        """Last ``count`` messages in the shape the reformulation prompt expects, or None if there are none."""
+        return [
+            {
+                "role": msg.role,
+                "content": msg.content,
+                "metadata": msg.message_metadata
+            }
+            for msg in self.recent_messages[-count:]
+        ] or None
@@ -0,0 +1,215 @@
+"""Bounded conversation history for LLM calls, with a rolling summary of older turns."""
+
+import asyncio
+import uuid
+from typing import List, Optional, Set
+
+from sqlalchemy.orm import Session
+
+from core.config.config import settings
+from core.database.base import SessionLocal
+from core.utils.logging_config import get_logger
+from shared.utils.llm_scheduler import get_llm_scheduler, PRIORITY_LOW
+from shared.utils.token_counting import count_tokens
+from .models import Conversation, Message
+from .ai_services.base import Message as AIMessage, INBAND_ERROR_PREFIX, ROUTE_FAST
+
+logger = get_logger(__name__)
+
+SUMMARY_PROMPT = """Mantienes un resumen de una conversación entre un usuario y un asistente legal especializado en normativa argentina.
+
+Resumen actual:
+{summary}
+
+Nuevos mensajes a incorporar:
+{turns}
+
+Reescribe el resumen incorporando los nuevos mensajes. Conserva las normas citadas (tipo, número, artículos), los hechos y datos que dio el usuario y las conclusiones del asistente. Omite saludos y detalles de redacción. Máximo 200 palabras, en prosa, sin títulos."""
+
+# Characters of each message shown to the summarizer
+_SUMMARY_MESSAGE_CHARS = 1500
+
+# Background summary updates in flight, so a conversation is only summarized by one at a time
+_summarizing: Set[str] = set()
+_summary_tasks: Set[asyncio.Task] = set()
+
+
+def _message_tokens(message: Message) -> int:
+    return message.tokens_used or count_tokens(message.content)
+
+
+class ConversationHistory:
+    """History sent with one LLM call: the rolling summary plus the most recent messages."""
+
+    __slots__ = ("conversation_id", "summary", "messages", "tokens", "has_unsummarized", "window_start")
+
+    def __init__(
+        self,
+        conversation_id: str,
+        summary: Optional[str],
+        messages: List[Message],
+        tokens: int,
+        has_unsummarized: bool
+    ):
+        self.conversation_id = conversation_id
+        self.summary = summary
+        self.messages = messages
+        self.tokens = tokens
+        # Older messages outside the window are not in the summary yet
+        self.has_unsummarized = has_unsummarized
+        # Read here, since the ORM rows expire when the turn is committed
+        self.window_start = messages[0].created_at if messages else None
+
+    def to_ai_messages(self) -> List[AIMessage]:
+        ai_messages = []
+        if self.summary:
+            ai_messages.append(AIMessage(role="user", content=f"Resumen de la conversación hasta aquí:\n{self.summary}"))
+            ai_messages.append(AIMessage(role="assistant", content="Entendido, tendré en cuenta ese contexto."))
+        ai_messages.extend(AIMessage(role=msg.role, content=msg.content) for msg in self.messages)
+        return ai_messages
+
+
+class ConversationHistoryManager:
+    """
+    Loads the history of a conversation for an LLM call without reading
+    the whole conversation.
+
+    - Only the last ``max_messages`` messages are read (a LIMIT query on the
+      conversation/created_at index), and of those only the newest that fit
+      in ``token_budget``.
+    - Older turns are represented by a summary stored on the conversation
+      (``history_summary``). After a turn, ``schedule_summary_update``
+      folds the messages that left the window into it with a cheap LLM
+      call, in the background; ``history_summarized_until`` marks the last
+      message folded in, so each message is summarized once.
+    """
+
+    def __init__(self, db: Session, ai_service, max_messages: int = 20, token_budget: int = 4000):
+        self.db = db
+        self.ai_service = ai_service
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+
+    def recent_messages(self, conversation_id, limit: int) -> List[Message]:
+        """Last ``limit`` active messages of a conversation, oldest first."""
+        messages = (
+            self.db.query(Message)
+            .filter(Message.conversation_id == conversation_id, Message.is_deleted == False)  # noqa: E712
+            .order_by(Message.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        messages.reverse()
+        return messages
+
+    def load(self, conversation: Conversation) -> ConversationHistory:
+        """History of ``conversation`` for its next LLM call."""
+        # One extra row tells whether anything older exists
+        return self.window(conversation, self.recent_messages(conversation.id, self.max_messages + 1))
+
+    def window(self, conversation: Conversation, recent: List[Message]) -> ConversationHistory:
+        """
+        Fit the last ``max_messages + 1`` messages of ``conversation``
+        (oldest first) into the window and the token budget.
+        """
+        outside = recent[:-self.max_messages] if len(recent) > self.max_messages else []
+        recent = recent[len(outside):]
+        kept: List[Message] = []
+        tokens = 0
+        for message in reversed(recent):
+            cost = _message_tokens(message)
+            if kept and tokens + cost > self.token_budget:
+                break
+            kept.append(message)
+            tokens += cost
+        kept.reverse()
+        # Start the window on a user turn
+        while kept and kept[0].role != "user":
+            tokens -= _message_tokens(kept.pop(0))
+        outside += recent[:len(recent) - len(kept)]
+
+        # Older turns are represented by the summary
+        summary = conversation.history_summary if outside else None
+        if summary:
+            tokens += count_tokens(summary)
+        summarized_until = conversation.history_summarized_until
+        has_unsummarized = bool(outside) and (
+            summarized_until is None or outside[-1].created_at > summarized_until
+        )
+        return ConversationHistory(str(conversation.id), summary, kept, tokens, has_unsummarized)
+
+    def schedule_summary_update(self, history: ConversationHistory):
+        """Fold the messages older than ``history``'s window into the stored summary, in the background."""
+        if not history.has_unsummarized or not settings.HISTORY_SUMMARY_ENABLED:
+            return
+        if history.conversation_id in _summarizing or history.window_start is None:
+            return
+        _summarizing.add(history.conversation_id)
+        task = asyncio.create_task(
+            update_history_summary(self.ai_service, history.conversation_id, history.window_start)
+        )
+        _summary_tasks.add(task)
+        task.add_done_callback(_summary_tasks.discard)
+
+
+async def update_history_summary(ai_service, conversation_id: str, window_start, max_messages: int = 40):
+    """
+    Fold the messages created before ``window_start`` and after the
+    conversation's ``history_summarized_until`` into its summary, the
+    oldest ``max_messages`` of them per call.
+
+    Runs after the response has been sent, with its own database session.
+    """
+    db = SessionLocal()
+    try:
+        conversation = db.get(Conversation, uuid.UUID(conversation_id))
+        if conversation is None:
+            return
+        query = db.query(Message).filter(
+            Message.conversation_id == conversation.id,
+            Message.is_deleted == False,  # noqa: E712
+            Message.created_at < window_start
+        )
+        if conversation.history_summarized_until is not None:
+            query = query.filter(Message.created_at > conversation.history_summarized_until)
+        # Oldest first: the watermark only advances past folded messages, and the
+        # next turn picks up whatever is left
+        pending = query.order_by(Message.created_at).limit(max_messages).all()
+        if not pending:
+            return
+
+        turns = "\n".join(f"{msg.role}: {msg.content[:_SUMMARY_MESSAGE_CHARS]}" for msg in pending)
+        prompt = SUMMARY_PROMPT.format(summary=conversation.history_summary or "(vacío)", turns=turns)
+        summary = await get_llm_scheduler().complete(
+            ai_service,
+            [AIMessage(role="user", content=prompt)],
+            system_prompt="",
+            priority=PRIORITY_LOW,
+            expected_output_tokens=400,
+            route_class=ROUTE_FAST
+        )
+        summary = summary.strip()
+        if not summary or summary.startswith(INBAND_ERROR_PREFIX):
+            logger.warning(f"Could not summarize history of conversation {conversation_id}: {summary[:200]}")
+            return
+
+        conversation.history_summary = summary
+        conversation.history_summarized_until = pending[-1].created_at
+        db.commit()
+        logger.info(f"Folded {len(pending)} messages into the history summary of conversation {conversation_id}")
+    except Exception as e:
+        logger.error(f"Error updating history summary of conversation {conversation_id}: {str(e)}")
+        db.rollback()
+    finally:
+        db.close()
+        _summarizing.discard(conversation_id)
+
+
+def get_history_manager(db: Session, ai_service) -> ConversationHistoryManager:
+    """History manager for a request's database session, with the configured limits."""
+    return ConversationHistoryManager(
+        db,
+        ai_service,
+        max_messages=settings.HISTORY_MAX_MESSAGES,
+        token_budget=settings.HISTORY_TOKEN_BUDGET
+    )
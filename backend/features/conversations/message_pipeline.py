@@ -2,18 +2,27 @@
 
 import json
 import asyncio
-from typing import AsyncGenerator, Optional
+from contextlib import aclosing, suppress
+from typing import AsyncGenerator, Awaitable, Callable, Optional
 from sqlalchemy.orm import Session
 
 from .prompt_augmentation import reformulate_user_question
-from .answer_generation.utils import fetch_and_parse_legal_context, build_enhanced_prompt
+from .question_classifier import get_question_classifier
+from .answer_generation.utils import fetch_and_parse_legal_context, build_enhanced_prompt, enhanced_prompt_prefix
 from .service import ConversationService
-from .schemas import SendMessageRequest, ConversationCreate, generate_title
+from .context import ConversationContext
+from .schemas import SendMessageRequest, ConversationCreate, MessageCreate, generate_title
 from features.subscription.rate_limit_service import RateLimitService
+from shared.utils.token_counting import count_tokens
 from core.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# How often the client connection is checked while a message is being processed
+DISCONNECT_POLL_SECONDS = 0.5
+# SSE events buffered ahead of a slow client before the pipeline waits
+MAX_BUFFERED_EVENTS = 16
+
 
 class MessagePipeline:
     """
@@ -28,23 +37,81 @@ class MessagePipeline:
     async def process_message(
         self, 
         user_id: str, 
-        data: SendMessageRequest
+        data: SendMessageRequest,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None
     ) -> AsyncGenerator[str, None]:
         """
         Process a user message through the complete pipeline and stream the response.
         
+        The pipeline runs in its own task. When ``is_disconnected`` reports
+        that the client went away (or this generator is closed), the task is
+        cancelled wherever it is: reformulation, retrieval or the AI stream.
+        A partial answer is saved as truncated and only the tokens generated
+        so far are recorded.
+        
         Args:
             user_id: The authenticated user ID
             data: The message request data
+            is_disconnected: Coroutine function telling whether the client disconnected
             
         Yields:
             Server-sent event formatted strings
         """
+        events: asyncio.Queue = asyncio.Queue(maxsize=MAX_BUFFERED_EVENTS)
+
+        async def _produce():
+            # aclosing: a cancellation while waiting on a full queue still unwinds the pipeline
+            async with aclosing(self._run_pipeline(user_id, data)) as pipeline_events:
+                async for event in pipeline_events:
+                    await events.put(event)
+
+        producer = asyncio.create_task(_produce())
+        loop = asyncio.get_running_loop()
+        last_check = loop.time()
+        next_event = None
+        try:
+            while True:
+                next_event = asyncio.ensure_future(events.get())
+                done, _ = await asyncio.wait(
+                    {next_event, producer},
+                    timeout=DISCONNECT_POLL_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if next_event in done:
+                    yield next_event.result()
+                else:
+                    next_event.cancel()
+                    if producer in done:
+                        while not events.empty():
+                            yield events.get_nowait()
+                        producer.result()
+                        return
+
+                # Chunks can arrive faster than the poll interval, so poll by elapsed time
+                if is_disconnected and loop.time() - last_check >= DISCONNECT_POLL_SECONDS:
+                    last_check = loop.time()
+                    if await is_disconnected():
+                        logger.info(f"Client disconnected, cancelling message processing for user {user_id}")
+                        return
+        finally:
+            if next_event is not None and not next_event.done():
+                next_event.cancel()
+            if not producer.done():
+                producer.cancel()
+                with suppress(asyncio.CancelledError):
+                    await producer
+
+    async def _run_pipeline(
+        self,
+        user_id: str,
+        data: SendMessageRequest
+    ) -> AsyncGenerator[str, None]:
+        """Run every pipeline step for one message, yielding SSE events."""
         try:
             logger.info(f"Processing message for user: {user_id}")
 
             # Step 1: Rate limiting
-            estimated_tokens = max(50, len(data.content) // 4)
+            estimated_tokens = max(50, count_tokens(data.content))
             rate_limit_check = await self.rate_limit_service.check_rate_limit(user_id, estimated_tokens)
 
             if not rate_limit_check.allowed:
@@ -64,44 +131,33 @@ class MessagePipeline:
                     title=generate_title(data.content)
                 )
                 conversation = self.conversation_service.create_conversation(user_id, conversation_data)
-                session_id = str(conversation.id)
+                context = self.conversation_service.context_for(conversation, load_messages=False)
+                session_id = context.session_id
                 # Update data.session_id so ALL downstream code uses the same session_id
                 data.session_id = session_id
                 # Yield session_id FIRST so frontend gets it BEFORE reformulation (which takes 2-3 seconds)
                 yield f"data: {json.dumps({'session_id': session_id})}\n\n"
                 logger.info(f"Created conversation {session_id} and yielded session_id to frontend")
-
-            # Step 2: Get conversation context (last 3 messages) if session exists
-            context_messages = None
-            if session_id:
-                try:
-                    logger.info(f"Attempting to load context for session_id: {session_id}")
-                    conversation = self.conversation_service.get_conversation_by_id(str(session_id), user_id)
-                    if conversation:
-                        logger.info(f"Conversation found. Total messages in conversation: {len(conversation.messages)}")
-                        if conversation.messages:
-                            # Get last 3 messages, sorted by created_at (excluding deleted ones)
-                            active_messages = [msg for msg in conversation.messages if not msg.is_deleted]
-                            recent_messages = sorted(active_messages, key=lambda m: m.created_at)[-3:]
-                            context_messages = [
-                                {
-                                    "role": msg.role,
-                                    "content": msg.content,
-                                    "metadata": msg.message_metadata if hasattr(msg, 'message_metadata') else None
-                                }
-                                for msg in recent_messages
-                            ]
-                            logger.info(f"Loaded {len(context_messages)} context messages for reformulation: {context_messages}")
-                        else:
-                            logger.info("No messages found in conversation")
-                    else:
-                        logger.info(f"Conversation not found for session_id: {session_id}")
-                except Exception as e:
-                    logger.warning(f"Could not load context messages: {str(e)}")
-                    # Continue without context
-
-            # Step 3: Question analysis and reformulation (with context)
-            reformulated_question = await reformulate_user_question(data.content, context_messages)
+            else:
+                # Step 2: Load the conversation once for the whole message: its last messages
+                # (one LIMIT query) are the reformulation context and the generation history
+                context = self.conversation_service.load_context(str(session_id), user_id)
+                if context is None:
+                    raise ValueError("Conversation not found")
+
+            context_messages = context.reformulation_messages()
+            if context_messages:
+                logger.info(f"Loaded {len(context_messages)} context messages for reformulation: {context_messages}")
+
+            # Step 3: Question analysis and reformulation (with context). Clearly legal,
+            # self-contained questions go to retrieval as written, without the LLM call
+            if get_question_classifier().should_skip_reformulation(data.content, context_messages):
+                logger.info("Question classifier: standalone legal question, skipping reformulation")
+                reformulated_question = data.content
+                reformulation_source = "classifier"
+            else:
+                reformulated_question = await reformulate_user_question(data.content, context_messages)
+                reformulation_source = "llm"
 
             # If there are files attached, bypass clarification/reformulation gates
             has_files = bool(getattr(data, 'files', None)) and len(getattr(data, 'files') or []) > 0
@@ -113,7 +169,7 @@ class MessagePipeline:
                     async for chunk in self._generate_non_legal_response(
                         user_id,
                         data.content,
-                        session_id
+                        context
                     ):
                         yield chunk
                     return
@@ -125,7 +181,7 @@ class MessagePipeline:
                         user_id,
                         data.content,  # original user question
                         clarification_text,
-                        session_id
+                        context
                     ):
                         yield chunk
                     return
@@ -137,19 +193,22 @@ class MessagePipeline:
                         user_id,
                         data.content,
                         reformulate_message,
-                        session_id
+                        context
                     ):
                         yield chunk
                     return
 
             # Step 7: Legal question processing pipeline (only if clear enough)
-            async for chunk in self._process_legal_question(
+            async with aclosing(self._process_legal_question(
                 user_id, 
                 data, 
                 reformulated_question,
-                estimated_tokens
-            ):
-                yield chunk
+                estimated_tokens,
+                context,
+                reformulation_source
+            )) as legal_chunks:
+                async for chunk in legal_chunks:
+                    yield chunk
 
         except Exception as e:
             logger.error(f"Error in message pipeline: {str(e)}")
@@ -179,233 +238,178 @@ class MessagePipeline:
         }
         yield f"data: {json.dumps(error_data)}\n\n"
 
-    async def _generate_non_legal_response(
+    def _save_fixed_response(
         self,
-        user_id: str,
+        context: ConversationContext,
         user_content: str,
-        session_id: Optional[str]
-    ) -> AsyncGenerator[str, None]:
-        """Generate response for non-legal questions.
+        response: str,
+        message_type: str
+    ):
+        """Store the user message and a fixed response (non-legal, clarification...) in one transaction.
 
-        IMPORTANT: Saves both user message and response to database.
+        Saved before streaming: the response is known up front, and both
+        messages are context for follow-up questions.
         """
-        non_legal_message = "Soy un asistente legal especializado en normativa argentina, estoy aquí para responder preguntas únicamente sobre la legislación argentina. ¿En qué puedo ayudarte hoy?"
-
+        count_tokens_fn = self.conversation_service.ai_service.count_tokens
+        self.conversation_service.save_turn(
+            context,
+            MessageCreate(
+                role="user",
+                content=user_content,
+                tokens_used=count_tokens_fn(user_content)
+            ),
+            MessageCreate(
+                role="assistant",
+                content=response,
+                tokens_used=count_tokens_fn(response),
+                metadata={"message_type": message_type}
+            )
+        )
+        logger.info(f"Saved {message_type} response to database for session {context.session_id}")
+
+    async def _stream_fixed_response(
+        self,
+        context: ConversationContext,
+        user_content: str,
+        response: str,
+        message_type: str
+    ) -> AsyncGenerator[str, None]:
+        """Save a fixed response with its user message, then stream it word by word."""
+        session_id = context.session_id
         try:
-            # Save user message to database (if we have a session)
-            if session_id:
-                from .schemas import MessageCreate
-                user_message_data = MessageCreate(
-                    role="user",
-                    content=user_content,
-                    tokens_used=self.conversation_service.ai_service.count_tokens(user_content)
-                )
-                self.conversation_service.create_message(session_id, user_message_data)
-                logger.info(f"Saved user message to database for session {session_id}")
+            self._save_fixed_response(context, user_content, response, message_type)
 
             # Stream the message word by word for a natural feel
-            words = non_legal_message.split()
+            words = response.split()
             for i, word in enumerate(words):
                 chunk = word + (" " if i < len(words) - 1 else "")
-                # Only include session_id if we have it
-                chunk_data = {'content': chunk}
-                if session_id:
-                    chunk_data['session_id'] = str(session_id)
-                yield f"data: {json.dumps(chunk_data)}\n\n"
+                yield f"data: {json.dumps({'content': chunk, 'session_id': session_id})}\n\n"
                 await asyncio.sleep(0.05)  # Small delay for natural typing effect
 
-            # Save assistant response to database (if we have a session)
-            if session_id:
-                assistant_message_data = MessageCreate(
-                    role="assistant",
-                    content=non_legal_message,
-                    tokens_used=self.conversation_service.ai_service.count_tokens(non_legal_message),
-                    metadata={"message_type": "non_legal"}
-                )
-                self.conversation_service.create_message(session_id, assistant_message_data)
-                logger.info(f"Saved non-legal response to database for session {session_id}")
-
-            # Send completion signal (must have session_id by now, or frontend will handle)
-            completion_data = {'content': '', 'done': True}
-            if session_id:
-                completion_data['session_id'] = str(session_id)
+            # Send completion signal (no norma_ids for fixed responses)
+            completion_data = {'content': '', 'done': True, 'session_id': session_id}
             yield f"data: {json.dumps(completion_data)}\n\n"
 
         except Exception as e:
-            logger.error(f"Error in non-legal streaming: {str(e)}")
-            error_data = {"content": f"Error: {str(e)}", "error": True}
-            if session_id:
-                error_data["session_id"] = str(session_id)
+            logger.error(f"Error in {message_type} streaming: {str(e)}")
+            error_data = {"content": f"Error: {str(e)}", "error": True, "session_id": session_id}
             yield f"data: {json.dumps(error_data)}\n\n"
 
+    async def _generate_non_legal_response(
+        self,
+        user_id: str,
+        user_content: str,
+        context: ConversationContext
+    ) -> AsyncGenerator[str, None]:
+        """Generate response for non-legal questions.
+
+        IMPORTANT: Saves both user message and response to database.
+        """
+        non_legal_message = "Soy un asistente legal especializado en normativa argentina, estoy aquí para responder preguntas únicamente sobre la legislación argentina. ¿En qué puedo ayudarte hoy?"
+
+        async for chunk in self._stream_fixed_response(context, user_content, non_legal_message, "non_legal"):
+            yield chunk
+
     async def _generate_clarification_response(
         self,
         user_id: str,
         user_content: str,
         clarification_text: str,
-        session_id: Optional[str]
+        context: ConversationContext
     ) -> AsyncGenerator[str, None]:
         """Generate response for clarification requests (vague questions).
 
-        IMPORTANT: This method now saves both the user message and clarification message
+        IMPORTANT: This method saves both the user message and clarification message
         to the database so they can be used as context for follow-up questions.
         """
-        try:
-            logger.info(f"Generating clarification response: {clarification_text}")
-
-            # Save user message to database (if we have a session)
-            if session_id:
-                from .schemas import MessageCreate
-                user_message_data = MessageCreate(
-                    role="user",
-                    content=user_content,
-                    tokens_used=self.conversation_service.ai_service.count_tokens(user_content)
-                )
-                self.conversation_service.create_message(session_id, user_message_data)
-                logger.info(f"Saved user message to database for session {session_id}")
-
-            # Stream the clarification question word by word for a natural feel
-            words = clarification_text.split()
-            for i, word in enumerate(words):
-                chunk = word + (" " if i < len(words) - 1 else "")
-                # Only include session_id if we have it
-                chunk_data = {'content': chunk}
-                if session_id:
-                    chunk_data['session_id'] = str(session_id)
-                yield f"data: {json.dumps(chunk_data)}\n\n"
-                await asyncio.sleep(0.05)  # Small delay for natural typing effect
-
-            # Save clarification response to database (if we have a session)
-            if session_id:
-                assistant_message_data = MessageCreate(
-                    role="assistant",
-                    content=clarification_text,
-                    tokens_used=self.conversation_service.ai_service.count_tokens(clarification_text),
-                    metadata={"message_type": "clarification"}
-                )
-                self.conversation_service.create_message(session_id, assistant_message_data)
-                logger.info(f"Saved clarification response to database for session {session_id}")
-
-            # Send completion signal (no norma_ids for clarifications)
-            completion_data = {'content': '', 'done': True}
-            if session_id:
-                completion_data['session_id'] = str(session_id)
-            yield f"data: {json.dumps(completion_data)}\n\n"
-
-        except Exception as e:
-            logger.error(f"Error in clarification streaming: {str(e)}")
-            error_data = {"content": f"Error: {str(e)}", "error": True}
-            if session_id:
-                error_data["session_id"] = str(session_id)
-            yield f"data: {json.dumps(error_data)}\n\n"
+        logger.info(f"Generating clarification response: {clarification_text}")
+        async for chunk in self._stream_fixed_response(context, user_content, clarification_text, "clarification"):
+            yield chunk
 
     async def _generate_reformulate_request_response(
         self,
         user_id: str,
         user_content: str,
         reformulate_message: str,
-        session_id: Optional[str]
+        context: ConversationContext
     ) -> AsyncGenerator[str, None]:
         """Generate response for reformulate requests (2nd clarification needed).
 
         IMPORTANT: Saves both user message and response to database.
         """
-        try:
-            logger.info(f"Generating reformulate request response: {reformulate_message}")
-
-            # Save user message to database (if we have a session)
-            if session_id:
-                from .schemas import MessageCreate
-                user_message_data = MessageCreate(
-                    role="user",
-                    content=user_content,
-                    tokens_used=self.conversation_service.ai_service.count_tokens(user_content)
-                )
-                self.conversation_service.create_message(session_id, user_message_data)
-                logger.info(f"Saved user message to database for session {session_id}")
-
-            # Stream the reformulate request word by word for a natural feel
-            words = reformulate_message.split()
-            for i, word in enumerate(words):
-                chunk = word + (" " if i < len(words) - 1 else "")
-                # Only include session_id if we have it
-                chunk_data = {'content': chunk}
-                if session_id:
-                    chunk_data['session_id'] = str(session_id)
-                yield f"data: {json.dumps(chunk_data)}\n\n"
-                await asyncio.sleep(0.05)  # Small delay for natural typing effect
-
-            # Save reformulate request response to database (if we have a session)
-            if session_id:
-                assistant_message_data = MessageCreate(
-                    role="assistant",
-                    content=reformulate_message,
-                    tokens_used=self.conversation_service.ai_service.count_tokens(reformulate_message),
-                    metadata={"message_type": "reformulate_request"}
-                )
-                self.conversation_service.create_message(session_id, assistant_message_data)
-                logger.info(f"Saved reformulate request response to database for session {session_id}")
-
-            # Send completion signal (no norma_ids for reformulate requests)
-            completion_data = {'content': '', 'done': True}
-            if session_id:
-                completion_data['session_id'] = str(session_id)
-            yield f"data: {json.dumps(completion_data)}\n\n"
-
-        except Exception as e:
-            logger.error(f"Error in reformulate request streaming: {str(e)}")
-            error_data = {"content": f"Error: {str(e)}", "error": True}
-            if session_id:
-                error_data["session_id"] = str(session_id)
-            yield f"data: {json.dumps(error_data)}\n\n"
+        logger.info(f"Generating reformulate request response: {reformulate_message}")
+        async for chunk in self._stream_fixed_response(context, user_content, reformulate_message, "reformulate_request"):
+            yield chunk
 
     async def _process_legal_question(
         self, 
         user_id: str, 
         data: SendMessageRequest, 
         reformulated_question: str,
-        estimated_tokens: int
+        estimated_tokens: int,
+        context: ConversationContext,
+        reformulation_source: str = "llm"
     ) -> AsyncGenerator[str, None]:
-        """Process legal questions through the full RAG pipeline."""
+        """Process legal questions through the full RAG pipeline, on the conversation context loaded for this message."""
         try:
             logger.info(f"Processing legal question. Original: {data.content}, Reformulated: {reformulated_question}")
             
-            # Step 1: Fetch legal context and norma IDs
-            normas_data, norma_ids = fetch_and_parse_legal_context(reformulated_question)
+            # Step 1: Fetch legal context and norma IDs (blocking HTTP calls, kept off the event loop)
+            normas_data, norma_ids, scores = await asyncio.to_thread(fetch_and_parse_legal_context, reformulated_question)
 
             # Step 2: Build enhanced prompt
-            enhanced_prompt = build_enhanced_prompt(data.content, normas_data, data.tone)
+            enhanced_prompt = build_enhanced_prompt(data.content, normas_data, data.tone, scores)
 
             # Step 3: Generate AI response
             ai_response_content = ""
-            actual_session_id = str(data.session_id) if data.session_id else None
+            actual_session_id = context.session_id
+            generation_started = False
+            usage = None
 
             try:
                 # Stream AI response chunks
-                async for chunk in self.conversation_service.stream_message_response(
+                async with aclosing(self.conversation_service.stream_message_response(
                     user_id=user_id,
                     content=data.content,  # Use original user content for message storage
                     session_id=str(data.session_id) if data.session_id else None,
                     chat_type=data.chat_type,
                     norma_ids=norma_ids,
                     enhanced_prompt=enhanced_prompt,  # Pass enhanced prompt separately for AI generation
-                    files=data.files  # Pass files to the AI service
-                ):
-                    # Handle session_id metadata chunk
-                    if isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == "session_id":
-                        actual_session_id = chunk[1]
-                        continue
-
-                    # Accumulate and stream content
-                    ai_response_content += chunk
-                    # Only include session_id if we have it
-                    chunk_data = {'content': chunk}
-                    if actual_session_id:
-                        chunk_data['session_id'] = actual_session_id
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
-
-                # Step 4: Record token usage
-                total_tokens = estimated_tokens + max(50, len(ai_response_content) // 4)
+                    files=data.files,  # Pass files to the AI service
+                    # Lets the classifier training skip answers it routed itself and
+                    # tell questions searched as written from rewritten ones
+                    extra_metadata={
+                        "reformulation_source": reformulation_source,
+                        "reformulated_query": reformulated_question
+                    },
+                    # Instructions the enhanced prompt starts with, cached provider-side when supported
+                    prompt_prefix=enhanced_prompt_prefix(data.tone),
+                    # Conversation and history already loaded by this pipeline
+                    context=context
+                )) as response_chunks:
+                    async for chunk in response_chunks:
+                        # Handle session_id metadata chunk
+                        if isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == "session_id":
+                            actual_session_id = chunk[1]
+                            continue
+                        if isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == "usage":
+                            usage = chunk[1]
+                            continue
+
+                        # Accumulate and stream content
+                        generation_started = True
+                        ai_response_content += chunk
+                        # Only include session_id if we have it
+                        chunk_data = {'content': chunk}
+                        if actual_session_id:
+                            chunk_data['session_id'] = actual_session_id
+                        yield f"data: {json.dumps(chunk_data)}\n\n"
+
+                # Step 4: Record token usage (prompt + output, as reported by the provider when available)
+                if usage is not None:
+                    total_tokens = usage.total_tokens
+                else:
+                    total_tokens = estimated_tokens + max(50, count_tokens(ai_response_content))
                 await self.rate_limit_service.record_usage(user_id, total_tokens)
                 logger.info(f"Conversation processed for user {user_id}, tokens: {total_tokens}")
 
@@ -419,6 +423,14 @@ class MessagePipeline:
                     completion_data['session_id'] = actual_session_id
                 yield f"data: {json.dumps(completion_data)}\n\n"
 
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client disconnected: bill only what was generated before the stream stopped
+                if generation_started:
+                    total_tokens = estimated_tokens + count_tokens(ai_response_content)
+                    await self.rate_limit_service.record_usage(user_id, total_tokens)
+                    logger.info(f"Generation cancelled for user {user_id}, tokens: {total_tokens}")
+                raise
+
             except Exception as e:
                 logger.error(f"Error in AI response streaming: {str(e)}")
                 error_data = {"content": f"Error: {str(e)}", "error": True}
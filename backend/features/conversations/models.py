@@ -25,6 +25,9 @@ class Conversation(Base):
     snippet = Column(Text, nullable=True)  # First user message preview
     system_prompt = Column(Text, nullable=True)
     total_tokens = Column(Integer, default=0)
+    # Rolling summary of the turns that no longer fit in the LLM history window
+    history_summary = Column(Text, nullable=True)
+    history_summarized_until = Column(DateTime(timezone=True), nullable=True)  # created_at of the last message folded in
     is_archived = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
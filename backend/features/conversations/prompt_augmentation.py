@@ -4,15 +4,19 @@ from typing import Tuple, Optional, List, Dict
 from core.utils.logging_config import get_logger
 from core.clients.embedding import get_embedding
 from .ai_service import get_ai_service_instance
-from .ai_services.base import Message
+from core.config.config import settings
+from shared.utils.llm_cache import describe_model
+from .ai_services.base import Message, ROUTE_FAST, INBAND_ERROR_PREFIX
 from .reformulation_prompts import get_reformulation_prompt
+from .reformulation_cache import get_reformulation_cache, reformulation_key
 
 logger = get_logger(__name__)
 
 
 async def reformulate_user_question(
     user_question: str,
-    context_messages: Optional[List[Dict[str, str]]] = None
+    context_messages: Optional[List[Dict[str, str]]] = None,
+    use_cache: bool = True
 ) -> str:
     """
     Reformulate a user question with optional conversation context.
@@ -25,6 +29,7 @@ async def reformulate_user_question(
         user_question: The current user question
         context_messages: Optional list of previous messages in format [{"role": "user", "content": "..."}, ...]
                          Maximum of 3 messages (últimos 3 mensajes totales)
+        use_cache: Set to False to always call the LLM (evaluating prompts or models)
 
     Returns:
         Reformulated question or special keyword (NON-LEGAL, CLARIFICATION:..., REFORMULATE_REQUEST)
@@ -62,12 +67,21 @@ async def reformulate_user_question(
             context=context_str
         )
 
+        # Identical prompts (retries, regenerated answers, common first questions) get the same rewrite
+        cache = get_reformulation_cache() if use_cache and settings.REFORMULATION_CACHE_ENABLED else None
+        cache_key = reformulation_key(reformulation_prompt, describe_model(ai_service)) if cache else None
+        if cache:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Reformulation cache hit: {user_question} -> {cached}")
+                return cached
+
         # Create a message for the AI service
         reformulation_messages = [Message(role="user", content=reformulation_prompt)]
 
         # Collect the reformulated question from the AI service
         reformulated_question = ""
-        async for chunk in ai_service.generate_stream(reformulation_messages, system_prompt=""):
+        async for chunk in ai_service.generate_stream(reformulation_messages, system_prompt="", route_class=ROUTE_FAST):
             reformulated_question += chunk
 
         reformulated = reformulated_question.strip()
@@ -76,6 +90,9 @@ async def reformulate_user_question(
         logger.info(f"Context: {context_str}")
         logger.info(f"Reformulated question: {reformulated}")
 
+        if cache and reformulated and not reformulated.startswith(INBAND_ERROR_PREFIX):
+            cache.put(cache_key, reformulated)
+
         return reformulated if reformulated else user_question
 
     except Exception as e:
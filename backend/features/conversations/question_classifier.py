@@ -0,0 +1,248 @@
+"""Local pre-classifier that decides when the reformulation LLM call can be skipped."""
+
+import json
+import math
+import os
+import random
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "question_classifier_model.json")
+
+# Assistant message types produced when the reformulation did not return a search query
+NON_QUERY_MESSAGE_TYPES = ("non_legal", "clarification", "reformulate_request")
+
+_LEGAL_REFERENCE = re.compile(
+    r"\b(ley|leyes|decreto|dnu|resolucion|disposicion|articulo|art|inciso|codigo|constitucion|"
+    r"norma|normativa|reglamento|reglamentacion|convenio|tratado|boletin oficial)\b"
+)
+_NORM_NUMBER = re.compile(r"\b\d{1,3}(?:\.\d{3})+\b|\b\d+/\d{2,4}\b|\b(?:articulo|art)\.?\s*\d+")
+# A numbered law, decree or resolution: names the norm without help from earlier turns ("articulo 15" does not)
+_SPECIFIC_NORM = re.compile(
+    r"\b\d{1,3}(?:\.\d{3})+\b|\b\d+/\d{2,4}\b|"
+    r"\b(?:ley|decreto|dnu|resolucion|disposicion)\s*(?:n[o°º]?\.?\s*)?\d+"
+)
+_LEGAL_TERM = re.compile(
+    r"\b(derech\w*|obligaci\w*|contrat\w*|despid\w*|despedi\w*|indemniza\w*|jubila\w*|impuest\w*|"
+    r"sancion\w*|multa\w*|demand\w*|juicio\w*|herencia\w*|divorci\w*|alquiler\w*|locacion\w*|"
+    r"sociedad\w*|monotribut\w*|ganancias|licencia\w*|vacaciones|aguinaldo|trabajador\w*|"
+    r"empleador\w*|requisit\w*|plazo\w*|tramit\w*|habilitaci\w*|permiso\w*|delito\w*|pena\w*)\b"
+)
+_QUESTION = re.compile(r"[¿?]|^(que|cual|cuales|como|cuando|donde|puedo|debo|es legal|existe|hay)\b")
+_GREETING = re.compile(r"^(hola|buen[oa]s|gracias|chau|ok|dale|genial|perfecto)\b")
+# References to earlier turns: the question is not self-contained
+_ANAPHORA = re.compile(
+    r"\b(eso|esa|ese|esto|esta|aquello|lo anterior|lo mismo|tambien|y si|y en|y para|y el|y la|y los|y las|"
+    r"el mismo|la misma|dicha|dicho|mencionad\w*)\b"
+)
+_WORD = re.compile(r"\w+")
+
+# Prior used until a model is trained from logged outcomes (scripts/train-question-classifier.py).
+# Conservative: only explicit references to a norm, asked as a question, clear the threshold
+PRIOR_WEIGHTS: Dict[str, float] = {
+    "bias": -2.5,
+    "legal_reference": 2.0,
+    "norm_number": 2.5,
+    "legal_terms": 0.8,
+    "question": 0.7,
+    "greeting": -3.0,
+    "anaphora": -1.5,
+    "anaphora_with_context": -3.0,
+    "has_context": -0.5,
+    "length_short": -2.0,
+    "length_long": -0.5,
+}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and strip accents, so the patterns match "artículo" and "articulo" alike."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).strip()
+
+
+def names_specific_norm(question: str) -> bool:
+    """Whether ``question`` cites a law, decree or resolution by number."""
+    return bool(_SPECIFIC_NORM.search(normalize_text(question)))
+
+
+def same_query(question: str, reformulated: str) -> bool:
+    """Whether a reformulation kept the question as written (ignoring case, accents and punctuation)."""
+    return _WORD.findall(normalize_text(question)) == _WORD.findall(normalize_text(reformulated))
+
+
+def extract_features(question: str, has_context: bool) -> Dict[str, float]:
+    """Regex and word features of a user question."""
+    text = normalize_text(question)
+    words = _WORD.findall(text)
+    anaphora = bool(_ANAPHORA.search(text))
+    features = {
+        "bias": 1.0,
+        "legal_reference": float(bool(_LEGAL_REFERENCE.search(text))),
+        "norm_number": float(bool(_NORM_NUMBER.search(text))),
+        "legal_terms": float(min(3, len(_LEGAL_TERM.findall(text)))),
+        "question": float(bool(_QUESTION.search(text))),
+        "greeting": float(bool(_GREETING.search(text))),
+        "anaphora": float(anaphora),
+        "anaphora_with_context": float(anaphora and has_context),
+        "has_context": float(has_context),
+        "length_short": float(len(words) < 4),
+        "length_long": float(len(words) > 40),
+    }
+    for word in set(words):
+        if len(word) > 2:
+            features[f"w:{word}"] = 1.0
+    return {name: value for name, value in features.items() if value}
+
+
+def _sigmoid(score: float) -> float:
+    if score < -30:
+        return 0.0
+    return 1.0 / (1.0 + math.exp(-score))
+
+
+def predict(weights: Dict[str, float], features: Dict[str, float]) -> float:
+    """Probability of a standalone legal question under ``weights``."""
+    return _sigmoid(sum(weights.get(name, 0.0) * value for name, value in features.items()))
+
+
+class QuestionClassifier:
+    """
+    Logistic model over ``extract_features`` estimating the probability that
+    the reformulation LLM would treat a message as a self-contained legal
+    question. Above ``threshold`` the pipeline searches with the question as
+    written and skips the LLM call.
+
+    Questions following a clarification request are never skipped: there the
+    reformulation merges the answer with the earlier question. In an ongoing
+    conversation only questions naming a numbered norm are skipped; others
+    ("¿y el artículo 15?") may need the earlier turns to be searchable.
+    """
+
+    def __init__(self, weights: Dict[str, float], threshold: float, source: str = "prior"):
+        self.weights = weights
+        self.threshold = threshold
+        self.source = source
+        self._decisions = 0
+        self._skipped = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, threshold: Optional[float] = None) -> "QuestionClassifier":
+        """Trained model from ``path``, or the prior weights when there is none."""
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    model = json.load(f)
+                classifier = cls(model["weights"], threshold or model["threshold"], source=path)
+                logger.info(
+                    f"Loaded question classifier trained on {model.get('examples')} examples "
+                    f"(threshold {classifier.threshold}, expected skip rate {model.get('skip_rate')})"
+                )
+                return classifier
+            except Exception as e:
+                logger.warning(f"Could not load question classifier from {path}, using the prior: {str(e)}")
+        return cls(dict(PRIOR_WEIGHTS), threshold or 0.9)
+
+    def probability(self, question: str, has_context: bool = False) -> float:
+        return predict(self.weights, extract_features(question, has_context))
+
+    def should_skip_reformulation(
+        self,
+        question: str,
+        context_messages: Optional[List[Dict[str, Any]]] = None
+    ) -> bool:
+        """Whether ``question`` can go to retrieval as written."""
+        follows_clarification = any(
+            msg.get("role") == "assistant"
+            and (msg.get("metadata") or {}).get("message_type") in NON_QUERY_MESSAGE_TYPES
+            for msg in context_messages or []
+        )
+        needs_context = bool(context_messages) and not names_specific_norm(question)
+        skip = (
+            not follows_clarification
+            and not needs_context
+            and self.probability(question, bool(context_messages)) >= self.threshold
+        )
+
+        with self._lock:
+            self._decisions += 1
+            self._skipped += int(skip)
+            if self._decisions % 100 == 0:
+                logger.info(
+                    f"Question classifier skipped reformulation for {self._skipped}/{self._decisions} "
+                    f"messages ({self._skipped / self._decisions:.0%})"
+                )
+        return skip
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model": self.source,
+                "threshold": self.threshold,
+                "decisions": self._decisions,
+                "skipped": self._skipped,
+                "skip_rate": self._skipped / self._decisions if self._decisions else 0.0
+            }
+
+
+def train_weights(
+    examples: List[Tuple[Dict[str, float], int]],
+    epochs: int = 15,
+    learning_rate: float = 0.1,
+    l2: float = 1e-4,
+    seed: int = 42
+) -> Dict[str, float]:
+    """Fit logistic regression weights with SGD, starting from the prior."""
+    weights = dict(PRIOR_WEIGHTS)
+    order = list(range(len(examples)))
+    rng = random.Random(seed)
+    for epoch in range(epochs):
+        rng.shuffle(order)
+        rate = learning_rate / (1 + epoch)
+        for index in order:
+            features, label = examples[index]
+            error = predict(weights, features) - label
+            for name, value in features.items():
+                weight = weights.get(name, 0.0)
+                weights[name] = weight - rate * (error * value + l2 * weight)
+    return {name: round(weight, 5) for name, weight in weights.items() if abs(weight) > 1e-4}
+
+
+def choose_threshold(
+    scored: Iterable[Tuple[float, int]],
+    min_precision: float
+) -> Tuple[float, float, float]:
+    """
+    Lowest threshold whose skipped messages are legal questions at least
+    ``min_precision`` of the time. Returns (threshold, precision, skip_rate).
+    """
+    scored = sorted(scored, reverse=True)
+    best = (1.0, 1.0, 0.0)
+    positives = 0
+    for count, (probability, label) in enumerate(scored, start=1):
+        positives += label
+        precision = positives / count
+        if precision >= min_precision:
+            best = (probability, precision, count / len(scored))
+    return best
+
+
+_classifier_instance = None
+
+
+def get_question_classifier() -> QuestionClassifier:
+    """Get a singleton instance of the QuestionClassifier."""
+    global _classifier_instance
+    if _classifier_instance is None:
+        _classifier_instance = QuestionClassifier.load(
+            settings.QUESTION_CLASSIFIER_MODEL_PATH or DEFAULT_MODEL_PATH,
+            threshold=settings.QUESTION_CLASSIFIER_THRESHOLD
+        )
+    return _classifier_instance
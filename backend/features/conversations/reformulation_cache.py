@@ -0,0 +1,97 @@
+"""In-process cache of question reformulations."""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def reformulation_key(prompt: str, model: str) -> str:
+    """SHA-256 of the formatted reformulation prompt and the model answering it."""
+    digest = hashlib.sha256()
+    digest.update(model.encode("utf-8"))
+    digest.update(b"\x00")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ReformulationCache:
+    """
+    Reformulation outputs keyed by ``reformulation_key``.
+
+    The formatted prompt already holds the question, the last messages of
+    context and the prompt template, so retries, regenerated answers and
+    common first questions (empty context) hit the same entry, and editing
+    a template simply stops matching the old entries.
+
+    - Entries are kept for ``ttl`` seconds.
+    - At most ``max_entries`` are kept, least recently used first out.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        """Cached reformulation for ``key``, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+            lookups = self._hits + self._misses
+            if lookups % 100 == 0:
+                logger.info(f"Reformulation cache: {self._hits}/{lookups} hits ({self._hits / lookups:.0%})")
+            return entry[1] if entry is not None else None
+
+    def put(self, key: str, reformulation: str):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, reformulation)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0
+            }
+
+
+_cache_instance = None
+
+
+def get_reformulation_cache() -> ReformulationCache:
+    """Get a singleton instance of the ReformulationCache."""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = ReformulationCache(
+            ttl=settings.REFORMULATION_CACHE_TTL_SECONDS,
+            max_entries=settings.REFORMULATION_CACHE_MAX_ENTRIES
+        )
+    return _cache_instance
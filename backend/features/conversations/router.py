@@ -167,7 +167,7 @@ async def send_message(
             logger.info("Incoming /message files logging failed")
 
         return StreamingResponse(
-            pipeline.process_message(user_id, data),
+            pipeline.process_message(user_id, data, is_disconnected=request.is_disconnected),
             media_type="text/event-stream",
             headers={
                 "Cache-Control": "no-cache",
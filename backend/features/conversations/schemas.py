@@ -5,6 +5,8 @@ from typing import Optional, List, Literal
 from uuid import UUID
 from pydantic import BaseModel, Field, validator, model_validator
 
+from shared.utils.token_counting import static_segment
+
 
 # Chat types
 ChatType = Literal["normativa_nacional", "constituciones", "norma_chat"]
@@ -255,7 +257,7 @@ SYSTEM_PROMPTS = {
 
 def get_system_prompt(chat_type: ChatType) -> str:
     """Get the default system prompt for a chat type."""
-    return SYSTEM_PROMPTS.get(chat_type, SYSTEM_PROMPTS["normativa_nacional"])
+    return static_segment(SYSTEM_PROMPTS.get(chat_type, SYSTEM_PROMPTS["normativa_nacional"]))
 
 
 def generate_snippet(content: str, max_length: int = 100) -> str:
@@ -1,7 +1,8 @@
 """Business logic service for conversations."""
 
+import asyncio
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import List, Optional, Tuple
 from sqlalchemy import select, func, and_, or_
 from sqlalchemy.orm import Session
@@ -18,6 +19,9 @@ from .schemas import (
     generate_title
 )
 from .ai_service import get_ai_service_instance, Message as AIMessage
+from .ai_services.base import TokenUsage, PromptPrefix
+from .history import get_history_manager
+from .context import ConversationContext
 from core.utils.logging_config import get_logger
 
 logger = get_logger(__name__)
@@ -29,6 +33,7 @@ class ConversationService:
     def __init__(self, db: Session):
         self.db = db
         self.ai_service = get_ai_service_instance()
+        self.history = get_history_manager(db, self.ai_service)
     
     def get_conversations(
         self, 
@@ -74,13 +79,15 @@ class ConversationService:
     def get_conversation_by_id(
         self, 
         conversation_id: str, 
-        user_id: str
+        user_id: str,
+        load_messages: bool = True
     ) -> Optional[Conversation]:
-        """Get a conversation by ID with all messages."""
+        """Get a conversation by ID with all messages (``load_messages=False`` for the conversation row only)."""
         try:
-            query = select(Conversation).options(
-                selectinload(Conversation.messages)
-            ).where(
+            query = select(Conversation)
+            if load_messages:
+                query = query.options(selectinload(Conversation.messages))
+            query = query.where(
                 and_(
                     Conversation.id == conversation_id,
                     Conversation.user_id == user_id,
@@ -91,7 +98,7 @@ class ConversationService:
             result = self.db.execute(query)
             conversation = result.scalar_one_or_none()
             
-            if conversation:
+            if conversation and load_messages:
                 # Sort messages by created_at
                 conversation.messages.sort(key=lambda m: m.created_at)
             
@@ -201,14 +208,7 @@ class ConversationService:
     ) -> Message:
         """Create a new message."""
         try:
-            message = Message(
-                conversation_id=session_id,
-                role=data.role,
-                content=data.content,
-                tokens_used=data.tokens_used,
-                message_metadata=data.metadata,
-                attached_file_names=data.attached_file_names
-            )
+            message = self._new_message(session_id, data)
             
             self.db.add(message)
             self.db.commit()
@@ -221,6 +221,92 @@ class ConversationService:
             self.db.rollback()
             raise
     
+    def _new_message(self, session_id, data: MessageCreate, created_at: Optional[datetime] = None) -> Message:
+        message = Message(
+            conversation_id=session_id,
+            role=data.role,
+            content=data.content,
+            tokens_used=data.tokens_used,
+            message_metadata=data.metadata,
+            attached_file_names=data.attached_file_names
+        )
+        if created_at is not None:
+            message.created_at = created_at
+        return message
+    
+    def load_context(self, session_id: str, user_id: str) -> Optional[ConversationContext]:
+        """Context of conversation ``session_id`` for one message, or None if it does not exist."""
+        conversation = self.get_conversation_by_id(session_id, user_id, load_messages=False)
+        if conversation is None:
+            return None
+        return self.context_for(conversation)
+    
+    def context_for(self, conversation: Conversation, load_messages: bool = True) -> ConversationContext:
+        """Context of ``conversation`` for one message (``load_messages=False`` for a new conversation)."""
+        # One extra row tells the history window whether anything older exists
+        recent = self.history.recent_messages(conversation.id, self.history.max_messages + 1) if load_messages else []
+        return ConversationContext(conversation, recent, self.history.window(conversation, recent))
+    
+    def save_turn(
+        self,
+        context: ConversationContext,
+        user_message_data: MessageCreate,
+        assistant_message_data: Optional[MessageCreate] = None
+    ) -> Tuple[Message, Optional[Message]]:
+        """
+        Persist one turn in a single transaction: the user message, its
+        answer (if any) and the conversation's counters.
+        """
+        conversation = context.conversation
+        try:
+            user_message = self._new_message(conversation.id, user_message_data, created_at=context.received_at)
+            messages = [user_message]
+            assistant_message = None
+            if assistant_message_data is not None:
+                assistant_message = self._new_message(
+                    conversation.id, assistant_message_data, created_at=datetime.now(timezone.utc)
+                )
+                messages.append(assistant_message)
+            self.db.add_all(messages)
+            
+            # Update conversation
+            conversation.updated_at = datetime.utcnow()
+            conversation.total_tokens = (conversation.total_tokens or 0) + sum(msg.tokens_used or 0 for msg in messages)
+            
+            # Update snippet if this is the first message
+            if not conversation.snippet:
+                conversation.snippet = generate_snippet(user_message_data.content)
+            
+            self.db.commit()
+        except Exception as e:
+            logger.error(f"Error saving turn for conversation {context.session_id}: {str(e)}")
+            self.db.rollback()
+            raise
+        
+        self.history.schedule_summary_update(context.history)
+        return user_message, assistant_message
+    
+    def _start_context(
+        self,
+        user_id: str,
+        content: str,
+        session_id: Optional[str],
+        chat_type: str
+    ) -> ConversationContext:
+        """Context of an existing conversation, or of a new one created for ``content``."""
+        if session_id:
+            context = self.load_context(session_id, user_id)
+            if context is None:
+                raise ValueError("Conversation not found")
+            return context
+        # Create new conversation
+        conversation_data = ConversationCreate(
+            chat_type=chat_type,
+            title=generate_title(content)
+        )
+        conversation = self.create_conversation(user_id, conversation_data)
+        return self.context_for(conversation, load_messages=False)
+    
     async def send_message_and_get_response(
         self, 
         user_id: str,
@@ -230,34 +316,16 @@ class ConversationService:
     ) -> Tuple[Conversation, Message, Message]:
         """Send a message and get AI response."""
         try:
-            # Get or create conversation
-            if session_id:
-                conversation = self.get_conversation_by_id(session_id, user_id)
-                if not conversation:
-                    raise ValueError("Conversation not found")
-            else:
-                # Create new conversation
-                conversation_data = ConversationCreate(
-                    chat_type=chat_type,
-                    title=generate_title(content)
-                )
-                conversation = self.create_conversation(user_id, conversation_data)
-                session_id = str(conversation.id)
+            # Get or create conversation, with its history (recent messages and the summary of older ones)
+            context = self._start_context(user_id, content, session_id, chat_type)
+            conversation = context.conversation
+            history_messages = context.history.to_ai_messages()
             
-            # Create user message
             user_message_data = MessageCreate(
                 role="user",
                 content=content,
                 tokens_used=self.ai_service.count_tokens(content)
             )
-            user_message = self.create_message(session_id, user_message_data)
-            
-            # Get conversation history for context
-            history_messages = [
-                AIMessage(role=msg.role, content=msg.content) 
-                for msg in conversation.messages 
-                if not msg.is_deleted
-            ]
             
             # Add the new user message to history
             history_messages.append(AIMessage(role="user", content=content))
@@ -273,26 +341,15 @@ class ConversationService:
             ):
                 ai_response_content += chunk
             
-            # Create assistant message
             assistant_message_data = MessageCreate(
                 role="assistant",
                 content=ai_response_content,
                 tokens_used=self.ai_service.count_tokens(ai_response_content),
                 metadata={"relevant_docs": []}  # TODO: Add RAG integration
             )
-            assistant_message = self.create_message(session_id, assistant_message_data)
+            user_message, assistant_message = self.save_turn(context, user_message_data, assistant_message_data)
             
-            # Update conversation
-            conversation.updated_at = datetime.utcnow()
-            conversation.total_tokens += user_message.tokens_used + assistant_message.tokens_used
-            
-            # Update snippet if this is the first message
-            if not conversation.snippet:
-                conversation.snippet = generate_snippet(content)
-            
-            self.db.commit()
-            
-            logger.info(f"Processed message for conversation {session_id}")
+            logger.info(f"Processed message for conversation {context.session_id}")
             return conversation, user_message, assistant_message
             
         except Exception as e:
@@ -308,47 +365,44 @@ class ConversationService:
         chat_type: str = "normativa_nacional",
         norma_ids: Optional[List[int]] = None,
         enhanced_prompt: Optional[str] = None,
-        files: Optional[List] = None
+        files: Optional[List] = None,
+        extra_metadata: Optional[dict] = None,
+        prompt_prefix: Optional[PromptPrefix] = None,
+        context: Optional[ConversationContext] = None
     ):
-        """Stream AI response for a message."""
+        """
+        Stream AI response for a message.
+        
+        ``context`` is the conversation already loaded for this message;
+        without it the conversation is loaded (or created) here. The user
+        message and the answer are stored together once the stream ends.
+        """
         try:
             # Get or create conversation
-            if session_id:
-                conversation = self.get_conversation_by_id(session_id, user_id)
-                if not conversation:
-                    raise ValueError("Conversation not found")
-            else:
-                # Create new conversation
-                conversation_data = ConversationCreate(
-                    chat_type=chat_type,
-                    title=generate_title(content)
-                )
-                conversation = self.create_conversation(user_id, conversation_data)
-                session_id = str(conversation.id)
+            if context is None:
+                context = self._start_context(user_id, content, session_id, chat_type)
+            conversation = context.conversation
+            session_id = context.session_id
             
             # Yield the session_id first so the router knows what it is
             yield ("session_id", session_id)
             
+            # Conversation history for context (recent messages and the summary of older ones)
+            history = context.history
+            history_messages = history.to_ai_messages()
+            
             # Extract file names if files are provided
             attached_file_names = None
             if files:
                 attached_file_names = [file.name for file in files]
             
-            # Create user message
+            # User message, stored with the answer
             user_message_data = MessageCreate(
                 role="user",
                 content=content,
                 tokens_used=self.ai_service.count_tokens(content),
                 attached_file_names=attached_file_names
             )
-            user_message = self.create_message(session_id, user_message_data)
-            
-            # Get conversation history for context
-            history_messages = [
-                AIMessage(role=msg.role, content=msg.content) 
-                for msg in conversation.messages 
-                if not msg.is_deleted
-            ]
             
             # Add the new user message to history for context
             # Use enhanced_prompt if provided, otherwise use original content
@@ -380,40 +434,77 @@ class ConversationService:
             system_prompt = conversation.system_prompt or get_system_prompt(chat_type)
             ai_response_content = ""
             
-            # Stream AI response
-            async for chunk in self.ai_service.generate_stream(
-                history_messages, 
-                system_prompt
-            ):
-                ai_response_content += chunk
-                yield chunk
-            
-            # Create assistant message after streaming is complete
             metadata = {"relevant_docs": []}
             if norma_ids:
                 metadata["relevant_docs"] = norma_ids
-                
+            if extra_metadata:
+                metadata.update(extra_metadata)
+            
+            # Stream AI response (the provider fills in usage when it reports token counts)
+            usage = TokenUsage()
+            try:
+                async for chunk in self.ai_service.generate_stream(
+                    history_messages, 
+                    system_prompt,
+                    usage=usage,
+                    prompt_prefix=prompt_prefix
+                ):
+                    ai_response_content += chunk
+                    yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                # Client disconnected mid-answer: keep the question and what was generated, flagged as truncated
+                self._save_truncated_response(context, user_message_data, ai_response_content, metadata)
+                raise
+            
+            if not usage.reported:
+                # Local estimate; stored history messages already carry their counts
+                usage.prompt_tokens = (
+                    self.ai_service.count_tokens(system_prompt)
+                    + history.tokens
+                    + self.ai_service.count_tokens(user_content_for_ai)
+                )
+                usage.output_tokens = self.ai_service.count_tokens(ai_response_content)
+            
+            # Store the user message, the answer and the conversation counters together
             assistant_message_data = MessageCreate(
                 role="assistant",
                 content=ai_response_content,
-                tokens_used=self.ai_service.count_tokens(ai_response_content),
+                tokens_used=usage.output_tokens,
                 metadata=metadata
             )
-            assistant_message = self.create_message(session_id, assistant_message_data)
+            self.save_turn(context, user_message_data, assistant_message_data)
             
-            # Update conversation
-            conversation.updated_at = datetime.utcnow()
-            conversation.total_tokens += user_message.tokens_used + assistant_message.tokens_used
-            
-            # Update snippet if this is the first message
-            if not conversation.snippet:
-                conversation.snippet = generate_snippet(content)
-            
-            self.db.commit()
+            logger.info(
+                f"Streamed response for conversation {session_id} "
+                f"({usage.prompt_tokens} prompt + {usage.output_tokens} output tokens, {usage.source})"
+            )
             
-            logger.info(f"Streamed response for conversation {session_id}")
+            # Finally, the token usage of the whole generation, for billing
+            yield ("usage", usage)
             
         except Exception as e:
             logger.error(f"Error streaming message response: {str(e)}")
             self.db.rollback()
-            raise
\ No newline at end of file
+            raise
+    
+    def _save_truncated_response(
+        self,
+        context: ConversationContext,
+        user_message_data: MessageCreate,
+        content: str,
+        metadata: dict
+    ):
+        """Persist the user message and the partial answer (if any) of a cancelled stream."""
+        try:
+            assistant_message_data = None
+            if content:
+                assistant_message_data = MessageCreate(
+                    role="assistant",
+                    content=content,
+                    tokens_used=self.ai_service.count_tokens(content),
+                    metadata={**metadata, "truncated": True}
+                )
+            self.save_turn(context, user_message_data, assistant_message_data)
+            logger.info(f"Saved truncated response for conversation {context.session_id}")
+        except Exception as e:
+            logger.error(f"Error saving truncated response: {str(e)}")
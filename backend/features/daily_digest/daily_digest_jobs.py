@@ -0,0 +1,34 @@
+"""Background job handlers for the daily digest feature."""
+
+from datetime import date
+from typing import Any, Dict
+
+from core.database.base import SessionLocal
+from features.jobs.jobs_service import JobContext
+from .daily_digest_service import DailyDigestService
+
+
+async def run_daily_newspaper_digest_job(ctx: JobContext) -> Dict[str, Any]:
+    """Generate the newspaper-style digest for the payload's target_date."""
+    target_date = date.fromisoformat(ctx.payload["target_date"])
+    ctx.report_progress(0, f"Generating newspaper digest for {target_date}")
+
+    db = SessionLocal()
+    try:
+        result = await DailyDigestService().generate_daily_newspaper_digest(
+            db=db,
+            target_date=target_date,
+            force=ctx.payload.get("force", False),
+            sections=ctx.payload.get("sections")
+        )
+    finally:
+        db.close()
+
+    return {
+        "success": result["success"],
+        "message": result["message"],
+        "date": str(result["date"]),
+        "normas_analyzed": result.get("normas_analyzed", 0),
+        "sections_generated": result.get("sections_generated", 0),
+        "sections_deferred": result.get("sections_deferred", [])
+    }
@@ -6,6 +6,7 @@ from typing import List, Optional
 from datetime import date
 from core.database.base import get_db
 from core.utils.logging_config import get_logger
+from features.jobs.jobs_service import enqueue_job
 from features.auth.auth_utils import get_current_user, get_current_user_id
 from .daily_digest_models import DailyDigestNewspaper
 from .daily_digest_schemas import (
@@ -280,6 +281,8 @@ async def get_newspaper_digest(
 @router.post("/daily-digest/generate-newspaper/")
 async def generate_newspaper_digest(
     target_date: Optional[date] = None,
+    force: bool = Query(False, description="Regenerate sections that already exist"),
+    sections: Optional[List[str]] = Query(None, description="With force, section types to regenerate (default all)"),
     db: Session = Depends(get_db)
 ):
     """
@@ -295,25 +298,29 @@ async def generate_newspaper_digest(
     - LLM analysis with impact scores and themes
     - Priority ranking by norma type and impact
     - Section generation with tailored content
+    
+    Runs as a background job; returns the job id immediately so progress can
+    be polled at /jobs/{job_id}/. Analyses and sections are stored as they
+    complete, so triggering a failed date again resumes it; `force` with
+    `sections` (e.g. hero, secondary or a theme) regenerates only those.
     """
     actual_date = target_date or date.today()
     logger.info(f"Triggering newspaper digest generation for {actual_date}")
     
     try:
-        digest_service = DailyDigestService()
-        
-        # Generate the newspaper-style digest
-        result = await digest_service.generate_daily_newspaper_digest(
-            db=db,
-            target_date=actual_date
+        job = enqueue_job(
+            db,
+            "daily_newspaper_digest",
+            payload={"target_date": actual_date.isoformat(), "force": force, "sections": sections},
+            dedupe_key=f"daily_newspaper_digest:{actual_date}"
         )
         
         return {
-            "success": result["success"],
-            "message": result["message"],
-            "date": str(result["date"]),
-            "normas_analyzed": result.get("normas_analyzed", 0),
-            "sections_generated": result.get("sections_generated", 0)
+            "success": True,
+            "message": f"Newspaper digest generation for {actual_date} queued",
+            "date": str(actual_date),
+            "job_id": str(job.id),
+            "status": job.status
         }
         
     except Exception as e:
@@ -321,4 +328,4 @@ async def generate_newspaper_digest(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating newspaper digest: {str(e)}"
-        )
\ No newline at end of file
+        )
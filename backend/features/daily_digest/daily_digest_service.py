@@ -1,16 +1,30 @@
 """Service layer for daily digest generation with newspaper-style structure."""
 
-import asyncio
 import json
 import uuid
-from datetime import date, datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
-import time
+from datetime import date, datetime
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from core.utils.logging_config import get_logger
 from features.conversations.ai_service import get_ai_service_instance
 from features.conversations.ai_services.base import Message
 from shared.utils.norma_reconstruction import get_norma_reconstructor
+from shared.utils.llm_scheduler import (
+    get_llm_scheduler,
+    gather_cancel_on_error,
+    LLMRateLimitError,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL,
+    PRIORITY_LOW
+)
+from shared.utils.llm_batching import pack_batches, parse_llm_json, split_batch_response
+from shared.utils.llm_cache import (
+    LLMResultCache,
+    get_llm_result_cache,
+    content_hash,
+    describe_model,
+    truncated_version
+)
 from .daily_digest_models import (
     DigestPreferences, 
     DailyDigestOrganismSummary, 
@@ -21,6 +35,98 @@ from features.auth.auth_models import User
 
 logger = get_logger(__name__)
 
+# Bump when the analysis prompt changes so cached analyses are not reused
+ANALYSIS_PROMPT_VERSION = "daily_analysis/v1"
+
+# Batched analysis: several normas per LLM call, bounded by prompt size
+BATCH_PROMPT_CHAR_BUDGET = 24000
+BATCH_MAX_NORMAS = 8
+BATCH_NORMA_CONTENT_CHARS = 2000
+# Content limit of a single-norma prompt that would be too long
+SINGLE_NORMA_CONTENT_CHARS = 1000
+# Truncations a cached analysis may have been produced with, most complete first
+ANALYSIS_TRUNCATIONS = (None, BATCH_NORMA_CONTENT_CHARS, SINGLE_NORMA_CONTENT_CHARS)
+
+ANALYSIS_SYSTEM_PROMPT = """Sos un asistente legal especializado en derecho argentino. 
+            Tu tarea es analizar normas legales y generar:
+            1. Un resumen conciso y profesional
+            2. Una evaluación de su impacto
+            3. Una clasificación temática
+
+            Debés responder ÚNICAMENTE en formato JSON válido, sin texto adicional."""
+
+ANALYSIS_THEMES_GUIDE = """            **TEMAS EDITORIALES DISPONIBLES** (elegí el que mejor corresponda):
+            - "Economía y Finanzas" (tributario, comercial, financiero, inversiones, AFIP, BCRA)
+            - "Trabajo y Empleo" (derecho laboral, sindical, seguridad social, relaciones laborales)
+            - "Salud Pública" (salud, medicamentos, sanidad, obras sociales, hospitales)
+            - "Educación" (educación, universidades, becas, escuelas)
+            - "Infraestructura y Servicios" (obras públicas, transporte, vivienda, energía)
+            - "Seguridad y Justicia" (penal, seguridad, fuerzas armadas, policía, justicia)
+            - "Ambiente y Recursos" (ambiental, minería, agricultura, pesca, parques)
+            - "Administración Pública" (regulaciones internas del estado, procedimientos administrativos)
+            - "Comercio Exterior" (aduanas, importación, exportación, aranceles)
+            - "Tecnología y Comunicaciones" (telecomunicaciones, tecnología, datos personales)
+            - "Cultura y Deportes" (cultura, patrimonio, deportes, turismo)"""
+
+ANALYSIS_INSTRUCTIONS = """            **INSTRUCCIONES:**
+
+            1. **Resumen**: Capturá la esencia de la norma destacando:
+            - Qué establece o modifica
+            - A quiénes afecta
+            - Cuál es el cambio o novedad principal
+            - Usa lenguaje profesional pero accesible
+
+            2. **Impact Score (1-10)**: Evaluá considerando:
+            - Alcance: ¿A cuántas personas/empresas/instituciones afecta?
+                * 1-3: Norma técnica, alcance muy limitado o ajuste menor
+                * 4-6: Afecta a un sector específico, cambio procedural o moderado
+                * 7-8: Impacto significativo en un sector amplio o múltiples sectores
+                * 9-10: Cambio estructural, afecta masivamente la población o economía
+            - Novedad: ¿Es cambio sustancial o ajuste de norma existente?
+            - Urgencia: ¿Requiere acción inmediata de los afectados?
+
+            3. **Tema Editorial**: Elegí UNO de los temas listados arriba. Para decidir:
+            - Mirá primero el CONTENIDO de la norma (qué regula)
+            - Usá como ayuda la DEPENDENCIA (organismo emisor)
+            - Usá como ayuda el TÍTULO SUMARIO
+            - Si la norma toca múltiples temas, elegí el más prominente"""
+
+
+def format_norma_for_analysis(norma: Dict[str, Any], max_content_chars: Optional[int] = None) -> str:
+    """Format the norma data block used by the analysis prompts, optionally truncating its texts."""
+    texto_resumido = norma.get('texto_resumido', '') or ''
+    texto_norma = norma.get('texto_norma', '') or ''
+    if max_content_chars is not None:
+        if len(texto_resumido) > max_content_chars:
+            texto_resumido = texto_resumido[:max_content_chars] + "..."
+        if len(texto_norma) > max_content_chars:
+            texto_norma = texto_norma[:max_content_chars] + "..."
+
+    return f"""Tipo de norma: {norma.get('tipo_norma', 'N/A')}
+            Clase de norma: {norma.get('clase_norma', 'N/A')}
+            Dependencia: {norma.get('dependencia', 'N/A')}
+            Titulo Resumido: {norma.get('titulo_resumido', 'N/A')}
+            Título sumario: {norma.get('titulo_sumario', 'N/A')}
+
+            Contenido:
+            Texto Resumido: {texto_resumido or 'N/A'}
+            Texto Norma: {texto_norma or 'N/A'}"""
+
+
+def get_cached_analyses(cache: LLMResultCache, model: str, normas: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+    """Cached analyses of ``normas`` by infoleg_id, preferring the ones produced from the least truncated content."""
+    hashes = {norma['infoleg_id']: content_hash(format_norma_for_analysis(norma)) for norma in normas}
+    cached = cache.get_first_many(
+        [truncated_version(ANALYSIS_PROMPT_VERSION, max_chars) for max_chars in ANALYSIS_TRUNCATIONS],
+        model,
+        list(hashes.items())
+    )
+    return {
+        infoleg_id: cached[(infoleg_id, hash_)]
+        for infoleg_id, hash_ in hashes.items()
+        if (infoleg_id, hash_) in cached
+    }
+
 
 class DailyDigestService:
     """Service for generating newspaper-style daily digests."""
@@ -51,11 +157,9 @@ class DailyDigestService:
     def __init__(self):
         self.ai_service = get_ai_service_instance()
         self.reconstructor = get_norma_reconstructor()
-        # Rate limiting tracking (15 requests per minute for Gemini)
-        self.request_count = 0
-        self.rate_limit_window_start = time.time()
-        self.max_requests_per_minute = 14  # Stay slightly under limit
-        self.request_interval = 60.0 / self.max_requests_per_minute  # ~4.3 seconds between requests
+        # Shared request/token quota for every batch LLM call in the process
+        self.scheduler = get_llm_scheduler()
+        self.analysis_cache = get_llm_result_cache()
     
     def _fetch_daily_normas(self, target_date: date) -> List[Dict[str, Any]]:
         """Fetch normas published on the specified date."""
@@ -150,12 +254,14 @@ class DailyDigestService:
         logger.info(f"Filtered to {len(filtered_normas)} relevant normas")
         return filtered_normas
     
-    def _apply_processing_limits(self, normas: List[Dict[str, Any]], max_total: int = 15) -> List[Dict[str, Any]]:
+    def _apply_processing_limits(self, normas: List[Dict[str, Any]], max_total: Optional[int] = None) -> List[Dict[str, Any]]:
         """
-        Apply processing limits to reduce API costs:
-        - No limit on Leyes and Decretos (always process all)
-        - Apply limit on other types (Resoluciones, Disposiciones, etc.)
-        - Total limit is max_total normas
+        Order normas for processing and optionally cap them:
+        - Leyes and Decretos first, always processed
+        - Other types (Resoluciones, Disposiciones, etc.) after them, by type priority
+        - If max_total is given, other types only fill the remaining slots
+
+        Batched analysis makes covering the whole day cheap, so there is no cap by default.
         """
         logger.info(f"Applying processing limits with max_total={max_total}")
         
@@ -176,55 +282,58 @@ class DailyDigestService:
         # Always include all high-priority normas
         result = high_priority.copy()
         
-        # Calculate remaining slots for other normas
-        remaining_slots = max_total - len(high_priority)
+        # Sort other normas by our priority system (same as ranking logic)
+        other_normas_sorted = sorted(
+            other_normas,
+            key=lambda x: self.NORMA_TYPE_PRIORITY.get(x.get('tipo_norma', ''), 999)
+        )
         
-        if remaining_slots > 0 and other_normas:
-            # Sort other normas by our priority system (same as ranking logic)
-            other_normas_sorted = sorted(
-                other_normas,
-                key=lambda x: self.NORMA_TYPE_PRIORITY.get(x.get('tipo_norma', ''), 999)
-            )
-            
-            # Take only the remaining slots
-            selected_others = other_normas_sorted[:remaining_slots]
-            result.extend(selected_others)
+        if max_total is None:
+            result.extend(other_normas_sorted)
+        else:
+            # Calculate remaining slots for other normas
+            remaining_slots = max_total - len(high_priority)
             
-            logger.info(f"Selected {len(selected_others)} additional normas (limit: {remaining_slots})")
-        elif remaining_slots <= 0:
-            logger.info(f"High-priority normas ({len(high_priority)}) exceed limit ({max_total}), processing all anyway")
+            if remaining_slots > 0 and other_normas:
+                # Take only the remaining slots
+                selected_others = other_normas_sorted[:remaining_slots]
+                result.extend(selected_others)
+                
+                logger.info(f"Selected {len(selected_others)} additional normas (limit: {remaining_slots})")
+            elif remaining_slots <= 0:
+                logger.info(f"High-priority normas ({len(high_priority)}) exceed limit ({max_total}), processing all anyway")
         
         logger.info(f"Final selection: {len(result)} normas for processing")
         return result
     
-    async def _wait_for_rate_limit(self):
-        """Smart rate limiting to avoid hitting API limits."""
-        current_time = time.time()
-        
-        # Reset window if it's been more than a minute
-        if current_time - self.rate_limit_window_start > 60:
-            self.request_count = 0
-            self.rate_limit_window_start = current_time
-        
-        # If we're approaching the limit, wait
-        if self.request_count >= self.max_requests_per_minute:
-            wait_time = 60 - (current_time - self.rate_limit_window_start)
-            if wait_time > 0:
-                logger.info(f"Rate limit approaching, waiting {wait_time:.1f} seconds...")
-                await asyncio.sleep(wait_time)
-                # Reset after waiting
-                self.request_count = 0
-                self.rate_limit_window_start = time.time()
-        else:
-            # Smart spacing between requests
-            time_since_last = current_time - self.rate_limit_window_start
-            expected_time = self.request_count * self.request_interval
-            if time_since_last < expected_time:
-                wait_time = expected_time - time_since_last
-                logger.debug(f"Spacing requests: waiting {wait_time:.1f} seconds")
-                await asyncio.sleep(wait_time)
-        
-        self.request_count += 1
+    def _analysis_priority(self, norma: Dict[str, Any]) -> int:
+        """Leyes and Decretos are analyzed first when the LLM quota is saturated."""
+        if norma.get('tipo_norma', '').strip() in ['Ley', 'Decreto']:
+            return PRIORITY_HIGH
+        return PRIORITY_NORMAL
+    
+    def _validate_analysis(self, analysis: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Validate an LLM analysis; returns the normalized analysis or None if unusable."""
+        # Validate required fields
+        required_fields = ['resumen', 'puntaje_impacto', 'tema_editorial']
+        if not isinstance(analysis, dict) or not all(field in analysis for field in required_fields):
+            return None
+        
+        # Validate impact score
+        if not isinstance(analysis['puntaje_impacto'], int) or not (1 <= analysis['puntaje_impacto'] <= 10):
+            return None
+        
+        # Validate theme
+        tema_editorial = analysis['tema_editorial']
+        if tema_editorial not in self.EDITORIAL_THEMES:
+            logger.warning(f"Unknown theme '{tema_editorial}', defaulting to 'Economía y Finanzas'")
+            tema_editorial = "Economía y Finanzas"
+        
+        return {
+            "resumen": analysis['resumen'],
+            "puntaje_impacto": analysis['puntaje_impacto'],
+            "tema_editorial": tema_editorial
+        }
     
     async def _generate_norma_summary_with_analysis(self, norma: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -233,15 +342,6 @@ class DailyDigestService:
         """
         logger.debug(f"Generating analysis for norma {norma['infoleg_id']}")
         
-        # Create prompt for LLM analysis
-        system_prompt = """Sos un asistente legal especializado en derecho argentino. 
-            Tu tarea es analizar normas legales y generar:
-            1. Un resumen conciso y profesional
-            2. Una evaluación de su impacto
-            3. Una clasificación temática
-
-            Debés responder ÚNICAMENTE en formato JSON válido, sin texto adicional."""
-        
         prompt = f"""Analizá la siguiente norma legal argentina y respondé en formato JSON con esta estructura exacta:
             {{
             "resumen": "tu resumen aquí (80-150 palabras)",
@@ -249,139 +349,41 @@ class DailyDigestService:
             "tema_editorial": "nombre del tema"
             }}
 
-            **TEMAS EDITORIALES DISPONIBLES** (elegí el que mejor corresponda):
-            - "Economía y Finanzas" (tributario, comercial, financiero, inversiones, AFIP, BCRA)
-            - "Trabajo y Empleo" (derecho laboral, sindical, seguridad social, relaciones laborales)
-            - "Salud Pública" (salud, medicamentos, sanidad, obras sociales, hospitales)
-            - "Educación" (educación, universidades, becas, escuelas)
-            - "Infraestructura y Servicios" (obras públicas, transporte, vivienda, energía)
-            - "Seguridad y Justicia" (penal, seguridad, fuerzas armadas, policía, justicia)
-            - "Ambiente y Recursos" (ambiental, minería, agricultura, pesca, parques)
-            - "Administración Pública" (regulaciones internas del estado, procedimientos administrativos)
-            - "Comercio Exterior" (aduanas, importación, exportación, aranceles)
-            - "Tecnología y Comunicaciones" (telecomunicaciones, tecnología, datos personales)
-            - "Cultura y Deportes" (cultura, patrimonio, deportes, turismo)
+{ANALYSIS_THEMES_GUIDE}
 
             **DATOS DE LA NORMA:**
-            Tipo de norma: {norma.get('tipo_norma', 'N/A')}
-            Clase de norma: {norma.get('clase_norma', 'N/A')}
-            Dependencia: {norma.get('dependencia', 'N/A')}
-            Titulo Resumido: {norma.get('titulo_resumido', 'N/A')}
-            Título sumario: {norma.get('titulo_sumario', 'N/A')}
-
-            Contenido:
-            Texto Resumido: {norma.get('texto_resumido', 'N/A')}
-            Texto Norma: {norma.get('texto_norma', 'N/A')}
-
-            **INSTRUCCIONES:**
+            {format_norma_for_analysis(norma)}
 
-            1. **Resumen**: Capturá la esencia de la norma destacando:
-            - Qué establece o modifica
-            - A quiénes afecta
-            - Cuál es el cambio o novedad principal
-            - Usa lenguaje profesional pero accesible
-
-            2. **Impact Score (1-10)**: Evaluá considerando:
-            - Alcance: ¿A cuántas personas/empresas/instituciones afecta?
-                * 1-3: Norma técnica, alcance muy limitado o ajuste menor
-                * 4-6: Afecta a un sector específico, cambio procedural o moderado
-                * 7-8: Impacto significativo en un sector amplio o múltiples sectores
-                * 9-10: Cambio estructural, afecta masivamente la población o economía
-            - Novedad: ¿Es cambio sustancial o ajuste de norma existente?
-            - Urgencia: ¿Requiere acción inmediata de los afectados?
-
-            3. **Tema Editorial**: Elegí UNO de los temas listados arriba. Para decidir:
-            - Mirá primero el CONTENIDO de la norma (qué regula)
-            - Usá como ayuda la DEPENDENCIA (organismo emisor)
-            - Usá como ayuda el TÍTULO SUMARIO
-            - Si la norma toca múltiples temas, elegí el más prominente
+{ANALYSIS_INSTRUCTIONS}
 
             Respondé SOLO con el JSON, sin texto antes ni después."""
         
         try:
-            # Smart rate limiting before each request
-            await self._wait_for_rate_limit()
-            
             # Check content length to avoid overly long prompts
             content_length = len(prompt)
+            truncated_at = None
             if content_length > 15000:  # Reasonable limit for prompt length
                 logger.warning(f"Very long prompt for norma {norma['infoleg_id']}: {content_length} chars, truncating content")
-                # Truncate the norma content if too long
-                texto_resumido = norma.get('texto_resumido', '')[:1000] + "..." if len(norma.get('texto_resumido', '')) > 1000 else norma.get('texto_resumido', '')
-                texto_norma = norma.get('texto_norma', '')[:1000] + "..." if len(norma.get('texto_norma', '')) > 1000 else norma.get('texto_norma', '')
-                
                 # Rebuild prompt with truncated content
-                prompt = f"""Analizá la siguiente norma legal argentina y respondé en formato JSON con esta estructura exacta:
-            {{
-            "resumen": "tu resumen aquí (80-150 palabras)",
-            "puntaje_impacto": número del 1 al 10,
-            "tema_editorial": "nombre del tema"
-            }}
-
-            **TEMAS EDITORIALES DISPONIBLES** (elegí el que mejor corresponda):
-            - "Economía y Finanzas" (tributario, comercial, financiero, inversiones, AFIP, BCRA)
-            - "Trabajo y Empleo" (derecho laboral, sindical, seguridad social, relaciones laborales)
-            - "Salud Pública" (salud, medicamentos, sanidad, obras sociales, hospitales)
-            - "Educación" (educación, universidades, becas, escuelas)
-            - "Infraestructura y Servicios" (obras públicas, transporte, vivienda, energía)
-            - "Seguridad y Justicia" (penal, seguridad, fuerzas armadas, policía, justicia)
-            - "Ambiente y Recursos" (ambiental, minería, agricultura, pesca, parques)
-            - "Administración Pública" (regulaciones internas del estado, procedimientos administrativos)
-            - "Comercio Exterior" (aduanas, importación, exportación, aranceles)
-            - "Tecnología y Comunicaciones" (telecomunicaciones, tecnología, datos personales)
-            - "Cultura y Deportes" (cultura, patrimonio, deportes, turismo)
-
-            **DATOS DE LA NORMA:**
-            Tipo de norma: {norma.get('tipo_norma', 'N/A')}
-            Clase de norma: {norma.get('clase_norma', 'N/A')}
-            Dependencia: {norma.get('dependencia', 'N/A')}
-            Titulo Resumido: {norma.get('titulo_resumido', 'N/A')}
-            Título sumario: {norma.get('titulo_sumario', 'N/A')}
-
-            Contenido:
-            Texto Resumido: {texto_resumido}
-            Texto Norma: {texto_norma}
-
-            **INSTRUCCIONES:**
-
-            1. **Resumen**: Capturá la esencia de la norma destacando:
-            - Qué establece o modifica
-            - A quiénes afecta
-            - Cuál es el cambio o novedad principal
-            - Usa lenguaje profesional pero accesible
-
-            2. **Impact Score (1-10)**: Evaluá considerando:
-            - Alcance: ¿A cuántas personas/empresas/instituciones afecta?
-                * 1-3: Norma técnica, alcance muy limitado o ajuste menor
-                * 4-6: Afecta a un sector específico, cambio procedural o moderado
-                * 7-8: Impacto significativo en un sector amplio o múltiples sectores
-                * 9-10: Cambio estructural, afecta masivamente la población o economía
-            - Novedad: ¿Es cambio sustancial o ajuste de norma existente?
-            - Urgencia: ¿Requiere acción inmediata de los afectados?
-
-            3. **Tema Editorial**: Elegí UNO de los temas listados arriba. Para decidir:
-            - Mirá primero el CONTENIDO de la norma (qué regula)
-            - Usá como ayuda la DEPENDENCIA (organismo emisor)
-            - Usá como ayuda el TÍTULO SUMARIO
-            - Si la norma toca múltiples temas, elegí el más prominente
-
-            Respondé SOLO con el JSON, sin texto antes ni después."""
+                prompt = prompt.replace(
+                    format_norma_for_analysis(norma),
+                    format_norma_for_analysis(norma, max_content_chars=SINGLE_NORMA_CONTENT_CHARS)
+                )
+                truncated_at = SINGLE_NORMA_CONTENT_CHARS
             
             messages = [
                 Message(role="user", content=prompt)
             ]
             
-            # Collect response from stream
-            response_chunks = []
-            chunk_count = 0
-            async for chunk in self.ai_service.generate_stream(messages, system_prompt):
-                response_chunks.append(chunk)
-                chunk_count += 1
-                if chunk_count % 5 == 0:  # Log every 5 chunks
-                    logger.debug(f"Received {chunk_count} chunks for norma {norma['infoleg_id']}")
-            
-            response = "".join(response_chunks)
-            logger.debug(f"Total chunks received: {chunk_count}, response length: {len(response)}")
+            # Collect response through the shared scheduler (quota, priority, 429 backoff)
+            response = await self.scheduler.complete(
+                self.ai_service,
+                messages,
+                ANALYSIS_SYSTEM_PROMPT,
+                priority=self._analysis_priority(norma),
+                expected_output_tokens=400
+            )
+            logger.debug(f"Response length: {len(response)}")
             
             logger.debug(f"Raw LLM response for norma {norma['infoleg_id']}: {response[:200]}...")
             
@@ -390,52 +392,191 @@ class DailyDigestService:
                 if not response.strip():
                     raise ValueError("Empty response from LLM")
                 
-                # Clean up response - remove markdown code blocks if present
-                cleaned_response = response.strip()
-                if cleaned_response.startswith('```json'):
-                    cleaned_response = cleaned_response[7:]  # Remove ```json
-                if cleaned_response.endswith('```'):
-                    cleaned_response = cleaned_response[:-3]  # Remove ```
-                cleaned_response = cleaned_response.strip()
-                
-                analysis = json.loads(cleaned_response)
-                
-                # Validate required fields
-                required_fields = ['resumen', 'puntaje_impacto', 'tema_editorial']
-                if not all(field in analysis for field in required_fields):
-                    raise ValueError(f"Missing required fields in LLM response")
-                
-                # Validate impact score
-                if not isinstance(analysis['puntaje_impacto'], int) or not (1 <= analysis['puntaje_impacto'] <= 10):
-                    raise ValueError(f"Invalid impact score: {analysis['puntaje_impacto']}")
-                
-                # Validate theme
-                if analysis['tema_editorial'] not in self.EDITORIAL_THEMES:
-                    logger.warning(f"Unknown theme '{analysis['tema_editorial']}', defaulting to 'Economía y Finanzas'")
-                    analysis['tema_editorial'] = "Economía y Finanzas"
+                analysis = self._validate_analysis(parse_llm_json(response))
+                if analysis is None:
+                    raise ValueError("Missing or invalid fields in LLM response")
                 
                 logger.debug(f"Generated analysis for norma {norma['infoleg_id']}: impact={analysis['puntaje_impacto']}, theme={analysis['tema_editorial']}")
+                if truncated_at is not None:
+                    analysis['truncated_at'] = truncated_at
                 return analysis
                 
             except json.JSONDecodeError as e:
                 logger.error(f"Failed to parse LLM JSON response for norma {norma['infoleg_id']}: {e}")
                 logger.error(f"Raw response was: {response}")
-                # Fallback analysis
+                # Fallback analysis (flagged so it is not cached)
                 return {
                     "resumen": f"Resumen no disponible para la norma {norma['infoleg_id']}.",
                     "puntaje_impacto": 5,
-                    "tema_editorial": "Economía y Finanzas"
+                    "tema_editorial": "Economía y Finanzas",
+                    "fallback": True
                 }
                 
+        except LLMRateLimitError:
+            # Quota exhausted even after backoff: fail the run so it resumes later
+            raise
         except Exception as e:
             logger.error(f"Error generating analysis for norma {norma['infoleg_id']}: {e}")
-            # Fallback analysis
+            # Fallback analysis (flagged so it is not cached)
             return {
                 "resumen": f"Error al generar resumen para la norma {norma['infoleg_id']}.",
                 "puntaje_impacto": 5,
-                "tema_editorial": "Economía y Finanzas"
+                "tema_editorial": "Economía y Finanzas",
+                "fallback": True
             }
     
+    async def _generate_batch_analysis(self, normas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Analyze several normas with a single LLM call that returns a JSON array.
+
+        Normas missing from (or invalid in) the answer, or the whole batch if
+        the answer can't be parsed, fall back to one call per norma. Returns
+        the analyses in the same order as ``normas``; analyses produced from
+        truncated content carry the limit in ``truncated_at``.
+        """
+        if len(normas) == 1:
+            return [await self._generate_norma_summary_with_analysis(normas[0])]
+        
+        ids = [norma['infoleg_id'] for norma in normas]
+        normas_block = "\n\n".join(
+            f"""            --- NORMA infoleg_id={norma['infoleg_id']} ---
+            {format_norma_for_analysis(norma, max_content_chars=BATCH_NORMA_CONTENT_CHARS)}"""
+            for norma in normas
+        )
+        prompt = f"""Analizá cada una de las siguientes {len(normas)} normas legales argentinas y respondé con un JSON array
+            que tenga exactamente un objeto por norma, con esta estructura:
+            [
+            {{
+            "infoleg_id": el infoleg_id de la norma,
+            "resumen": "tu resumen aquí (80-150 palabras)",
+            "puntaje_impacto": número del 1 al 10,
+            "tema_editorial": "nombre del tema"
+            }}
+            ]
+
+{ANALYSIS_THEMES_GUIDE}
+
+            **NORMAS:**
+
+{normas_block}
+
+{ANALYSIS_INSTRUCTIONS}
+
+            Analizá cada norma de forma independiente. Respondé SOLO con el JSON array, sin texto antes ni después."""
+        
+        analyses: Dict[int, Dict[str, Any]] = {}
+        try:
+            response = await self.scheduler.complete(
+                self.ai_service,
+                [Message(role="user", content=prompt)],
+                ANALYSIS_SYSTEM_PROMPT,
+                priority=min(self._analysis_priority(norma) for norma in normas),
+                expected_output_tokens=400 * len(normas)
+            )
+            analyses = split_batch_response(response, ids, self._validate_analysis)
+            for norma in normas:
+                if norma['infoleg_id'] in analyses and (
+                    format_norma_for_analysis(norma, max_content_chars=BATCH_NORMA_CONTENT_CHARS)
+                    != format_norma_for_analysis(norma)
+                ):
+                    analyses[norma['infoleg_id']]['truncated_at'] = BATCH_NORMA_CONTENT_CHARS
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            logger.warning(f"Batch analysis of {len(normas)} normas failed, falling back to per-norma calls: {e}")
+        
+        missing = [norma for norma in normas if norma['infoleg_id'] not in analyses]
+        if missing:
+            logger.info(f"Batch analysis returned {len(analyses)}/{len(normas)} normas, analyzing {len(missing)} individually")
+            fallback = await gather_cancel_on_error(
+                *(self._generate_norma_summary_with_analysis(norma) for norma in missing)
+            )
+            for norma, analysis in zip(missing, fallback):
+                analyses[norma['infoleg_id']] = analysis
+        
+        return [analyses[norma_id] for norma_id in ids]
+    
+    async def _generate_analyses(
+        self,
+        normas: List[Dict[str, Any]],
+        on_analyzed: Optional[Callable[[List[Tuple[Dict[str, Any], Dict[str, Any]]]], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Analyze all normas, returning analyses in input order.
+
+        Analyses already in the LLM result cache (same content, prompt version
+        and model) are reused; the rest are analyzed in size-bounded batches,
+        run concurrently, and stored in the cache as each batch completes,
+        under a version marked with the truncation they were produced from.
+        ``on_analyzed`` receives the (norma, analysis) pairs of the cache hits
+        and then of every finished batch, so callers can checkpoint progress.
+        """
+        model = describe_model(self.ai_service)
+        hashes = {norma['infoleg_id']: content_hash(format_norma_for_analysis(norma)) for norma in normas}
+        analyses = get_cached_analyses(self.analysis_cache, model, normas)
+        if analyses and on_analyzed:
+            on_analyzed([(norma, analyses[norma['infoleg_id']]) for norma in normas if norma['infoleg_id'] in analyses])
+        
+        pending = [norma for norma in normas if norma['infoleg_id'] not in analyses]
+        batches = pack_batches(
+            pending,
+            size_of=lambda norma: len(format_norma_for_analysis(norma, max_content_chars=BATCH_NORMA_CONTENT_CHARS)),
+            max_chars=BATCH_PROMPT_CHAR_BUDGET,
+            max_items=BATCH_MAX_NORMAS
+        )
+        logger.info(f"Analyzing {len(pending)} normas in {len(batches)} batched LLM calls")
+        
+        async def _run_batch(batch: List[Dict[str, Any]]):
+            batch_analyses = await self._generate_batch_analysis(batch)
+            for norma, analysis in zip(batch, batch_analyses):
+                analyses[norma['infoleg_id']] = analysis
+            by_truncation: Dict[Optional[int], List[Tuple[int, str, Dict[str, Any]]]] = {}
+            for norma, analysis in zip(batch, batch_analyses):
+                if not analysis.get('fallback'):
+                    by_truncation.setdefault(analysis.get('truncated_at'), []).append((
+                        norma['infoleg_id'],
+                        hashes[norma['infoleg_id']],
+                        {key: value for key, value in analysis.items() if key != 'truncated_at'}
+                    ))
+            for max_chars, entries in by_truncation.items():
+                self.analysis_cache.put_many(truncated_version(ANALYSIS_PROMPT_VERSION, max_chars), model, entries)
+            if on_analyzed:
+                # Fallbacks are not checkpointed either, so a rerun analyzes them again
+                on_analyzed([
+                    (norma, analysis) for norma, analysis in zip(batch, batch_analyses)
+                    if not analysis.get('fallback')
+                ])
+        
+        await gather_cancel_on_error(*(_run_batch(batch) for batch in batches))
+        return [analyses[norma['infoleg_id']] for norma in normas]
+    
+    def _store_analyses(self, db: Session, target_date: date, analyzed_normas: List[Tuple[Dict[str, Any], Dict[str, Any]]]):
+        """Persist norma analyses for ``target_date`` (the checkpoint a rerun resumes from)."""
+        for norma, analysis in analyzed_normas:
+            # Prepare norma data for JSON storage (convert dates to strings)
+            norma_data_for_json = norma.copy()
+            for key, value in norma_data_for_json.items():
+                if isinstance(value, date):
+                    norma_data_for_json[key] = value.isoformat()
+                elif isinstance(value, datetime):
+                    norma_data_for_json[key] = value.isoformat()
+            
+            # Store individual analysis in database
+            db.add(NormaSummaryAnalysis(
+                infoleg_id=norma['infoleg_id'],
+                summary_date=target_date,
+                resumen=analysis['resumen'],
+                puntaje_impacto=analysis['puntaje_impacto'],
+                tema_editorial=analysis['tema_editorial'],
+                tipo_norma=norma.get('tipo_norma', ''),
+                clase_norma=norma.get('clase_norma', ''),
+                titulo_sumario=norma.get('titulo_sumario', ''),
+                dependencia=norma.get('dependencia', ''),
+                raw_norma_data=norma_data_for_json
+            ))
+        db.commit()
+        logger.info(f"Stored {len(analyzed_normas)} norma analyses for {target_date}")
+    
     def _calculate_norma_priority(self, norma: Dict[str, Any], analysis: Dict[str, Any]) -> Tuple[int, int]:
         """
         Calculate priority for norma ranking.
@@ -520,17 +661,14 @@ class DailyDigestService:
             Respondé SOLO con el JSON, sin texto adicional."""
         
         try:
-            await self._wait_for_rate_limit()
-            
             messages = [
                 Message(role="user", content=prompt)
             ]
             
-            # Collect response from stream
-            response_chunks = []
-            async for chunk in self.ai_service.generate_stream(messages, system_prompt):
-                response_chunks.append(chunk)
-            response = "".join(response_chunks)
+            # The hero goes ahead of every other queued call
+            response = await self.scheduler.complete(
+                self.ai_service, messages, system_prompt, priority=PRIORITY_HIGH, expected_output_tokens=200
+            )
             
             # Parse JSON response for hero section
             try:
@@ -555,6 +693,8 @@ class DailyDigestService:
                 # Fallback to plain text if JSON parsing fails
                 return response.strip()
                 
+        except LLMRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Error generating hero section: {e}")
             fallback_json = {
@@ -612,17 +752,13 @@ class DailyDigestService:
             Respondé SOLO con el JSON array, sin texto adicional."""
         
         try:
-            await self._wait_for_rate_limit()
-            
             messages = [
                 Message(role="user", content=prompt)
             ]
             
-            # Collect response from stream
-            response_chunks = []
-            async for chunk in self.ai_service.generate_stream(messages, system_prompt):
-                response_chunks.append(chunk)
-            response = "".join(response_chunks)
+            response = await self.scheduler.complete(
+                self.ai_service, messages, system_prompt, priority=PRIORITY_NORMAL, expected_output_tokens=300
+            )
             
             # Parse JSON response for secondary section
             try:
@@ -652,6 +788,8 @@ class DailyDigestService:
                 # Fallback to plain text if JSON parsing fails
                 return response.strip()
                 
+        except LLMRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Error generating secondary section: {e}")
             fallback_json = [
@@ -696,65 +834,65 @@ class DailyDigestService:
             """
         
         try:
-            await self._wait_for_rate_limit()
-            
             messages = [Message(role="user", content=prompt)]
             
-            # Collect response from stream
-            response_chunks = []
-            async for chunk in self.ai_service.generate_stream(messages, ""):
-                response_chunks.append(chunk)
-            response = "".join(response_chunks)
+            response = await self.scheduler.complete(
+                self.ai_service, messages, "", priority=PRIORITY_LOW, expected_output_tokens=200
+            )
             # Theme section returns plain text (paragraph), not JSON
             return response.strip()
+        except LLMRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Error generating theme section for {theme}: {e}")
             return f"Error al generar sección temática {theme}."
     
-    async def generate_daily_newspaper_digest(self, db: Session, target_date: date = None) -> Dict[str, Any]:
+    async def generate_daily_newspaper_digest(
+        self,
+        db: Session,
+        target_date: date = None,
+        force: bool = False,
+        sections: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
         Generate complete newspaper-style daily digest.
         
         Process:
         1. Fetch and filter normas for the target date
-        2. Generate analysis (summary, impact, theme) for each norma
+        2. Generate analysis (summary, impact, theme) for each norma, in batched prompts
         3. Rank normas by priority (type hierarchy + impact score)
         4. Generate hero section (top norma)
         5. Generate secondary section (next 2-3 normas)
         6. Generate thematic sections (remaining normas grouped by theme)
-        7. Store all sections in database
+        
+        LLM calls go through the shared LLM scheduler, so steps 2 and 4-6 run
+        concurrently within the provider's request and token quota.
+        
+        Every norma analysis and every section is stored as soon as it is
+        ready, so a failed run (e.g. the LLM quota still exhausted after
+        backoff) resumes where it stopped: analyses already stored for the
+        date are reused and only missing sections are generated. A stored
+        section is regenerated when its normas changed and deleted when it is
+        no longer part of the plan; a section that would be built on a
+        failed (fallback) norma analysis is not generated nor stored, so a
+        later run fills it in. With ``force``, the requested ``sections`` (section types such as
+        "hero", "secondary" or a theme name; all of them if omitted) are
+        regenerated from the stored analyses.
         """
         if target_date is None:
             target_date = date.today()
         
-        logger.info(f"Starting newspaper digest generation for {target_date}")
+        logger.info(f"Starting newspaper digest generation for {target_date} (force={force}, sections={sections})")
         
-        # Clean up old norma analyses (but keep digest sections for historical view)
-        previous_date = target_date - timedelta(days=1)
-        try:
-            deleted_count = db.query(NormaSummaryAnalysis).filter(
-                NormaSummaryAnalysis.summary_date < target_date
-            ).delete()
-            if deleted_count > 0:
-                logger.info(f"Cleaned up {deleted_count} old norma analyses from before {target_date}")
-            db.commit()
-        except Exception as e:
-            logger.warning(f"Failed to clean up old norma analyses: {e}")
-            db.rollback()
+        # Drop cached LLM results that have not been used within the retention window
+        self.analysis_cache.purge_expired()
         
-        # Check if digest already exists for this date
-        existing_count = db.query(DailyDigestNewspaper).filter(
-            DailyDigestNewspaper.digest_date == target_date
-        ).count()
-        
-        if existing_count > 0:
-            logger.info(f"Found {existing_count} existing digest sections for {target_date}, skipping generation")
-            return {
-                "success": True,
-                "message": f"Newspaper digest already exists for {target_date}",
-                "date": target_date,
-                "sections_generated": existing_count
-            }
+        existing_sections = {
+            section.section_type: section
+            for section in db.query(DailyDigestNewspaper).filter(
+                DailyDigestNewspaper.digest_date == target_date
+            ).all()
+        }
         
         try:
             # Step 1: Fetch and filter normas
@@ -770,120 +908,148 @@ class DailyDigestService:
                     "sections_generated": 0
                 }
             
-            # Apply processing limits to reduce API costs
+            # Order normas by importance (no cap: batching keeps the call count low)
             limited_normas = self._apply_processing_limits(filtered_normas)
             
-            # Step 2: Generate analysis for each norma
-            logger.info(f"Generating analysis for {len(limited_normas)} normas")
-            analyzed_normas = []
-            
-            for norma in limited_normas:
-                analysis = await self._generate_norma_summary_with_analysis(norma)
-                analyzed_normas.append((norma, analysis))
-                
-                # Prepare norma data for JSON storage (convert dates to strings)
-                norma_data_for_json = norma.copy()
-                for key, value in norma_data_for_json.items():
-                    if isinstance(value, date):
-                        norma_data_for_json[key] = value.isoformat()
-                    elif isinstance(value, datetime):
-                        norma_data_for_json[key] = value.isoformat()
-                
-                # Store individual analysis in database
-                norma_analysis = NormaSummaryAnalysis(
-                    infoleg_id=norma['infoleg_id'],
-                    summary_date=target_date,
-                    resumen=analysis['resumen'],
-                    puntaje_impacto=analysis['puntaje_impacto'],
-                    tema_editorial=analysis['tema_editorial'],
-                    tipo_norma=norma.get('tipo_norma', ''),
-                    clase_norma=norma.get('clase_norma', ''),
-                    titulo_sumario=norma.get('titulo_sumario', ''),
-                    dependencia=norma.get('dependencia', ''),
-                    raw_norma_data=norma_data_for_json
-                )
-                db.add(norma_analysis)
-            
-            db.commit()
-            logger.info(f"Stored {len(analyzed_normas)} norma analyses")
+            # Step 2: Reuse analyses stored by a previous run for this date, then analyze
+            # the rest several normas per LLM call, storing each batch as it completes
+            stored_analyses = {
+                row.infoleg_id: {
+                    "resumen": row.resumen,
+                    "puntaje_impacto": row.puntaje_impacto,
+                    "tema_editorial": row.tema_editorial
+                }
+                for row in db.query(NormaSummaryAnalysis).filter(
+                    NormaSummaryAnalysis.summary_date == target_date
+                ).all()
+            }
+            pending_normas = [norma for norma in limited_normas if norma['infoleg_id'] not in stored_analyses]
+            logger.info(
+                f"Generating analysis for {len(pending_normas)} normas "
+                f"({len(limited_normas) - len(pending_normas)} already stored for {target_date})"
+            )
+            new_analyses = await self._generate_analyses(
+                pending_normas,
+                on_analyzed=lambda analyzed: self._store_analyses(db, target_date, analyzed)
+            )
+            stored_analyses.update(
+                (norma['infoleg_id'], analysis) for norma, analysis in zip(pending_normas, new_analyses)
+            )
+            analyzed_normas = [(norma, stored_analyses[norma['infoleg_id']]) for norma in limited_normas]
             
             # Step 3: Rank normas by priority
             ranked_normas = self._rank_normas(analyzed_normas)
             
-            sections_generated = 0
+            # Steps 4-6: Plan hero, secondary and thematic sections
+            section_plans = []  # (section_type, normas_with_analysis, coroutine factory)
             
-            # Step 4: Generate hero section (top norma)
+            # Step 4: Hero section (top norma)
             if ranked_normas:
                 hero_norma, hero_analysis = ranked_normas[0]
-                hero_content = await self._generate_hero_section(hero_norma, hero_analysis)
-                
-                hero_section = DailyDigestNewspaper(
-                    digest_date=target_date,
-                    section_type="hero",
-                    section_content=hero_content,
-                    norma_ids=[hero_norma['infoleg_id']],
-                    section_order=1
-                )
-                db.add(hero_section)
-                sections_generated += 1
-                logger.info(f"Generated hero section for norma {hero_norma['infoleg_id']}")
+                section_plans.append((
+                    "hero",
+                    [ranked_normas[0]],
+                    lambda: self._generate_hero_section(hero_norma, hero_analysis)
+                ))
             
-            # Step 5: Generate secondary section (next 2-3 normas)
+            # Step 5: Secondary section (next 2-3 normas)
             if len(ranked_normas) > 1:
                 secondary_normas = ranked_normas[1:4]  # Take next 2-3 normas
-                secondary_content = await self._generate_secondary_section(secondary_normas)
-                
-                secondary_section = DailyDigestNewspaper(
-                    digest_date=target_date,
-                    section_type="secondary",
-                    section_content=secondary_content,
-                    norma_ids=[norma['infoleg_id'] for norma, _ in secondary_normas],
-                    section_order=2
-                )
-                db.add(secondary_section)
-                sections_generated += 1
-                logger.info(f"Generated secondary section for {len(secondary_normas)} normas")
+                section_plans.append((
+                    "secondary",
+                    secondary_normas,
+                    lambda: self._generate_secondary_section(secondary_normas)
+                ))
             
-            # Step 6: Generate thematic sections
-            # Get remaining normas (after hero and secondary)
+            # Step 6: Thematic sections for the remaining normas (after hero and secondary)
             remaining_normas = ranked_normas[4:] if len(ranked_normas) > 4 else []
             
-            if remaining_normas:
-                # Group by theme
-                theme_groups = {}
-                for norma, analysis in remaining_normas:
-                    theme = analysis['tema_editorial']
-                    if theme not in theme_groups:
-                        theme_groups[theme] = []
-                    theme_groups[theme].append((norma, analysis))
-                
-                # Generate section for each theme
-                section_order = 3
-                for theme, theme_normas in theme_groups.items():
-                    theme_content = await self._generate_theme_section(theme, theme_normas)
-                    
-                    theme_section = DailyDigestNewspaper(
-                        digest_date=target_date,
-                        section_type=theme,
-                        section_content=theme_content,
-                        norma_ids=[norma['infoleg_id'] for norma, _ in theme_normas],
-                        section_order=section_order
-                    )
-                    db.add(theme_section)
-                    sections_generated += 1
-                    section_order += 1
-                    logger.info(f"Generated theme section '{theme}' for {len(theme_normas)} normas")
-            
-            # Commit all sections
+            # Group by theme
+            theme_groups = {}
+            for norma, analysis in remaining_normas:
+                theme = analysis['tema_editorial']
+                if theme not in theme_groups:
+                    theme_groups[theme] = []
+                theme_groups[theme].append((norma, analysis))
+            
+            for theme, theme_normas in theme_groups.items():
+                section_plans.append((
+                    theme,
+                    theme_normas,
+                    lambda theme=theme, theme_normas=theme_normas: self._generate_theme_section(theme, theme_normas)
+                ))
+            
+            # Drop stored sections that are no longer part of the plan (the ranking or
+            # the themes changed since they were generated)
+            planned_types = [section_type for section_type, _, _ in section_plans]
+            for section_type in set(existing_sections) - set(planned_types):
+                db.delete(existing_sections.pop(section_type))
             db.commit()
             
+            # Decide which sections to (re)generate
+            if force:
+                forced_types = set(sections) if sections else set(planned_types)
+                for section_type in forced_types - set(planned_types):
+                    logger.warning(f"Requested section '{section_type}' is not part of the digest for {target_date}")
+            else:
+                forced_types = set()
+            
+            to_generate = []
+            deferred = []
+            for section_order, plan in enumerate(section_plans, start=1):
+                section_type, section_normas, _ = plan
+                stored = existing_sections.get(section_type)
+                planned_ids = [norma['infoleg_id'] for norma, _ in section_normas]
+                if stored is not None and section_type not in forced_types and list(stored.norma_ids) == planned_ids:
+                    continue
+                if any(analysis.get('fallback') for _, analysis in section_normas):
+                    # Built on a placeholder analysis: not stored, so the next run generates it
+                    # once the norma has a real analysis
+                    deferred.append(section_type)
+                    continue
+                to_generate.append((section_order, plan))
+            if deferred:
+                logger.warning(f"Deferring sections with failed norma analyses: {', '.join(deferred)}")
+            logger.info(
+                f"Generating {len(to_generate)} of {len(section_plans)} sections "
+                f"({len(section_plans) - len(to_generate) - len(deferred)} already stored, {len(deferred)} deferred)"
+            )
+            
+            async def _generate_and_store(section_order: int, plan):
+                section_type, section_normas, generate = plan
+                content = await generate()
+                
+                # Store each section as soon as it is ready
+                previous = existing_sections.pop(section_type, None)
+                if previous is not None:
+                    db.delete(previous)
+                db.add(DailyDigestNewspaper(
+                    digest_date=target_date,
+                    section_type=section_type,
+                    section_content=content,
+                    norma_ids=[norma['infoleg_id'] for norma, _ in section_normas],
+                    section_order=section_order
+                ))
+                db.commit()
+                logger.info(f"Generated {section_type} section for {len(section_normas)} normas")
+            
+            # Sections run concurrently; the scheduler serves the hero first
+            await gather_cancel_on_error(
+                *(_generate_and_store(section_order, plan) for section_order, plan in to_generate)
+            )
+            sections_generated = len(to_generate)
+            
             logger.info(f"Successfully generated newspaper digest for {target_date}: {sections_generated} sections")
             return {
                 "success": True,
-                "message": f"Generated newspaper digest for {target_date}",
+                "message": (
+                    f"Generated newspaper digest for {target_date}" if sections_generated
+                    else f"Newspaper digest already exists for {target_date}"
+                ),
                 "date": target_date,
                 "normas_analyzed": len(analyzed_normas),
-                "sections_generated": sections_generated
+                "sections_generated": sections_generated,
+                "sections_deferred": deferred
             }
             
         except Exception as e:
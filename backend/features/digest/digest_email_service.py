@@ -1,65 +1,47 @@
 """Email service for sending weekly digests to users."""
 
-import resend
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional, Tuple
 from datetime import date
 from core.config.config import settings
 from core.utils.logging_config import get_logger
+from shared.utils.email_dispatch import get_email_dispatcher, default_sender
 
 logger = get_logger(__name__)
 
+EMAIL_CATEGORY = "weekly_digest"
 
-def send_weekly_digest_email(
-    email: str,
-    user_name: str,
-    week_start: date,
-    week_end: date,
-    normas_summaries: List[Dict[str, Any]]
-) -> bool:
-    """
-    Send a personalized weekly digest email to a user.
-    
-    Args:
-        email: User's email address
-        user_name: User's name for personalization
-        week_start: Start date of the week
-        week_end: End date of the week
-        normas_summaries: List of norma summaries filtered for this user
-    
-    Returns:
-        bool: True if email sent successfully, False otherwise
-    """
-    if not settings.RESEND_API_KEY:
-        logger.warning("RESEND_API_KEY not configured, skipping email")
-        return False
-    
-    resend.api_key = settings.RESEND_API_KEY
+_GREETING_MARKER = "\x00greeting\x00"
+_NORMAS_MARKER = "\x00normas\x00"
+
+# Shown when no normas match user preferences
+NO_NORMAS_HTML = """
+        <div class="no-normas">
+            <p>Esta semana no se publicaron normas que coincidan con tus preferencias de filtrado.</p>
+            <p>Podés actualizar tus preferencias en tu perfil para recibir más contenido.</p>
+        </div>
+        """
+
+
+def _render_norma_block(norma: Dict[str, Any]) -> str:
+    """Render the card of one norma."""
+    tipo_norma = norma.get('tipo_norma', 'Norma')
+    numero = norma.get('numero', '')
+    titulo = norma.get('titulo', 'Sin título')
+    summary = norma.get('summary', '')
+    infoleg_id = norma.get('infoleg_id', '')
+    publicacion = norma.get('publicacion')
     
-    # Format dates for display
-    week_start_str = week_start.strftime("%d/%m/%Y")
-    week_end_str = week_end.strftime("%d/%m/%Y")
+    # Format publication date
+    pub_date_str = ""
+    if publicacion:
+        if isinstance(publicacion, date):
+            pub_date_str = publicacion.strftime("%d/%m/%Y")
+        else:
+            pub_date_str = str(publicacion)
     
-    # Build the normas list HTML
-    normas_html = ""
-    for norma in normas_summaries:
-        tipo_norma = norma.get('tipo_norma', 'Norma')
-        numero = norma.get('numero', '')
-        titulo = norma.get('titulo', 'Sin título')
-        summary = norma.get('summary', '')
-        infoleg_id = norma.get('infoleg_id', '')
-        publicacion = norma.get('publicacion')
-        
-        # Format publication date
-        pub_date_str = ""
-        if publicacion:
-            if isinstance(publicacion, date):
-                pub_date_str = publicacion.strftime("%d/%m/%Y")
-            else:
-                pub_date_str = str(publicacion)
-        
-        # Build norma card
-        normas_html += f"""
+    # Build norma card
+    return f"""
         <div class="norma-card">
             <div class="norma-header">
                 <h3 class="norma-title">{tipo_norma} {numero}</h3>
@@ -70,19 +52,11 @@ def send_weekly_digest_email(
             <a href="{settings.FRONTEND_SITE_URL}/normas/{infoleg_id}" class="norma-link">Ver norma completa →</a>
         </div>
         """
-    
-    # If no normas match user preferences
-    if not normas_summaries:
-        normas_html = """
-        <div class="no-normas">
-            <p>Esta semana no se publicaron normas que coincidan con tus preferencias de filtrado.</p>
-            <p>Podés actualizar tus preferencias en tu perfil para recibir más contenido.</p>
-        </div>
-        """
-    
-    greeting = f"Hola {user_name}" if user_name else "Hola"
-    
-    html_content = f"""
+
+
+def _render_shell(week_start_str: str, week_end_str: str, greeting: str, normas_html: str) -> str:
+    """Render the full email page around the greeting and the normas list."""
+    return f"""
     <!DOCTYPE html>
     <html lang="es">
     <head>
@@ -283,14 +257,117 @@ def send_weekly_digest_email(
     </body>
     </html>
     """
+
+
+class DigestEmailRenderer:
+    """
+    Renders the weekly digest email for every recipient of one digest.
+    
+    The page shell is rendered once with markers where the greeting and the
+    normas go, each norma card is rendered once, and everything after the
+    greeting is memoized by the recipient's list of norma ids, so users with
+    the same filtered normas share one rendered body and only the greeting
+    is per user.
+    """
+    
+    def __init__(self, week_start: date, week_end: date):
+        week_start_str = week_start.strftime("%d/%m/%Y")
+        week_end_str = week_end.strftime("%d/%m/%Y")
+        self.subject = f"Resumen Semanal de Normas ({week_start_str} - {week_end_str})"
+        
+        shell = _render_shell(week_start_str, week_end_str, _GREETING_MARKER, _NORMAS_MARKER)
+        self._head, rest = shell.split(_GREETING_MARKER)
+        self._middle, self._tail = rest.split(_NORMAS_MARKER)
+        self._blocks: Dict[Any, str] = {}
+        self._bodies: Dict[Tuple[Any, ...], str] = {}
+        self.renders = 0
+    
+    @staticmethod
+    def _norma_key(norma: Dict[str, Any]) -> Any:
+        return norma.get('infoleg_id') or id(norma)
+    
+    def _body(self, normas_summaries: List[Dict[str, Any]]) -> str:
+        key = tuple(self._norma_key(norma) for norma in normas_summaries)
+        body = self._bodies.get(key)
+        if body is None:
+            normas_html = NO_NORMAS_HTML
+            if normas_summaries:
+                parts = []
+                for norma in normas_summaries:
+                    norma_key = self._norma_key(norma)
+                    if norma_key not in self._blocks:
+                        self._blocks[norma_key] = _render_norma_block(norma)
+                    parts.append(self._blocks[norma_key])
+                normas_html = "".join(parts)
+            body = self._middle + normas_html + self._tail
+            self._bodies[key] = body
+        return body
+    
+    def render(self, user_name: Optional[str], normas_summaries: List[Dict[str, Any]]) -> str:
+        """HTML of the email for a user receiving ``normas_summaries``."""
+        self.renders += 1
+        greeting = f"Hola {user_name}" if user_name else "Hola"
+        return self._head + greeting + self._body(normas_summaries)
+    
+    @property
+    def distinct_bodies(self) -> int:
+        return len(self._bodies)
+
+
+def build_weekly_digest_email(
+    email: str,
+    user_name: str,
+    week_start: date,
+    week_end: date,
+    normas_summaries: List[Dict[str, Any]],
+    renderer: Optional[DigestEmailRenderer] = None
+) -> Dict[str, Any]:
+    """
+    Build the personalized weekly digest email for a user.
+    
+    Args:
+        email: User's email address
+        user_name: User's name for personalization
+        week_start: Start date of the week
+        week_end: End date of the week
+        normas_summaries: List of norma summaries filtered for this user
+        renderer: Renderer shared by all recipients of the digest (one is
+            created if not given)
+    
+    Returns:
+        Dict: Resend send params for the email
+    """
+    renderer = renderer or DigestEmailRenderer(week_start, week_end)
+    return {
+        "from": default_sender(),
+        "to": [email],
+        "subject": renderer.subject,
+        "html": renderer.render(user_name, normas_summaries),
+    }
+
+
+def send_weekly_digest_email(
+    email: str,
+    user_name: str,
+    week_start: date,
+    week_end: date,
+    normas_summaries: List[Dict[str, Any]]
+) -> bool:
+    """
+    Send a personalized weekly digest email to a single user.
+    
+    Returns:
+        bool: True if email sent successfully, False otherwise
+    """
+    if not settings.RESEND_API_KEY:
+        logger.warning("RESEND_API_KEY not configured, skipping email")
+        return False
     
     try:
-        resend.Emails.send({
-            "from": f"Simpla <{settings.EMAIL_FROM or 'no-reply@simplalegal.com'}>",
-            "to": [email],
-            "subject": f"Resumen Semanal de Normas ({week_start_str} - {week_end_str})",
-            "html": html_content,
-        })
+        get_email_dispatcher().send(
+            build_weekly_digest_email(email, user_name, week_start, week_end, normas_summaries),
+            category=EMAIL_CATEGORY
+        )
         logger.info(f"Successfully sent weekly digest email to {email}")
         return True
     except Exception as e:
@@ -298,17 +375,24 @@ def send_weekly_digest_email(
         return False
 
 
-def send_digest_to_users(
+async def send_digest_to_users(
     users_with_preferences: List[tuple],
     week_start: date,
     week_end: date,
     normas_with_summaries: List[Dict[str, Any]],
-    digest_service
-) -> int:
+    digest_service,
+    digest_id: Any,
+    on_progress: Optional[Callable[[int, int], None]] = None
+) -> Dict[str, Any]:
     """
     Send personalized digests to all users based on their preferences.
     
-    Includes rate limiting to respect Resend's 2 requests per second limit.
+    Emails go out through the shared dispatcher (batch requests under the
+    Resend rate limit). Each one is keyed by digest and user, so running this
+    again for the same digest only emails the users that did not get it;
+    those users are left out before anything is rendered. Emails are rendered
+    one dispatch round (concurrent batch requests) at a time, so only that
+    round's HTML is held in memory.
     
     Args:
         users_with_preferences: List of (User, preferences_dict) tuples
@@ -316,45 +400,77 @@ def send_digest_to_users(
         week_end: End date of the week
         normas_with_summaries: All normas with summaries from the digest
         digest_service: DigestService instance for filtering
+        digest_id: Id of the digest being sent, part of the idempotency key
+        on_progress: Optional callback(done, total) called as batches complete
     
     Returns:
-        int: Number of emails successfully sent
+        Dict: Dispatch result (sent, skipped, failed, throughput)
     """
-    emails_sent = 0
+    if not settings.RESEND_API_KEY:
+        logger.warning("RESEND_API_KEY not configured, skipping digest emails")
+        return {"total": 0, "sent": 0, "skipped": 0, "failed": 0}
     
-    for user, preferences in users_with_preferences:
+    started = time.perf_counter()
+    dispatcher = get_email_dispatcher()
+    keyed_users = [
+        (f"{EMAIL_CATEGORY}:{digest_id}:{user.id}", user, preferences)
+        for user, preferences in users_with_preferences
+    ]
+    already_sent = dispatcher.sent_keys([key for key, _, _ in keyed_users])
+    
+    # Index the normas and every user's keywords once, then match each user
+    matcher = digest_service.build_preference_matcher(normas_with_summaries, users_with_preferences)
+    recipients = []
+    for key, user, preferences in keyed_users:
+        if key in already_sent:
+            continue
         try:
             # Filter normas for this user (returns all if no preferences)
-            filtered_normas = digest_service.filter_normas_for_user(
-                preferences,
-                normas_with_summaries
-            )
+            filtered_normas = matcher.filter(preferences)
             
             # Only send email if there are normas to send
-            if filtered_normas:
-                success = send_weekly_digest_email(
-                    email=user.email,
-                    user_name=user.name,
-                    week_start=week_start,
-                    week_end=week_end,
-                    normas_summaries=filtered_normas
-                )
-                
-                if success:
-                    emails_sent += 1
-                
-                # Rate limiting: Resend allows 2 requests per second
-                # Sleep for 0.6 seconds to stay safely under the limit
-                time.sleep(0.6)
-            else:
+            if not filtered_normas:
                 logger.info(f"Skipping user {user.email} - no normas match their preferences")
-                
+                continue
+            recipients.append((key, user, filtered_normas))
         except Exception as e:
             logger.error(f"Error processing digest for user {user.email}: {str(e)}", exc_info=True)
-            # Still sleep on error to maintain rate limit
-            time.sleep(0.6)
-            continue
     
-    logger.info(f"Sent {emails_sent} digest emails to users")
-    return emails_sent
-
+    # Users with the same filtered normas share one rendered body
+    renderer = DigestEmailRenderer(week_start, week_end)
+    total = len(recipients) + len(already_sent)
+    result = {"total": total, "sent": 0, "skipped": len(already_sent), "failed": 0, "batches": 0}
+    round_size = dispatcher.batch_size * dispatcher.max_concurrency
+    for offset in range(0, len(recipients), round_size):
+        emails = []
+        for key, user, filtered_normas in recipients[offset:offset + round_size]:
+            try:
+                emails.append((
+                    key,
+                    build_weekly_digest_email(
+                        email=user.email,
+                        user_name=user.name,
+                        week_start=week_start,
+                        week_end=week_end,
+                        normas_summaries=filtered_normas,
+                        renderer=renderer
+                    )
+                ))
+            except Exception as e:
+                logger.error(f"Error rendering digest for user {user.email}: {str(e)}", exc_info=True)
+        
+        done_before = len(already_sent) + offset
+        round_result = await dispatcher.send_many(
+            emails,
+            category=EMAIL_CATEGORY,
+            on_progress=(lambda done, _, done_before=done_before: on_progress(done_before + done, total)) if on_progress else None
+        )
+        for counter in ("sent", "skipped", "failed", "batches"):
+            result[counter] += round_result[counter]
+    
+    elapsed = time.perf_counter() - started
+    result["seconds"] = round(elapsed, 2)
+    result["emails_per_second"] = round(result["sent"] / elapsed, 1) if elapsed > 0 else 0.0
+    logger.info(f"Rendered {renderer.renders} digest emails from {renderer.distinct_bodies} distinct bodies")
+    logger.info(f"Sent {result['sent']} digest emails to users ({result['skipped']} had already received it)")
+    return result
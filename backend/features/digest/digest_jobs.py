@@ -0,0 +1,75 @@
+"""Background job handlers for the weekly digest feature."""
+
+from datetime import date
+from typing import Any, Dict, Optional
+
+from core.database.base import SessionLocal
+from core.utils.logging_config import get_logger
+from features.jobs.jobs_service import JobContext
+from .digest_models import DigestWeekly
+from .digest_service import DigestService
+from .digest_email_service import send_digest_to_users
+
+logger = get_logger(__name__)
+
+
+def _parse_date(value: Optional[str]) -> Optional[date]:
+    return date.fromisoformat(value) if value else None
+
+
+async def run_weekly_digest_job(ctx: JobContext) -> Dict[str, Any]:
+    """
+    Generate the weekly digest and email it to every user.
+
+    Checkpoints the generated digest id, and every email is keyed by digest and
+    user in the dispatcher, so a retry neither regenerates the digest nor emails
+    anyone twice.
+    """
+    db = SessionLocal()
+    try:
+        digest_service = DigestService()
+
+        digest = None
+        if ctx.checkpoint.get("digest_id"):
+            digest = db.query(DigestWeekly).filter(DigestWeekly.id == ctx.checkpoint["digest_id"]).first()
+        if digest is None:
+            ctx.report_progress(5, "Generating weekly digest")
+            digest = await digest_service.generate_weekly_digest(
+                db=db,
+                custom_start=_parse_date(ctx.payload.get("week_start")),
+                custom_end=_parse_date(ctx.payload.get("week_end")),
+                force=ctx.payload.get("force", False),
+                sections=ctx.payload.get("sections")
+            )
+            ctx.save_checkpoint(digest_id=str(digest.id))
+        ctx.report_progress(50, f"Digest {digest.id} ready")
+
+        users_with_preferences = []
+        delivery = {"sent": 0, "skipped": 0, "failed": 0}
+        if ctx.payload.get("send_emails", True) and digest.article_json:
+            users_with_preferences = digest_service.get_users_with_preferences(db)
+            logger.info(f"Sending weekly digest to {len(users_with_preferences)} users")
+
+            def on_progress(done: int, total: int):
+                ctx.report_progress(50 + int(50 * done / max(total, 1)), f"Emailed {done}/{total} users")
+
+            delivery = await send_digest_to_users(
+                users_with_preferences=users_with_preferences,
+                week_start=digest.week_start,
+                week_end=digest.week_end,
+                normas_with_summaries=digest.article_json.get('normas', []),
+                digest_service=digest_service,
+                digest_id=digest.id,
+                on_progress=on_progress
+            )
+
+        return {
+            "digest_id": str(digest.id),
+            "total_normas": digest.total_normas or 0,
+            "users_found": len(users_with_preferences),
+            "emails_sent": delivery["sent"] + delivery["skipped"],
+            "emails_failed": delivery["failed"],
+            "emails_per_second": delivery.get("emails_per_second", 0.0)
+        }
+    finally:
+        db.close()
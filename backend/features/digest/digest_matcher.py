@@ -0,0 +1,170 @@
+"""Compiled matcher for filtering a digest's normas by each user's preferences."""
+
+from collections import deque
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+# (tipo_norma values, dependencia values, lowercased titulo_sumario keywords)
+PreferenceKey = Tuple[FrozenSet[Any], FrozenSet[Any], FrozenSet[str]]
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton: finds every keyword contained in a text in one pass."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = sorted(set(keywords))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Set[int]] = [set()]
+
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(set())
+                state = next_state
+            self._output[state].add(index)
+
+        # Breadth-first so a state's failure link is resolved before its children
+        # (children of the root fail to the root)
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] |= self._output[self._fail[child]]
+
+    def find(self, text: str) -> Set[str]:
+        """Keywords that occur in ``text`` (matching is exact; lowercase both sides beforehand)."""
+        found: Set[int] = set(self._output[0])
+        state = 0
+        for char in text:
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            if self._output[state]:
+                found |= self._output[state]
+        return {self.keywords[index] for index in found}
+
+
+def _as_list(value: Any) -> List[Any]:
+    return value if isinstance(value, list) else []
+
+
+def preference_key(preferences: Optional[Dict[str, Any]]) -> Optional[PreferenceKey]:
+    """
+    Normalize a user's ``filter_options`` into hashable sets, or None when the
+    user has no usable preference (and therefore gets every norma).
+
+    ``tipo_norma`` and ``dependencia`` must be lists; ``titulo_sumario`` may
+    be a list of keywords or a single keyword string.
+    """
+    if not preferences:
+        return None
+
+    def _hashable(values: List[Any]) -> FrozenSet[Any]:
+        return frozenset(value for value in values if isinstance(value, (str, int, float, bool)))
+
+    tipos = _hashable(_as_list(preferences.get('tipo_norma')))
+    dependencias = _hashable(_as_list(preferences.get('dependencia')))
+
+    keywords = preferences.get('titulo_sumario')
+    if isinstance(keywords, str):
+        keywords = [keywords] if keywords else []
+    keywords = frozenset(keyword.lower() for keyword in _as_list(keywords) if isinstance(keyword, str))
+
+    if not (tipos or dependencias or keywords):
+        return None
+    return tipos, dependencias, keywords
+
+
+class PreferenceMatcher:
+    """
+    Per-digest index for filtering normas by user preferences.
+
+    Built once per digest: normas are grouped by ``tipo_norma`` and
+    ``dependencia``, and one Aho-Corasick pass over each ``titulo_sumario``
+    records which of the users' keywords it contains. Each group is stored
+    as a bitset (an int, bit ``i`` = norma ``i``), so matching a user is a
+    union of a few precomputed bitsets. A norma matches when it satisfies
+    ANY of the user's preferences; users without preferences get every norma.
+    Results are memoized per distinct preference set.
+    """
+
+    def __init__(self, normas: List[Dict[str, Any]], all_preferences: Iterable[Optional[Dict[str, Any]]] = ()):
+        self.normas = normas
+        self._all = (1 << len(normas)) - 1
+        self._by_tipo: Dict[Any, int] = {}
+        self._by_dependencia: Dict[Any, int] = {}
+        self._by_keyword: Dict[str, int] = {}
+        self._cache: Dict[PreferenceKey, List[Dict[str, Any]]] = {}
+        self._titulos = [(norma.get('titulo_sumario') or '').lower() for norma in normas]
+
+        for index, norma in enumerate(normas):
+            bit = 1 << index
+            for field, groups in (('tipo_norma', self._by_tipo), ('dependencia', self._by_dependencia)):
+                value = norma.get(field)
+                try:
+                    groups[value] = groups.get(value, 0) | bit
+                except TypeError:
+                    continue
+
+        keywords: Set[str] = set()
+        for preferences in all_preferences:
+            key = preference_key(preferences)
+            if key:
+                keywords |= key[2]
+        self._index_keywords(keywords)
+
+    def _index_keywords(self, keywords: Iterable[str]):
+        new_keywords = {keyword for keyword in keywords if keyword not in self._by_keyword}
+        if not new_keywords:
+            return
+        for keyword in new_keywords:
+            self._by_keyword[keyword] = 0
+        automaton = KeywordAutomaton(new_keywords)
+        for index, titulo in enumerate(self._titulos):
+            for keyword in automaton.find(titulo):
+                self._by_keyword[keyword] |= 1 << index
+
+    def match_bits(self, preferences: Optional[Dict[str, Any]]) -> int:
+        """Bitset of the normas matching ``preferences``."""
+        key = preference_key(preferences)
+        return self._all if key is None else self._bits_for(key)
+
+    def _bits_for(self, key: PreferenceKey) -> int:
+        tipos, dependencias, keywords = key
+        # Keywords of users not passed at build time are indexed on first use
+        self._index_keywords(keywords)
+
+        bits = 0
+        for value in tipos:
+            bits |= self._by_tipo.get(value, 0)
+        for value in dependencias:
+            bits |= self._by_dependencia.get(value, 0)
+        for keyword in keywords:
+            bits |= self._by_keyword[keyword]
+        return bits
+
+    def filter(self, preferences: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Normas matching ``preferences``, in digest order."""
+        key = preference_key(preferences)
+        if key is None:
+            return self.normas
+        if key not in self._cache:
+            bits = self._bits_for(key)
+            matched = []
+            while bits:
+                lowest = bits & -bits
+                matched.append(self.normas[lowest.bit_length() - 1])
+                bits ^= lowest
+            self._cache[key] = matched
+        return self._cache[key]
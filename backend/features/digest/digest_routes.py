@@ -6,6 +6,7 @@ from typing import List, Optional
 from datetime import date
 from core.database.base import get_db
 from core.utils.logging_config import get_logger
+from features.jobs.jobs_service import enqueue_job
 from features.auth.auth_utils import get_current_user
 from features.auth.auth_models import User
 from .digest_schemas import (
@@ -31,48 +32,40 @@ async def trigger_weekly_digest(
     """
     Trigger the weekly digest generation process.
     
-    This endpoint:
+    Enqueues a background job that:
     1. Fetches normas from the current/specified week
     2. Filters and generates summaries
     3. Creates a generic weekly digest
     4. Sends personalized digests to all users via email
     
+    Returns immediately with the job id; poll /jobs/{job_id}/ for progress.
+    A failed run resumes from its checkpoints when triggered again; use
+    `force` (and `sections`) to regenerate parts of an existing digest.
     Can be called manually or scheduled to run every Friday.
     """
     logger.info("Triggering weekly digest generation")
     
     try:
-        # Initialize service
-        digest_service = DigestService()
-        
-        # Generate the weekly digest
-        digest = await digest_service.generate_weekly_digest(
-            db=db,
-            custom_start=request.week_start,
-            custom_end=request.week_end
+        week_start, week_end = DigestService()._get_week_dates(request.week_start, request.week_end)
+        job = enqueue_job(
+            db,
+            "weekly_digest",
+            payload={
+                "week_start": week_start.isoformat(),
+                "week_end": week_end.isoformat(),
+                "force": request.force,
+                "sections": request.sections,
+                # A forced regeneration fixes the digest content, it doesn't re-send it
+                "send_emails": not request.force
+            },
+            dedupe_key=f"weekly_digest:{week_start}:{week_end}"
         )
         
-        # Get users with their preferences
-        users_with_preferences = digest_service.get_users_with_preferences(db)
-        logger.info(f"Found {len(users_with_preferences)} users to send digests to")
-        
-        # Send personalized emails to users
-        emails_sent = 0
-        if users_with_preferences and digest.article_json:
-            normas_summaries = digest.article_json.get('normas', [])
-            emails_sent = send_digest_to_users(
-                users_with_preferences=users_with_preferences,
-                week_start=digest.week_start,
-                week_end=digest.week_end,
-                normas_with_summaries=normas_summaries,
-                digest_service=digest_service
-            )
-        
         return TriggerDigestResponse(
             success=True,
-            message=f"Weekly digest generated successfully with {digest.total_normas} normas",
-            digest_id=digest.id,
-            emails_sent=emails_sent
+            message=f"Weekly digest for {week_start} to {week_end} queued",
+            job_id=job.id,
+            status=job.status
         )
         
     except Exception as e:
@@ -126,13 +119,15 @@ async def trigger_digest_test(
             # Send personalized emails to users
             if users_with_preferences and digest.article_json:
                 normas_summaries = digest.article_json.get('normas', [])
-                emails_sent = send_digest_to_users(
+                delivery = await send_digest_to_users(
                     users_with_preferences=users_with_preferences,
                     week_start=digest.week_start,
                     week_end=digest.week_end,
                     normas_with_summaries=normas_summaries,
-                    digest_service=digest_service
+                    digest_service=digest_service,
+                    digest_id=digest.id
                 )
+                emails_sent = delivery["sent"]
         
         return {
             "success": True,
@@ -262,7 +257,9 @@ async def list_weekly_digests(
     logger.info(f"Listing weekly digests (limit: {limit}, offset: {offset})")
     
     try:
+        # Digests still being generated (no article yet) are not listed
         digests = db.query(DigestWeekly)\
+            .filter(DigestWeekly.article_summary.isnot(None))\
             .order_by(DigestWeekly.week_start.desc())\
             .limit(limit)\
             .offset(offset)\
@@ -341,6 +338,7 @@ async def get_latest_weekly_digest(
     
     try:
         digest = db.query(DigestWeekly)\
+            .filter(DigestWeekly.article_summary.isnot(None))\
             .order_by(DigestWeekly.week_start.desc())\
             .first()
         
@@ -42,6 +42,8 @@ class TriggerDigestRequest(BaseModel):
     """Schema for manually triggering digest generation."""
     week_start: Optional[date] = Field(None, description="Start date for the digest (Monday)")
     week_end: Optional[date] = Field(None, description="End date for the digest (Friday)")
+    force: bool = Field(False, description="Regenerate an existing digest (emails are not re-sent)")
+    sections: Optional[List[str]] = Field(None, description="With force, parts to regenerate: 'summaries', 'article' (default both)")
 
 
 class TriggerDigestResponse(BaseModel):
@@ -50,4 +52,6 @@ class TriggerDigestResponse(BaseModel):
     message: str
     digest_id: Optional[UUID] = None
     emails_sent: int = 0
+    job_id: Optional[UUID] = Field(None, description="Background job generating and sending the digest")
+    status: Optional[str] = Field(None, description="Job status, see /jobs/{job_id}/")
 
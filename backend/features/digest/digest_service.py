@@ -1,6 +1,5 @@
 """Service layer for weekly digest generation."""
 
-import asyncio
 from datetime import date, timedelta
 from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
@@ -8,18 +7,46 @@ from core.utils.logging_config import get_logger
 from features.conversations.ai_service import get_ai_service_instance
 from features.conversations.ai_services.base import Message
 from shared.utils.norma_reconstruction import get_norma_reconstructor
+from shared.utils.llm_scheduler import (
+    get_llm_scheduler,
+    gather_cancel_on_error,
+    LLMRateLimitError,
+    PRIORITY_HIGH,
+    PRIORITY_NORMAL
+)
+from shared.utils.llm_batching import pack_batches, split_batch_response
+from shared.utils.llm_cache import get_llm_result_cache, content_hash, describe_model, truncated_version
+from features.daily_digest.daily_digest_service import get_cached_analyses
 from .digest_models import DigestWeekly, DigestUserPreferences
+from .digest_matcher import PreferenceMatcher
 from features.auth.auth_models import User
 import uuid
 
 logger = get_logger(__name__)
 
+# Parts of the weekly digest that can be regenerated with force
+WEEKLY_DIGEST_SECTIONS = ("summaries", "article")
+
+# Bump when the summary prompt changes so cached summaries are not reused
+SUMMARY_PROMPT_VERSION = "weekly_summary/v1"
+
+# Batched summaries: several normas per LLM call, bounded by prompt size
+BATCH_PROMPT_CHAR_BUDGET = 24000
+BATCH_MAX_NORMAS = 8
+BATCH_NORMA_CONTENT_CHARS = 3000
+
+SUMMARY_SYSTEM_PROMPT = """Sos un asistente legal especializado en derecho argentino. 
+Tu tarea es generar resúmenes concisos de normas legales, destacando los puntos más relevantes y las conclusiones principales.
+El resumen debe ser claro, profesional y útil para profesionales del derecho."""
+
 
 class DigestService:
     """Service for generating and managing weekly digests."""
     
     def __init__(self):
         self.ai_service = get_ai_service_instance()
+        self.scheduler = get_llm_scheduler()
+        self.summary_cache = get_llm_result_cache()
         self.reconstructor = get_norma_reconstructor()
     
     def _get_week_dates(self, custom_start: Optional[date] = None, custom_end: Optional[date] = None) -> Tuple[date, date]:
@@ -50,6 +77,7 @@ class DigestService:
                             ns.id,
                             ns.infoleg_id,
                             ns.tipo_norma,
+                            ns.clase_norma,
                             nr.numero,
                             ns.titulo_resumido,
                             ns.titulo_sumario,
@@ -108,102 +136,219 @@ class DigestService:
         logger.info(f"Filtered to {len(filtered)} relevant normas from {len(normas)} total")
         return filtered
     
+    def _norma_summary_input(self, norma: Dict[str, Any], max_chars: int) -> str:
+        """Format the type, title and (truncated) content of a norma for the summary prompts."""
+        # Priority: titulo_resumido > titulo_sumario
+        titulo = norma.get('titulo_resumido') or norma.get('titulo_sumario', 'Sin título')
+        # Priority: purified_texto_norma_actualizado > purified_texto_norma > texto_resumido > texto_norma_actualizado > texto_norma
+        content = (
+            norma.get('purified_texto_norma_actualizado') or 
+            norma.get('purified_texto_norma') or 
+            norma.get('texto_resumido') or 
+            norma.get('texto_norma_actualizado') or 
+            norma.get('texto_norma') or 
+            ''
+        )
+        tipo_norma = norma.get('tipo_norma', 'Norma')
+        numero = norma.get('numero', '')
+        
+        # Truncate very long content to avoid token limits
+        if len(content) > max_chars:
+            content = content[:max_chars] + "..."
+        
+        return f"""Tipo: {tipo_norma} {numero}
+Título: {titulo}
+
+Contenido:
+{content}"""
+    
     async def _generate_norma_summary(self, norma: Dict[str, Any]) -> str:
         """Generate a summary for a single norma using LLM."""
         try:
-            # Prepare content for summarization
-            # Priority: titulo_resumido > titulo_sumario
-            titulo = norma.get('titulo_resumido') or norma.get('titulo_sumario', 'Sin título')
-            # Priority: purified_texto_norma_actualizado > purified_texto_norma > texto_resumido > texto_norma_actualizado > texto_norma
-            content = (
-                norma.get('purified_texto_norma_actualizado') or 
-                norma.get('purified_texto_norma') or 
-                norma.get('texto_resumido') or 
-                norma.get('texto_norma_actualizado') or 
-                norma.get('texto_norma') or 
-                ''
-            )
-            tipo_norma = norma.get('tipo_norma', 'Norma')
-            numero = norma.get('numero', '')
-            
-            # Truncate very long content to avoid token limits
-            max_chars = 8000
-            if len(content) > max_chars:
-                content = content[:max_chars] + "..."
-            
-            system_prompt = """Sos un asistente legal especializado en derecho argentino. 
-Tu tarea es generar resúmenes concisos de normas legales, destacando los puntos más relevantes y las conclusiones principales.
-El resumen debe ser claro, profesional y útil para profesionales del derecho."""
-            
             user_prompt = f"""Resumí la siguiente norma legal en español, destacando los puntos más relevantes y las conclusiones principales.
 El resumen debe tener entre 100 y 200 palabras.
 
-Tipo: {tipo_norma} {numero}
-Título: {titulo}
-
-Contenido:
-{content}
+{self._norma_summary_input(norma, max_chars=8000)}
 
 Generá un resumen que capture la esencia de esta norma y sus implicancias más importantes."""
             
             messages = [Message(role="user", content=user_prompt)]
             
-            # Generate summary by streaming (we'll collect all chunks)
-            summary_parts = []
-            async for chunk in self.ai_service.generate_stream(messages, system_prompt):
-                summary_parts.append(chunk)
-            
-            summary = ''.join(summary_parts)
+            # Generate summary through the shared scheduler (quota, priority, 429 backoff)
+            priority = PRIORITY_HIGH if norma.get('tipo_norma') in ['Ley', 'Decreto'] else PRIORITY_NORMAL
+            summary = await self.scheduler.complete(
+                self.ai_service, messages, SUMMARY_SYSTEM_PROMPT, priority=priority, expected_output_tokens=400
+            )
             logger.info(f"Generated summary for norma {norma.get('infoleg_id')}")
             
             return summary.strip()
             
+        except LLMRateLimitError:
+            # Quota exhausted even after backoff: fail the run so it resumes later
+            raise
         except Exception as e:
             logger.error(f"Error generating summary for norma {norma.get('infoleg_id')}: {str(e)}", exc_info=True)
-            # Fallback to content with same priority order
-            return (
-                norma.get('purified_texto_norma_actualizado') or 
-                norma.get('purified_texto_norma') or 
-                norma.get('texto_resumido') or 
-                norma.get('texto_norma_actualizado') or 
-                norma.get('texto_norma') or 
-                'No se pudo generar el resumen.'
+            return self._fallback_summary(norma)
+    
+    def _fallback_summary(self, norma: Dict[str, Any]) -> str:
+        """Summary used when the LLM fails: the norma content, with the same priority order."""
+        return (
+            norma.get('purified_texto_norma_actualizado') or 
+            norma.get('purified_texto_norma') or 
+            norma.get('texto_resumido') or 
+            norma.get('texto_norma_actualizado') or 
+            norma.get('texto_norma') or 
+            'No se pudo generar el resumen.'
+        )
+    
+    async def _generate_batch_summaries(self, normas: List[Dict[str, Any]]) -> List[Tuple[str, Optional[int]]]:
+        """
+        Summarize several normas with a single LLM call that returns a JSON array.
+
+        Normas missing from the answer, or the whole batch if it can't be
+        parsed, fall back to one call per norma. Returns ``(summary,
+        truncated_at)`` pairs in input order, where ``truncated_at`` is the
+        content limit of the batch prompt if it cut the norma short.
+        """
+        if len(normas) == 1:
+            return [(await self._generate_norma_summary(normas[0]), None)]
+        
+        ids = [norma['infoleg_id'] for norma in normas]
+        normas_block = "\n\n".join(
+            f"--- NORMA infoleg_id={norma['infoleg_id']} ---\n"
+            f"{self._norma_summary_input(norma, max_chars=BATCH_NORMA_CONTENT_CHARS)}"
+            for norma in normas
+        )
+        user_prompt = f"""Resumí cada una de las siguientes {len(normas)} normas legales en español, destacando los puntos más relevantes y las conclusiones principales.
+Cada resumen debe tener entre 100 y 200 palabras y capturar la esencia de la norma y sus implicancias más importantes.
+Resumí cada norma de forma independiente.
+
+{normas_block}
+
+Respondé SOLO con un JSON array con exactamente un objeto por norma, sin texto adicional:
+[
+{{"infoleg_id": el infoleg_id de la norma, "summary": "el resumen"}}
+]"""
+        
+        def _validate(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            summary = item.get('summary')
+            if not isinstance(summary, str) or not summary.strip():
+                return None
+            return {'summary': summary.strip()}
+        
+        summaries: Dict[int, Tuple[str, Optional[int]]] = {}
+        try:
+            has_priority_normas = any(norma.get('tipo_norma') in ['Ley', 'Decreto'] for norma in normas)
+            response = await self.scheduler.complete(
+                self.ai_service,
+                [Message(role="user", content=user_prompt)],
+                SUMMARY_SYSTEM_PROMPT,
+                priority=PRIORITY_HIGH if has_priority_normas else PRIORITY_NORMAL,
+                expected_output_tokens=400 * len(normas)
             )
+            truncated_ids = {
+                norma['infoleg_id'] for norma in normas
+                if self._norma_summary_input(norma, max_chars=BATCH_NORMA_CONTENT_CHARS)
+                != self._norma_summary_input(norma, max_chars=8000)
+            }
+            summaries = {
+                norma_id: (item['summary'], BATCH_NORMA_CONTENT_CHARS if norma_id in truncated_ids else None)
+                for norma_id, item in split_batch_response(response, ids, _validate).items()
+            }
+        except LLMRateLimitError:
+            raise
+        except Exception as e:
+            logger.warning(f"Batch summary of {len(normas)} normas failed, falling back to per-norma calls: {str(e)}")
+        
+        missing = [norma for norma in normas if norma['infoleg_id'] not in summaries]
+        if missing:
+            logger.info(f"Batch summary returned {len(summaries)}/{len(normas)} normas, summarizing {len(missing)} individually")
+            fallback = await gather_cancel_on_error(*(self._generate_norma_summary(norma) for norma in missing))
+            for norma, summary in zip(missing, fallback):
+                summaries[norma['infoleg_id']] = (summary, None)
+        
+        return [summaries[norma_id] for norma_id in ids]
     
-    async def _generate_summaries_for_normas(self, normas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """Generate summaries for all normas concurrently."""
+    async def _generate_summaries_for_normas(self, normas: List[Dict[str, Any]], use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Generate summaries for all normas, several per LLM call, with batches run concurrently.
+
+        Summaries are stored in the LLM result cache as each batch completes,
+        so a failed run resumes from the finished batches; the ones produced
+        from truncated batch content are stored under a marked version. Normas
+        already analyzed for a daily digest reuse its cached summary instead
+        of a new LLM call. ``use_cache=False`` ignores cached summaries (but
+        still refreshes the cache).
+        """
         logger.info(f"Generating summaries for {len(normas)} normas")
         
-        # Create tasks for concurrent processing
-        # To avoid overwhelming the API, we'll process in batches
-        batch_size = 5
+        # Reuse summaries cached for the same content, prompt version and model
+        # (also produced by regenerations of this week's digest)
+        model = describe_model(self.ai_service)
+        hashes = {norma['infoleg_id']: content_hash(self._norma_summary_input(norma, max_chars=8000)) for norma in normas}
+        cached = self.summary_cache.get_first_many(
+            [SUMMARY_PROMPT_VERSION, truncated_version(SUMMARY_PROMPT_VERSION, BATCH_NORMA_CONTENT_CHARS)],
+            model,
+            list(hashes.items())
+        ) if use_cache else {}
+        summaries_by_id = {
+            infoleg_id: cached[(infoleg_id, hash_)]['summary']
+            for infoleg_id, hash_ in hashes.items()
+            if (infoleg_id, hash_) in cached
+        }
+        pending = [norma for norma in normas if norma['infoleg_id'] not in summaries_by_id]
+        if use_cache and pending:
+            # The daily digest already summarized most of the week's normas
+            daily_analyses = get_cached_analyses(self.summary_cache, model, pending)
+            summaries_by_id.update(
+                (infoleg_id, analysis['resumen']) for infoleg_id, analysis in daily_analyses.items()
+            )
+            logger.info(f"Reusing {len(daily_analyses)} daily digest summaries")
+            pending = [norma for norma in pending if norma['infoleg_id'] not in summaries_by_id]
+        
+        # Pack the remaining normas into size-bounded prompts; the shared LLM
+        # scheduler bounds concurrency and paces requests to the quota
+        batches = pack_batches(
+            pending,
+            size_of=lambda norma: len(self._norma_summary_input(norma, max_chars=BATCH_NORMA_CONTENT_CHARS)),
+            max_chars=BATCH_PROMPT_CHAR_BUDGET,
+            max_items=BATCH_MAX_NORMAS
+        )
+        logger.info(f"Summarizing {len(pending)} normas in {len(batches)} batched LLM calls")
+        
+        async def _run_batch(batch: List[Dict[str, Any]]):
+            batch_summaries = await self._generate_batch_summaries(batch)
+            by_truncation: Dict[Optional[int], List[Tuple[int, str, Dict[str, str]]]] = {}
+            for norma, (summary, truncated_at) in zip(batch, batch_summaries):
+                summaries_by_id[norma['infoleg_id']] = summary
+                if summary != self._fallback_summary(norma):
+                    by_truncation.setdefault(truncated_at, []).append(
+                        (norma['infoleg_id'], hashes[norma['infoleg_id']], {'summary': summary})
+                    )
+            for max_chars, entries in by_truncation.items():
+                self.summary_cache.put_many(truncated_version(SUMMARY_PROMPT_VERSION, max_chars), model, entries)
+        
+        await gather_cancel_on_error(*(_run_batch(batch) for batch in batches))
+        
+        summaries = [summaries_by_id[norma['infoleg_id']] for norma in normas]
         normas_with_summaries = []
         
-        for i in range(0, len(normas), batch_size):
-            batch = normas[i:i + batch_size]
-            tasks = [self._generate_norma_summary(norma) for norma in batch]
-            summaries = await asyncio.gather(*tasks)
+        for norma, summary in zip(normas, summaries):
+            # Convert date to string for JSON serialization
+            publicacion = norma.get('publicacion')
+            if publicacion and isinstance(publicacion, date):
+                publicacion = publicacion.isoformat()
             
-            for norma, summary in zip(batch, summaries):
-                # Convert date to string for JSON serialization
-                publicacion = norma.get('publicacion')
-                if publicacion and isinstance(publicacion, date):
-                    publicacion = publicacion.isoformat()
-                
-                normas_with_summaries.append({
-                    'infoleg_id': norma['infoleg_id'],
-                    'tipo_norma': norma.get('tipo_norma'),
-                    'numero': norma.get('numero'),
-                    'titulo_sumario': norma.get('titulo_sumario'),
-                    'titulo': norma.get('titulo_resumido') or norma.get('titulo_sumario'),
-                    'summary': summary,
-                    'publicacion': publicacion,
-                    'dependencia': norma.get('dependencia')
-                })
-            
-            # Small delay between batches
-            if i + batch_size < len(normas):
-                await asyncio.sleep(1)
+            normas_with_summaries.append({
+                'infoleg_id': norma['infoleg_id'],
+                'tipo_norma': norma.get('tipo_norma'),
+                'numero': norma.get('numero'),
+                'titulo_sumario': norma.get('titulo_sumario'),
+                'titulo': norma.get('titulo_resumido') or norma.get('titulo_sumario'),
+                'summary': summary,
+                'publicacion': publicacion,
+                'dependencia': norma.get('dependencia')
+            })
         
         logger.info(f"Generated {len(normas_with_summaries)} summaries")
         return normas_with_summaries
@@ -240,15 +385,15 @@ Generá el artículo resumen semanal."""
             messages = [Message(role="user", content=user_prompt)]
             
             # Generate article
-            article_parts = []
-            async for chunk in self.ai_service.generate_stream(messages, system_prompt):
-                article_parts.append(chunk)
-            
-            article = ''.join(article_parts)
+            article = await self.scheduler.complete(
+                self.ai_service, messages, system_prompt, priority=PRIORITY_HIGH, expected_output_tokens=1200
+            )
             logger.info("Generated weekly digest article")
             
             return article.strip()
             
+        except LLMRateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Error generating weekly article: {str(e)}", exc_info=True)
             # Fallback to a simple concatenation
@@ -258,7 +403,9 @@ Generá el artículo resumen semanal."""
         self,
         db: Session,
         custom_start: Optional[date] = None,
-        custom_end: Optional[date] = None
+        custom_end: Optional[date] = None,
+        force: bool = False,
+        sections: Optional[List[str]] = None
     ) -> DigestWeekly:
         """
         Main method to generate the weekly digest.
@@ -266,81 +413,108 @@ Generá el artículo resumen semanal."""
         Steps:
         1. Fetch normas from the week
         2. Filter relevant normas
-        3. Generate summaries for each norma
+        3. Generate summaries for each norma (stored in the digest row before step 4)
         4. Generate consolidated weekly article
-        5. Store in database
+        
+        Each step is checkpointed: summaries are cached per batch as they
+        complete and the digest row is stored with them before the article
+        is written, so a failed run resumes without repeating LLM calls. A
+        complete digest is returned as is unless ``force`` is set, in which
+        case only the requested ``sections`` ("summaries", "article"; both if
+        omitted) are regenerated.
         """
         week_start, week_end = self._get_week_dates(custom_start, custom_end)
-        logger.info(f"Starting weekly digest generation for {week_start} to {week_end}")
+        logger.info(f"Starting weekly digest generation for {week_start} to {week_end} (force={force}, sections={sections})")
+        
+        forced = set(sections or WEEKLY_DIGEST_SECTIONS) if force else set()
+        unknown = forced - set(WEEKLY_DIGEST_SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown weekly digest sections: {sorted(unknown)}")
         
         # Check if digest already exists for this week
-        existing_digest = db.query(DigestWeekly).filter(
+        digest = db.query(DigestWeekly).filter(
             DigestWeekly.week_start == week_start,
             DigestWeekly.week_end == week_end
         ).first()
         
-        if existing_digest:
+        if digest and digest.article_summary is not None and not forced:
             logger.info(f"Digest already exists for week {week_start} to {week_end}")
-            return existing_digest
-        
-        # Step 1: Fetch normas
-        normas = self._fetch_weekly_normas(week_start, week_end)
+            return digest
         
-        if not normas:
-            logger.warning("No normas found for the week")
-            # Create empty digest
-            digest = DigestWeekly(
-                id=uuid.uuid4(),
-                week_start=week_start,
-                week_end=week_end,
-                article_summary="No se publicaron normas esta semana.",
-                total_normas=0,
-                article_json={'normas': []}
+        if digest is None or "summaries" in forced:
+            # Step 1: Fetch normas
+            normas = self._fetch_weekly_normas(week_start, week_end)
+            
+            # Step 2: Filter relevant normas
+            filtered_normas = self._filter_relevant_normas(normas) if normas else []
+            
+            if not filtered_normas:
+                message = (
+                    "No se encontraron normas relevantes esta semana." if normas
+                    else "No se publicaron normas esta semana."
+                )
+                logger.warning(message)
+                return self._save_digest(db, digest, week_start, week_end, [], article_summary=message)
+            
+            # Step 3: Generate summaries (forcing them bypasses the cache)
+            normas_with_summaries = await self._generate_summaries_for_normas(
+                filtered_normas,
+                use_cache="summaries" not in forced
             )
-            db.add(digest)
-            db.commit()
-            return digest
+            # Checkpoint: keep the summaries even if the article fails
+            digest = self._save_digest(
+                db, digest, week_start, week_end, normas_with_summaries,
+                article_summary=None if digest is None else digest.article_summary
+            )
+            if digest.article_summary is not None and "article" not in forced:
+                return digest
+        else:
+            logger.info(f"Resuming weekly digest {digest.id} from its stored summaries")
         
-        # Step 2: Filter relevant normas
-        filtered_normas = self._filter_relevant_normas(normas)
+        # Step 4: Generate weekly article
+        weekly_article = await self._generate_weekly_article(digest.article_json.get('normas', []))
+        digest.article_summary = weekly_article
+        db.commit()
+        db.refresh(digest)
         
-        if not filtered_normas:
-            logger.warning("No relevant normas after filtering")
+        logger.info(f"Successfully created weekly digest {digest.id}")
+        return digest
+    
+    def _save_digest(
+        self,
+        db: Session,
+        digest: Optional[DigestWeekly],
+        week_start: date,
+        week_end: date,
+        normas_with_summaries: List[Dict[str, Any]],
+        article_summary: Optional[str]
+    ) -> DigestWeekly:
+        """Create or update the digest row for the week with the given summaries and article."""
+        if digest is None:
             digest = DigestWeekly(
                 id=uuid.uuid4(),
                 week_start=week_start,
-                week_end=week_end,
-                article_summary="No se encontraron normas relevantes esta semana.",
-                total_normas=0,
-                article_json={'normas': []}
+                week_end=week_end
             )
             db.add(digest)
-            db.commit()
-            return digest
-        
-        # Step 3: Generate summaries
-        normas_with_summaries = await self._generate_summaries_for_normas(filtered_normas)
-        
-        # Step 4: Generate weekly article
-        weekly_article = await self._generate_weekly_article(normas_with_summaries)
-        
-        # Step 5: Store in database
-        digest = DigestWeekly(
-            id=uuid.uuid4(),
-            week_start=week_start,
-            week_end=week_end,
-            article_summary=weekly_article,
-            total_normas=len(normas_with_summaries),
-            article_json={'normas': normas_with_summaries}
-        )
-        
-        db.add(digest)
+        digest.article_summary = article_summary
+        digest.total_normas = len(normas_with_summaries)
+        digest.article_json = {'normas': normas_with_summaries}
         db.commit()
         db.refresh(digest)
-        
-        logger.info(f"Successfully created weekly digest {digest.id}")
         return digest
     
+    def build_preference_matcher(
+        self,
+        normas_with_summaries: List[Dict[str, Any]],
+        users_with_preferences: List[Tuple[User, Dict[str, Any]]] = ()
+    ) -> PreferenceMatcher:
+        """Index the digest's normas (and all users' keywords) once for filtering many users."""
+        return PreferenceMatcher(
+            normas_with_summaries,
+            (preferences for _, preferences in users_with_preferences)
+        )
+    
     def filter_normas_for_user(
         self,
         user_preferences: Dict[str, Any],
@@ -350,58 +524,10 @@ Generá el artículo resumen semanal."""
         
         Logic: If user has no preferences, include all normas.
         If user has preferences, include norma if it matches ANY of the preferences (OR logic).
-        """
-        # Check if user has any actual preferences
-        has_preferences = False
-        if user_preferences:
-            has_preferences = bool(
-                (user_preferences.get('tipo_norma') and isinstance(user_preferences['tipo_norma'], list) and len(user_preferences['tipo_norma']) > 0) or
-                (user_preferences.get('dependencia') and isinstance(user_preferences['dependencia'], list) and len(user_preferences['dependencia']) > 0) or
-                (user_preferences.get('titulo_sumario') and isinstance(user_preferences['titulo_sumario'], (list, str)) and (
-                    (isinstance(user_preferences['titulo_sumario'], list) and len(user_preferences['titulo_sumario']) > 0) or
-                    (isinstance(user_preferences['titulo_sumario'], str) and user_preferences['titulo_sumario'])
-                ))
-            )
         
-        if not has_preferences:
-            # No preferences, return all
-            return normas_with_summaries
-        
-        filtered = []
-        
-        for norma in normas_with_summaries:
-            # OR logic: include if norma matches ANY preference
-            matches_any = False
-            
-            # Check tipo_norma match
-            if 'tipo_norma' in user_preferences and user_preferences['tipo_norma']:
-                allowed_types = user_preferences['tipo_norma']
-                if isinstance(allowed_types, list) and norma.get('tipo_norma') in allowed_types:
-                    matches_any = True
-            
-            # Check dependencia match
-            if 'dependencia' in user_preferences and user_preferences['dependencia']:
-                allowed_dependencias = user_preferences['dependencia']
-                if isinstance(allowed_dependencias, list) and norma.get('dependencia') in allowed_dependencias:
-                    matches_any = True
-            
-            # Check titulo_sumario keyword match
-            if 'titulo_sumario' in user_preferences and user_preferences['titulo_sumario']:
-                keywords = user_preferences['titulo_sumario']
-                titulo_sumario = norma.get('titulo_sumario', '').lower()
-                
-                if isinstance(keywords, list):
-                    # Check if any keyword is in the titulo_sumario
-                    if any(keyword.lower() in titulo_sumario for keyword in keywords):
-                        matches_any = True
-                elif isinstance(keywords, str):
-                    if keywords.lower() in titulo_sumario:
-                        matches_any = True
-            
-            if matches_any:
-                filtered.append(norma)
-        
-        return filtered
+        For many users use ``build_preference_matcher`` once and call its ``filter``.
+        """
+        return PreferenceMatcher(normas_with_summaries, [user_preferences]).filter(user_preferences)
     
     def get_users_with_preferences(self, db: Session) -> List[Tuple[User, Dict[str, Any]]]:
         """Get all users with their digest preferences using efficient JOIN query."""
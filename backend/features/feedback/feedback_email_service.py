@@ -1,8 +1,7 @@
 """Email service for feedback functionality."""
 
-import time
-import resend
 from core.config.config import settings
+from shared.utils.email_dispatch import get_email_dispatcher, default_sender
 
 
 def send_feedback_email(message: str, origin: str = 'webapp', user_email: str | None = None, user_id: str | None = None) -> None:
@@ -20,9 +19,6 @@ def send_feedback_email(message: str, origin: str = 'webapp', user_email: str |
     if not feedback_emails:
         return
         
-    resend.api_key = settings.RESEND_API_KEY
-    
-    # Retry logic for reliability
     # Compose body with optional user context
     context_lines = []
     if user_email or user_id:
@@ -34,17 +30,13 @@ def send_feedback_email(message: str, origin: str = 'webapp', user_email: str |
         context_lines.append("")
     composed_text = ("\n".join(context_lines) + message) if context_lines else message
 
-    for attempt in range(3):
-        try:
-            resend.Emails.send({
-                "from": f"Feedback <{settings.EMAIL_FROM or 'no-reply@simplalegal.com'}>",
-                "to": feedback_emails,
-                "subject": f"Nuevo feedback ({origin})",
-                "text": composed_text,
-            })
-            return
-        except Exception as e:
-            if attempt == 2:  # Last attempt
-                raise e
-            # Small delay between attempts
-            time.sleep(0.5)
+    # Retries with backoff and rate limiting are handled by the dispatcher
+    get_email_dispatcher().send(
+        {
+            "from": default_sender("Feedback"),
+            "to": feedback_emails,
+            "subject": f"Nuevo feedback ({origin})",
+            "text": composed_text,
+        },
+        category="feedback"
+    )
@@ -0,0 +1,61 @@
+"""SQLAlchemy models for background jobs."""
+
+import uuid
+from sqlalchemy import Column, String, Integer, Text, DateTime, ForeignKey, Index, CheckConstraint, text
+from sqlalchemy.dialects.postgresql import UUID as PostgresUUID, JSONB
+from sqlalchemy.sql import func
+from core.database.base import Base
+
+
+class BackgroundJob(Base):
+    """A unit of batch work executed by the worker pool instead of inside an HTTP request."""
+    
+    __tablename__ = "background_jobs"
+    
+    id = Column(PostgresUUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_type = Column(String(100), nullable=False)  # Key in JOB_HANDLERS
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, failed
+    payload = Column(JSONB, nullable=False, default=dict)
+    result = Column(JSONB, nullable=True)
+    
+    # Resumable state written by the handler as it makes progress
+    checkpoint = Column(JSONB, nullable=False, default=dict)
+    progress = Column(Integer, nullable=False, default=0)  # 0-100
+    progress_message = Column(Text, nullable=True)
+    
+    # Retries
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    last_error = Column(Text, nullable=True)
+    run_after = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    
+    # Lease held by the worker running the job; an expired lease makes the job claimable again
+    locked_by = Column(String(100), nullable=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)
+    
+    # Avoids enqueuing the same work twice while a previous job is still active
+    dedupe_key = Column(String(255), nullable=True)
+    
+    # User who requested the job (None for scheduled and system jobs, visible to admins only)
+    created_by = Column(PostgresUUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('queued', 'running', 'succeeded', 'failed')",
+            name="check_background_job_status"
+        ),
+        Index('idx_background_jobs_claim', 'status', 'run_after'),
+        Index(
+            'idx_background_jobs_active_dedupe', 'dedupe_key',
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running') AND dedupe_key IS NOT NULL")
+        ),
+    )
+    
+    def __repr__(self) -> str:
+        return f"<BackgroundJob(id={self.id}, job_type={self.job_type}, status={self.status})>"
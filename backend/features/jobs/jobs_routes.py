@@ -0,0 +1,55 @@
+"""Routes for inspecting background jobs."""
+
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from sqlalchemy.orm import Session
+from core.database.base import get_db
+from core.utils.logging_config import get_logger
+from features.auth.auth_utils import get_current_user, is_admin
+from features.auth.auth_models import User
+from .jobs_schemas import JobResponse, JobListResponse
+from .jobs_service import get_job, list_jobs
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+
+@router.get("/jobs/", response_model=JobListResponse)
+async def list_background_jobs(
+    job_type: Optional[str] = Query(None, description="Filter by job type"),
+    job_status: Optional[str] = Query(None, alias="status", description="Filter by status"),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """List the most recent background jobs (every job for admins, the user's own otherwise)."""
+    jobs = list_jobs(
+        db,
+        job_type=job_type,
+        status=job_status,
+        limit=limit,
+        created_by=None if is_admin(current_user) else current_user.id
+    )
+    return JobListResponse(jobs=[JobResponse.model_validate(job) for job in jobs])
+
+
+@router.get("/jobs/{job_id}/", response_model=JobResponse)
+async def get_background_job(
+    job_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the status, progress and result of a background job.
+    Poll this endpoint with the job_id returned by the batch endpoints.
+    Only admins and the user who requested the job can see it.
+    """
+    job = get_job(db, job_id)
+    if not job or not (is_admin(current_user) or job.created_by == current_user.id):
+        # Same answer for jobs of other users, so job ids can't be probed
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return JobResponse.model_validate(job)
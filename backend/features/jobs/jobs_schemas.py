@@ -0,0 +1,39 @@
+"""Pydantic schemas for background job endpoints."""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+from pydantic import BaseModel
+
+
+class JobResponse(BaseModel):
+    """Schema for a background job status."""
+    id: UUID
+    job_type: str
+    status: str
+    progress: int = 0
+    progress_message: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = 3
+    last_error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    run_after: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobListResponse(BaseModel):
+    """Schema for a list of background jobs."""
+    jobs: List[JobResponse]
+
+
+class JobEnqueuedResponse(BaseModel):
+    """Schema returned by endpoints that hand their work to the job runner."""
+    success: bool = True
+    message: str
+    job_id: UUID
+    status: str
@@ -0,0 +1,295 @@
+"""Persistent job queue backed by the background_jobs table."""
+
+import random
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+
+from core.database.base import SessionLocal
+from core.utils.logging_config import get_logger
+from .jobs_models import BackgroundJob
+
+logger = get_logger(__name__)
+
+# How long a worker owns a job before another worker may pick it up again
+LEASE_SECONDS = 15 * 60
+# How often a worker renews the lease of the job it is running
+HEARTBEAT_SECONDS = 60
+# Retry delay is RETRY_BASE_SECONDS * 2^(attempt - 1), plus jitter
+RETRY_BASE_SECONDS = 30
+
+
+def enqueue_job(
+    db: Session,
+    job_type: str,
+    payload: Optional[Dict[str, Any]] = None,
+    dedupe_key: Optional[str] = None,
+    max_attempts: int = 3,
+    created_by: Optional[UUID] = None
+) -> BackgroundJob:
+    """
+    Add a job to the queue and return it.
+
+    If ``dedupe_key`` is given and a queued or running job with the same key
+    exists, that job is returned instead of creating a new one.
+    """
+    if dedupe_key:
+        existing = _get_active_job(db, dedupe_key)
+        if existing:
+            logger.info(f"Job {existing.id} already active for {dedupe_key}, not enqueuing again")
+            return existing
+
+    job = BackgroundJob(
+        job_type=job_type,
+        payload=payload or {},
+        checkpoint={},
+        dedupe_key=dedupe_key,
+        max_attempts=max_attempts,
+        created_by=created_by
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race against another request enqueuing the same work
+        db.rollback()
+        existing = _get_active_job(db, dedupe_key)
+        if existing:
+            return existing
+        raise
+    db.refresh(job)
+    logger.info(f"Enqueued job {job.id} ({job_type})")
+    return job
+
+
+def _get_active_job(db: Session, dedupe_key: str) -> Optional[BackgroundJob]:
+    return db.query(BackgroundJob).filter(
+        BackgroundJob.dedupe_key == dedupe_key,
+        BackgroundJob.status.in_(["queued", "running"])
+    ).first()
+
+
+def get_job(db: Session, job_id: UUID) -> Optional[BackgroundJob]:
+    """Get a job by id."""
+    return db.query(BackgroundJob).filter(BackgroundJob.id == job_id).first()
+
+
+def list_jobs(
+    db: Session,
+    job_type: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+    created_by: Optional[UUID] = None
+) -> List[BackgroundJob]:
+    """List the most recent jobs, optionally filtered by type, status and requesting user."""
+    query = db.query(BackgroundJob)
+    if created_by:
+        query = query.filter(BackgroundJob.created_by == created_by)
+    if job_type:
+        query = query.filter(BackgroundJob.job_type == job_type)
+    if status:
+        query = query.filter(BackgroundJob.status == status)
+    return query.order_by(BackgroundJob.created_at.desc()).limit(limit).all()
+
+
+def claim_next_job(worker_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Atomically take the next runnable job for this worker.
+
+    Runnable jobs are queued jobs whose retry delay has elapsed, and running
+    jobs whose lease expired because their worker died. An expired job that
+    already used all its attempts is marked failed instead. SKIP LOCKED lets
+    several workers poll the table concurrently without blocking each other.
+    """
+    db = SessionLocal()
+    try:
+        while True:
+            job = db.query(BackgroundJob).filter(
+                or_(
+                    and_(BackgroundJob.status == "queued", BackgroundJob.run_after <= func.now()),
+                    and_(BackgroundJob.status == "running", BackgroundJob.locked_until < func.now())
+                )
+            ).order_by(BackgroundJob.run_after).with_for_update(skip_locked=True).first()
+
+            if not job:
+                db.rollback()
+                return None
+
+            if job.status != "running":
+                break
+            if job.attempts < job.max_attempts:
+                logger.warning(f"Job {job.id} lease held by {job.locked_by} expired, resuming from checkpoint")
+                break
+
+            # Its worker died on the last allowed attempt (OOM, crash): give up instead of retrying forever
+            job.status = "failed"
+            job.last_error = (
+                f"Lease held by {job.locked_by} expired during attempt {job.attempts}/{job.max_attempts} "
+                f"(worker stopped without recording an outcome)"
+            )
+            job.locked_by = None
+            job.locked_until = None
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+            logger.error(f"Job {job.id} failed: {job.last_error}")
+
+        job.status = "running"
+        job.attempts += 1
+        job.locked_by = worker_name
+        job.locked_until = datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS)
+        job.started_at = job.started_at or datetime.now(timezone.utc)
+        db.commit()
+
+        return {
+            "id": job.id,
+            "job_type": job.job_type,
+            "payload": dict(job.payload or {}),
+            "checkpoint": dict(job.checkpoint or {}),
+            "attempts": job.attempts,
+            "max_attempts": job.max_attempts,
+            "locked_by": worker_name,
+        }
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def renew_lease(job_id: UUID, worker_name: str) -> bool:
+    """Extend the lease of a running job. False when ``worker_name`` no longer holds it."""
+    db = SessionLocal()
+    try:
+        renewed = db.query(BackgroundJob).filter(
+            BackgroundJob.id == job_id,
+            BackgroundJob.status == "running",
+            BackgroundJob.locked_by == worker_name
+        ).update(
+            {"locked_until": datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS)},
+            synchronize_session=False
+        )
+        db.commit()
+        return renewed > 0
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _get_owned_job(db: Session, job_id: UUID, worker_name: Optional[str]) -> Optional[BackgroundJob]:
+    """The job, locked for update, or None when another worker took it over after our lease expired."""
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id).with_for_update().first()
+    if job is not None and worker_name and job.locked_by != worker_name:
+        logger.warning(f"Job {job_id} is now held by {job.locked_by}, not recording the outcome of {worker_name}")
+        return None
+    return job
+
+
+def complete_job(job_id: UUID, result: Optional[Dict[str, Any]], worker_name: Optional[str] = None):
+    """Mark a job as succeeded and store its result (a no-op if ``worker_name`` lost the job)."""
+    db = SessionLocal()
+    try:
+        job = _get_owned_job(db, job_id, worker_name)
+        if job is None:
+            db.rollback()
+            return
+        job.status = "succeeded"
+        job.result = result or {}
+        job.progress = 100
+        job.locked_by = None
+        job.locked_until = None
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+    finally:
+        db.close()
+
+
+def fail_job(job_id: UUID, error: BaseException, worker_name: Optional[str] = None):
+    """
+    Record a failed attempt, scheduling a retry with exponential backoff if
+    attempts remain (a no-op if ``worker_name`` lost the job).
+    """
+    db = SessionLocal()
+    try:
+        job = _get_owned_job(db, job_id, worker_name)
+        if job is None:
+            db.rollback()
+            return
+        job.last_error = "".join(traceback.format_exception_only(type(error), error)).strip()
+        job.locked_by = None
+        job.locked_until = None
+
+        if job.attempts < job.max_attempts:
+            delay = RETRY_BASE_SECONDS * (2 ** (job.attempts - 1))
+            delay += random.uniform(0, delay * 0.1)
+            job.status = "queued"
+            job.run_after = datetime.now(timezone.utc) + timedelta(seconds=delay)
+            logger.warning(f"Job {job.id} attempt {job.attempts} failed, retrying in {delay:.0f}s: {job.last_error}")
+        else:
+            job.status = "failed"
+            job.finished_at = datetime.now(timezone.utc)
+            logger.error(f"Job {job.id} failed after {job.attempts} attempts: {job.last_error}")
+        db.commit()
+    finally:
+        db.close()
+
+
+class JobContext:
+    """
+    Handle passed to job handlers.
+
+    Exposes the payload and the last saved checkpoint, and lets the handler
+    report progress and persist checkpoints so a retry (or another worker after
+    a crash) resumes where this attempt left off. Every write renews the lease,
+    and is dropped once another worker holds the job.
+    """
+
+    def __init__(
+        self,
+        job_id: UUID,
+        payload: Dict[str, Any],
+        checkpoint: Dict[str, Any],
+        attempt: int,
+        worker_name: Optional[str] = None
+    ):
+        self.job_id = job_id
+        self.payload = payload
+        self.checkpoint = checkpoint
+        self.attempt = attempt
+        self.worker_name = worker_name
+
+    def report_progress(self, progress: int, message: Optional[str] = None):
+        """Update the job's progress (0-100) and status message."""
+        self._update(progress=max(0, min(100, int(progress))), progress_message=message)
+
+    def save_checkpoint(self, **updates):
+        """Merge ``updates`` into the checkpoint and persist it."""
+        self.checkpoint.update(updates)
+        self._update(checkpoint=dict(self.checkpoint))
+
+    def _update(self, **fields):
+        db = SessionLocal()
+        try:
+            query = db.query(BackgroundJob).filter(BackgroundJob.id == self.job_id)
+            if self.worker_name:
+                query = query.filter(BackgroundJob.locked_by == self.worker_name)
+            query.update(
+                {
+                    **fields,
+                    "locked_until": datetime.now(timezone.utc) + timedelta(seconds=LEASE_SECONDS),
+                },
+                synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Could not update job {self.job_id}: {str(e)}")
+        finally:
+            db.close()
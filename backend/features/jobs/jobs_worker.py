@@ -0,0 +1,181 @@
+"""
+Worker pool that executes background jobs in separate processes.
+
+Started by the API on startup (JOB_WORKERS processes, 0 disables it) or
+standalone with `python -m features.jobs.jobs_worker`.
+"""
+
+import asyncio
+import importlib
+import inspect
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+from .jobs_service import HEARTBEAT_SECONDS, JobContext, claim_next_job, complete_job, fail_job, renew_lease
+
+logger = get_logger(__name__)
+
+# job_type -> "module:function". Imported lazily inside the worker process.
+JOB_HANDLERS: Dict[str, str] = {
+    "weekly_digest": "features.digest.digest_jobs:run_weekly_digest_job",
+    "daily_newspaper_digest": "features.daily_digest.daily_digest_jobs:run_daily_newspaper_digest_job",
+    "normas_daily_batch": "features.normas.normas_jobs:run_normas_daily_batch_job",
+}
+
+_pool: List[multiprocessing.Process] = []
+_stop_event: Optional[Any] = None
+
+
+def _resolve_handler(job_type: str) -> Callable:
+    target = JOB_HANDLERS.get(job_type)
+    if not target:
+        raise ValueError(f"No handler registered for job type '{job_type}'")
+    module_name, function_name = target.split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _heartbeat(job_id, worker_name: str, done: threading.Event):
+    """Renew the job's lease until ``done`` is set, so long handlers keep it."""
+    while not done.wait(HEARTBEAT_SECONDS):
+        try:
+            if not renew_lease(job_id, worker_name):
+                logger.warning(f"Job {job_id} lease lost by {worker_name}, its outcome will not be recorded")
+                return
+        except Exception as e:
+            logger.warning(f"Could not renew the lease of job {job_id}: {str(e)}")
+
+
+def run_job(job: Dict[str, Any]):
+    """Run a claimed job and record its outcome."""
+    worker_name = job.get("locked_by")
+    ctx = JobContext(job["id"], job["payload"], job["checkpoint"], job["attempts"], worker_name)
+    started = time.perf_counter()
+    logger.info(f"Running job {job['id']} ({job['job_type']}), attempt {job['attempts']}/{job['max_attempts']}")
+
+    done = threading.Event()
+    if worker_name:
+        threading.Thread(
+            target=_heartbeat, args=(job["id"], worker_name, done), name="job-heartbeat", daemon=True
+        ).start()
+    try:
+        handler = _resolve_handler(job["job_type"])
+        if inspect.iscoroutinefunction(handler):
+            result = asyncio.run(handler(ctx))
+        else:
+            result = handler(ctx)
+    except Exception as e:
+        logger.error(f"Job {job['id']} raised: {str(e)}", exc_info=True)
+        fail_job(job["id"], e, worker_name)
+        return
+    finally:
+        done.set()
+
+    complete_job(job["id"], result, worker_name)
+    logger.info(f"Job {job['id']} succeeded in {time.perf_counter() - started:.1f}s")
+
+
+def run_worker(worker_name: str, stop_event=None, poll_interval: Optional[float] = None):
+    """Poll the job table and run jobs until ``stop_event`` is set."""
+    poll_interval = poll_interval or settings.JOB_POLL_INTERVAL_SECONDS
+    logger.info(f"Job worker {worker_name} started")
+
+    while not (stop_event and stop_event.is_set()):
+        try:
+            job = claim_next_job(worker_name)
+        except Exception as e:
+            logger.warning(f"Job worker {worker_name} could not poll the queue: {str(e)}")
+            job = None
+
+        if job:
+            run_job(job)
+        elif stop_event:
+            stop_event.wait(poll_interval)
+        else:
+            time.sleep(poll_interval)
+
+    logger.info(f"Job worker {worker_name} stopped")
+
+
+def _register_models():
+    """Import every model so SQLAlchemy can resolve relationships inside the worker process."""
+    from features.auth.auth_models import User, RefreshToken  # noqa: F401
+    from features.folders.folder_models import Folder, FolderNorma  # noqa: F401
+    from features.bookmarks.bookmarks_models import Bookmark  # noqa: F401
+    from features.conversations.models import Conversation, Message  # noqa: F401
+    from features.conversations.feedback.feedback_models import MessageFeedback  # noqa: F401
+    from features.subscription.subscription_models import SubscriptionTier, UserSubscription, UserUsage  # noqa: F401
+    from features.digest.digest_models import DigestWeekly, DigestUserPreferences  # noqa: F401
+    from features.jobs.jobs_models import BackgroundJob  # noqa: F401
+
+
+def _worker_process_main(worker_name: str, stop_event):
+    from core.utils.logging_config import setup_logging
+
+    setup_logging()
+    _register_models()
+    # The API process handles Ctrl+C and stops the pool through the event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    run_worker(worker_name, stop_event)
+
+
+def start_worker_pool(num_workers: Optional[int] = None):
+    """Spawn the worker processes. Safe to call once per API process."""
+    global _stop_event
+    num_workers = settings.JOB_WORKERS if num_workers is None else num_workers
+    if num_workers <= 0 or _pool:
+        return
+
+    ctx = multiprocessing.get_context("spawn")
+    _stop_event = ctx.Event()
+    host = socket.gethostname()
+    for i in range(num_workers):
+        worker_name = f"{host}:{os.getpid()}:worker-{i}"
+        process = ctx.Process(
+            target=_worker_process_main,
+            args=(worker_name, _stop_event),
+            name=f"job-worker-{i}",
+            daemon=True
+        )
+        process.start()
+        _pool.append(process)
+
+    logger.info(f"Started {num_workers} job worker processes")
+
+
+def stop_worker_pool(timeout: float = 10.0):
+    """Ask the workers to stop after their current job and wait for them."""
+    if not _pool:
+        return
+    _stop_event.set()
+    for process in _pool:
+        process.join(timeout)
+        if process.is_alive():
+            logger.warning(f"Job worker {process.name} did not stop in time, terminating")
+            process.terminate()
+    _pool.clear()
+
+
+if __name__ == "__main__":
+    from core.utils.logging_config import setup_logging
+
+    setup_logging()
+    _register_models()
+    stop = multiprocessing.get_context("spawn").Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        if settings.JOB_WORKERS > 1:
+            start_worker_pool(settings.JOB_WORKERS)
+            stop.wait()
+        else:
+            run_worker(f"{socket.gethostname()}:{os.getpid()}", stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_worker_pool()
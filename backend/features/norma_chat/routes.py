@@ -16,6 +16,7 @@ from features.conversations.service import ConversationService
 from features.subscription.rate_limit_service import RateLimitService
 from core.utils.logging_config import get_logger
 from shared.utils.norma_reconstruction import reconstruct_norma_by_infoleg_id, build_norma_text_context
+from shared.utils.token_counting import count_tokens
 
 router = APIRouter()
 logger = get_logger(__name__)
@@ -58,7 +59,7 @@ async def norma_chat(
         rate_limit_service = RateLimitService(db)
         
         # Step 1: Rate limiting check
-        estimated_tokens = max(50, len(request.question) // 4)
+        estimated_tokens = max(50, count_tokens(request.question))
         rate_limit_check = await rate_limit_service.check_rate_limit(user_id, estimated_tokens)
         
         if not rate_limit_check.allowed:
@@ -137,6 +138,7 @@ async def norma_chat(
         # This will create a conversation, persist messages, and stream the response
         ai_response_content = ""
         session_id = None
+        usage = None
         
         # Collect the streamed response
         async for chunk in conversation_service.stream_message_response(
@@ -151,6 +153,9 @@ async def norma_chat(
             if isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == "session_id":
                 session_id = chunk[1]
                 continue
+            if isinstance(chunk, tuple) and len(chunk) == 2 and chunk[0] == "usage":
+                usage = chunk[1]
+                continue
             
             # Accumulate content
             ai_response_content += chunk
@@ -162,7 +167,10 @@ async def norma_chat(
                 ai_response_content = f"No se pudo acceder al contenido de la norma {request.norma_id} y no se pudo generar una respuesta alternativa. Por favor, verifica el ID de la norma e intenta nuevamente."
 
         # Step 3: Record token usage (like in the normal conversation pipeline)
-        total_tokens = estimated_tokens + max(50, len(ai_response_content) // 4)
+        if usage is not None:
+            total_tokens = usage.total_tokens
+        else:
+            total_tokens = estimated_tokens + max(50, count_tokens(ai_response_content))
         await rate_limit_service.record_usage(user_id, total_tokens)
         
         logger.info(f"Successfully generated response for norma {request.norma_id} (norma_content_available: {norma_available}), session_id: {session_id}, tokens: {total_tokens}")
@@ -0,0 +1,171 @@
+"""Post-ingestion work for the daily normas batch."""
+
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from psycopg2.extras import RealDictCursor
+
+from shared.utils.norma_reconstruction import get_norma_reconstructor
+from core.utils.logging_config import get_logger
+from .normas_stats_service import get_normas_stats_service
+from .normas_graph_index import get_normas_graph_index
+
+logger = get_logger(__name__)
+
+NORM_UPDATE_TITLE = "Posible modificación en una norma guardada"
+
+# Single set-based statement: new normas -> relaciones -> favorites, grouped so
+# each user gets one notification per saved norma listing every new norma that
+# modifies it. The idempotency key makes reruns for the same batch a no-op.
+FAN_OUT_NORM_UPDATES_SQL = """
+    WITH new_normas AS (
+        SELECT ns.id, ns.infoleg_id, COALESCE(ns.titulo_resumido, ns.titulo_sumario) AS titulo
+        FROM normas_structured ns
+        WHERE ns.publicacion = %(batch_date)s
+    ),
+    modifications AS (
+        SELECT rel.norma_destino_infoleg_id AS saved_norma_id,
+               jsonb_agg(
+                   jsonb_build_object(
+                       'id', n.id,
+                       'infoleg_id', n.infoleg_id,
+                       'titulo', n.titulo,
+                       'tipo_relacion', rel.tipo_relacion
+                   ) ORDER BY n.infoleg_id
+               ) AS modifying_normas
+        FROM new_normas n
+        JOIN normas_relaciones rel ON rel.norma_origen_infoleg_id = n.infoleg_id
+        GROUP BY rel.norma_destino_infoleg_id
+    ),
+    recipients AS (
+        SELECT DISTINCT f.user_id, m.saved_norma_id, m.modifying_normas
+        FROM modifications m
+        JOIN favorites f ON f.norma_id = m.saved_norma_id AND f.is_deleted = false
+    )
+    INSERT INTO notifications (id, user_id, title, body, type, link, is_read, metadata, idempotency_key)
+    SELECT
+        gen_random_uuid(),
+        r.user_id,
+        %(title)s,
+        'Se publicó una norma nueva que podría modificar o complementar la norma que guardaste (ID '
+            || r.saved_norma_id || ').',
+        'norm_update',
+        '/normas/' || r.saved_norma_id,
+        false,
+        jsonb_build_object(
+            'type', 'norm_update',
+            'saved_norma_id', r.saved_norma_id,
+            'modifying_normas', r.modifying_normas
+        ),
+        'norm_update:' || %(batch_key)s || ':' || r.user_id || ':' || r.saved_norma_id
+    FROM recipients r
+    ON CONFLICT (idempotency_key) DO NOTHING
+"""
+
+
+def _timed(timings: Dict[str, float], stage: str, started: float):
+    timings[stage] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def _raise_for_failed_stages(failed_stages: List[str]) -> None:
+    """Fail the batch after the fan-out so the job is retried for the refresh stages that failed."""
+    if failed_stages:
+        raise RuntimeError(f"Refresh stages failed: {', '.join(failed_stages)}")
+
+
+def run_daily_batch(
+    batch_date: date,
+    completed_stages: Optional[Set[str]] = None,
+    on_stage_complete: Optional[Callable[[str], None]] = None
+) -> Dict[str, Any]:
+    """
+    Run every post-ingestion step for the normas published on ``batch_date``:
+      - Refresh materialized views, statistics summary and relationship graph
+      - Fan out `norm_update` notifications to users whose saved normas are
+        modified by the new normas
+
+    Refresh stages listed in ``completed_stages`` are skipped, and
+    ``on_stage_complete`` is called after each one that succeeds. A failed
+    refresh stage does not stop the notification fan-out, but once it is
+    done a RuntimeError naming the failed stages is raised, so the job is
+    retried and redoes only those stages. Returns the counts and per-stage
+    timings in milliseconds.
+    """
+    reconstructor = get_norma_reconstructor()
+    timings: Dict[str, float] = {}
+    completed_stages = completed_stages or set()
+    failed_stages: List[str] = []
+    refresh_stages = [
+        ("refresh_materialized_views", reconstructor.refresh_materialized_views),
+        ("refresh_stats", lambda: get_normas_stats_service().refresh()),
+        ("refresh_graph_index", lambda: get_normas_graph_index().refresh()),
+    ]
+
+    # Step A: Refresh materialized views (so front-end filters pick up new values),
+    # the statistics summary and the relationship graph index
+    for stage, refresh in refresh_stages:
+        if stage in completed_stages:
+            logger.info("Skipping %s, already done in a previous attempt", stage)
+            continue
+        started = time.perf_counter()
+        try:
+            refresh()
+            logger.info("%s done", stage)
+        except Exception as e:
+            # Not checkpointed: a retried job runs this stage again
+            logger.warning("%s failed: %s", stage, str(e))
+            failed_stages.append(stage)
+            _timed(timings, stage, started)
+            continue
+        _timed(timings, stage, started)
+        if on_stage_complete:
+            on_stage_complete(stage)
+
+    with reconstructor.get_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            # Step B: Count the normas of this batch
+            started = time.perf_counter()
+            cur.execute(
+                "SELECT COUNT(*) AS total FROM normas_structured WHERE publicacion = %s",
+                (batch_date,),
+            )
+            new_normas_count = cur.fetchone()['total']
+            _timed(timings, "find_new_normas", started)
+            logger.info("Found %d normas published on %s", new_normas_count, batch_date)
+
+            if not new_normas_count:
+                logger.info("No normas found for %s; nothing to notify (timings: %s)", batch_date, timings)
+                _raise_for_failed_stages(failed_stages)
+                return {
+                    "success": True,
+                    "notified": 0,
+                    "message": "No normas found for batch date",
+                    "timings_ms": timings,
+                }
+
+            # Step C: Join new normas -> relaciones -> favorites and insert in bulk
+            started = time.perf_counter()
+            cur.execute(
+                FAN_OUT_NORM_UPDATES_SQL,
+                {
+                    "batch_date": batch_date,
+                    "batch_key": batch_date.isoformat(),
+                    "title": NORM_UPDATE_TITLE,
+                },
+            )
+            notifications_created = cur.rowcount
+            conn.commit()
+            _timed(timings, "fan_out_notifications", started)
+
+    logger.info(
+        "Notifications created: %d for %d new normas (timings: %s)",
+        notifications_created, new_normas_count, timings,
+    )
+    _raise_for_failed_stages(failed_stages)
+    return {
+        "success": True,
+        "new_normas": new_normas_count,
+        "notified": notifications_created,
+        "timings_ms": timings,
+    }
@@ -0,0 +1,458 @@
+"""In-memory index over normas_relaciones for fast graph queries."""
+
+import json
+import os
+import stat
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from collections import deque
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from psycopg2.extras import RealDictCursor
+
+from shared.utils.norma_reconstruction import get_norma_reconstructor
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+SNAPSHOT_VERSION = 2
+# How often API processes look for a snapshot written by the job worker
+SNAPSHOT_CHECK_INTERVAL_SECONDS = 30
+
+# (titulo_resumido, titulo_sumario, tipo_norma, numero, sancion)
+NodeInfo = Tuple[Optional[str], Optional[str], Optional[str], Optional[int], Optional[date]]
+# (source_infoleg_id, target_infoleg_id, tipo_relacion)
+Edge = Tuple[int, int, str]
+
+
+class _GraphSnapshot:
+    """
+    Immutable CSR adjacency of the relationship graph.
+
+    Nodes are addressed by a dense index into ``ids``. Outgoing edges of node i
+    live in ``out_targets[out_offsets[i]:out_offsets[i + 1]]`` (norma origen ->
+    destino, i.e. "i modifica a ..."), incoming edges in the ``in_*`` arrays.
+    Relation types are stored as small integer codes into ``tipos``. Edges are
+    identified by their position in the outgoing arrays; ``in_edges_pos`` maps
+    each incoming slot back to that position.
+    """
+
+    def __init__(self, ids, index, tipos, out_offsets, out_targets, out_types,
+                 in_offsets, in_sources, in_types, in_edges_pos, degree_order, nodes, built_at):
+        self.ids = ids
+        self.index = index
+        self.tipos = tipos
+        self.out_offsets = out_offsets
+        self.out_targets = out_targets
+        self.out_types = out_types
+        self.in_offsets = in_offsets
+        self.in_sources = in_sources
+        self.in_types = in_types
+        self.in_edges_pos = in_edges_pos
+        self.degree_order = degree_order
+        self.nodes = nodes
+        self.built_at = built_at
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.out_targets)
+
+    @classmethod
+    def build(cls, relations: Iterable[Tuple[int, int, str]], nodes: Dict[int, NodeInfo]) -> "_GraphSnapshot":
+        """Build the CSR arrays from (origen, destino, tipo_relacion) rows."""
+        relations = list(relations)
+        ids = array('q', sorted({r[0] for r in relations} | {r[1] for r in relations}))
+        index = {infoleg_id: i for i, infoleg_id in enumerate(ids)}
+        tipos: List[str] = sorted({r[2] for r in relations})
+        tipo_codes = {tipo: code for code, tipo in enumerate(tipos)}
+
+        n = len(ids)
+        out_degree = [0] * n
+        in_degree = [0] * n
+        for origen, destino, _ in relations:
+            out_degree[index[origen]] += 1
+            in_degree[index[destino]] += 1
+
+        out_offsets = cls._prefix_sums(out_degree)
+        in_offsets = cls._prefix_sums(in_degree)
+
+        m = len(relations)
+        out_targets = array('l', [0]) * m
+        out_types = array('H', [0]) * m
+        in_sources = array('l', [0]) * m
+        in_types = array('H', [0]) * m
+        in_edges_pos = array('l', [0]) * m
+        out_cursor = list(out_offsets[:-1])
+        in_cursor = list(in_offsets[:-1])
+        for origen, destino, tipo in relations:
+            src, dst, code = index[origen], index[destino], tipo_codes[tipo]
+            out_targets[out_cursor[src]] = dst
+            out_types[out_cursor[src]] = code
+            in_sources[in_cursor[dst]] = src
+            in_types[in_cursor[dst]] = code
+            in_edges_pos[in_cursor[dst]] = out_cursor[src]
+            out_cursor[src] += 1
+            in_cursor[dst] += 1
+
+        degree_order = array('l', sorted(range(n), key=lambda i: out_degree[i] + in_degree[i], reverse=True))
+
+        return cls(
+            ids, index, tipos, out_offsets, out_targets, out_types,
+            in_offsets, in_sources, in_types, in_edges_pos, degree_order,
+            {infoleg_id: info for infoleg_id, info in nodes.items() if infoleg_id in index},
+            datetime.now(timezone.utc),
+        )
+
+    @staticmethod
+    def _prefix_sums(degrees: List[int]) -> array:
+        offsets = array('l', [0]) * (len(degrees) + 1)
+        total = 0
+        for i, degree in enumerate(degrees):
+            offsets[i] = total
+            total += degree
+        offsets[len(degrees)] = total
+        return offsets
+
+    def out_edges(self, i: int):
+        for k in range(self.out_offsets[i], self.out_offsets[i + 1]):
+            yield self.out_targets[k], self.out_types[k]
+
+    def in_edges(self, i: int):
+        for k in range(self.in_offsets[i], self.in_offsets[i + 1]):
+            yield self.in_sources[k], self.in_types[k]
+
+
+# CSR arrays stored as raw bytes after the JSON header of a snapshot, in this order
+_SNAPSHOT_ARRAYS = (
+    "ids", "out_offsets", "out_targets", "out_types", "in_offsets",
+    "in_sources", "in_types", "in_edges_pos", "degree_order",
+)
+_HEADER_LENGTH = struct.Struct("<Q")
+
+
+def _write_snapshot(f, graph: _GraphSnapshot):
+    """
+    Snapshot file: an 8-byte header length, a JSON header (version, array
+    layout, relation types, node info) and the CSR arrays as raw bytes.
+    Nothing in it is executed when loading.
+    """
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "arrays": [
+            [name, getattr(graph, name).typecode, getattr(graph, name).itemsize, len(getattr(graph, name))]
+            for name in _SNAPSHOT_ARRAYS
+        ],
+        "tipos": graph.tipos,
+        "nodes": [
+            [infoleg_id, titulo_resumido, titulo_sumario, tipo_norma, numero,
+             sancion.isoformat() if sancion else None]
+            for infoleg_id, (titulo_resumido, titulo_sumario, tipo_norma, numero, sancion) in graph.nodes.items()
+        ],
+        "built_at": graph.built_at.isoformat(),
+    }
+    encoded = json.dumps(header, ensure_ascii=False, default=str).encode("utf-8")
+    f.write(_HEADER_LENGTH.pack(len(encoded)))
+    f.write(encoded)
+    for name in _SNAPSHOT_ARRAYS:
+        getattr(graph, name).tofile(f)
+
+
+def _read_snapshot(f) -> Optional[_GraphSnapshot]:
+    """Graph written by ``_write_snapshot``, or None for another version or array layout."""
+    (length,) = _HEADER_LENGTH.unpack(f.read(_HEADER_LENGTH.size))
+    header = json.loads(f.read(length).decode("utf-8"))
+    if header.get("version") != SNAPSHOT_VERSION:
+        return None
+    arrays = {}
+    for name, typecode, itemsize, count in header["arrays"]:
+        values = array(typecode)
+        if values.itemsize != itemsize:
+            # Written on a platform with other C type sizes
+            return None
+        values.fromfile(f, count)
+        arrays[name] = values
+    nodes = {
+        row[0]: (row[1], row[2], row[3], row[4], date.fromisoformat(row[5]) if row[5] else None)
+        for row in header["nodes"]
+    }
+    return _GraphSnapshot(
+        index={infoleg_id: i for i, infoleg_id in enumerate(arrays["ids"])},
+        tipos=header["tipos"],
+        nodes=nodes,
+        built_at=datetime.fromisoformat(header["built_at"]),
+        **arrays
+    )
+
+
+class NormasGraphIndex:
+    """
+    Relationship graph of normas kept in memory.
+
+    Loaded at startup from an on-disk snapshot (or built from Postgres when no
+    snapshot exists) and rebuilt after the daily batch. The batch runs in a job
+    worker process, so other processes pick up the new snapshot when its file
+    changes. Queries run entirely on the CSR arrays and never touch the database.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None):
+        self.snapshot_path = snapshot_path or settings.NORMAS_GRAPH_SNAPSHOT_PATH or os.path.join(
+            settings.APP_DATA_DIR, "normas_graph.bin"
+        )
+        self._graph: Optional[_GraphSnapshot] = None
+        self._snapshot_mtime: Optional[float] = None
+        self._last_snapshot_check = 0.0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def ensure_loaded(self) -> _GraphSnapshot:
+        """Return the current graph, loading it on first use."""
+        graph = self._graph
+        if graph is not None and not self._snapshot_changed():
+            return graph
+        with self._lock:
+            if self._graph is None or self._snapshot_changed():
+                self._graph = self._load_snapshot() or self._graph or self._build_from_database()
+            return self._graph
+
+    def _snapshot_changed(self) -> bool:
+        """Whether another process wrote a newer snapshot (checked at most every few seconds)."""
+        now = time.monotonic()
+        if now - self._last_snapshot_check < SNAPSHOT_CHECK_INTERVAL_SECONDS:
+            return False
+        self._last_snapshot_check = now
+        try:
+            return os.path.getmtime(self.snapshot_path) != self._snapshot_mtime
+        except OSError:
+            return False
+
+    def refresh(self) -> Dict[str, int]:
+        """Rebuild the graph from Postgres, swap it in and persist a new snapshot."""
+        graph = self._build_from_database()
+        with self._lock:
+            self._graph = graph
+        return {"nodes": len(graph.ids), "edges": graph.edge_count}
+
+    def _snapshot_dir(self) -> Optional[str]:
+        """
+        Directory of the snapshot, created private (0700). None when it is
+        writable by other users: a snapshot there could have been planted.
+        """
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            info = os.stat(directory)
+        except OSError as e:
+            logger.warning(f"Normas graph snapshot directory {directory} unavailable: {str(e)}")
+            return None
+        if info.st_uid != os.getuid() or info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            logger.warning(
+                f"Normas graph snapshot directory {directory} is writable by other users, "
+                f"not using snapshots (set APP_DATA_DIR or NORMAS_GRAPH_SNAPSHOT_PATH to a private directory)"
+            )
+            return None
+        return directory
+
+    def _load_snapshot(self) -> Optional[_GraphSnapshot]:
+        if not os.path.exists(self.snapshot_path) or self._snapshot_dir() is None:
+            return None
+        try:
+            started = time.perf_counter()
+            mtime = os.path.getmtime(self.snapshot_path)
+            with open(self.snapshot_path, "rb") as f:
+                graph = _read_snapshot(f)
+            self._snapshot_mtime = mtime
+            if graph is None:
+                logger.info("Normas graph snapshot has an old version, rebuilding")
+                return None
+            logger.info(
+                f"Loaded normas graph snapshot: {len(graph.ids)} nodes, {graph.edge_count} edges "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+            return graph
+        except Exception as e:
+            logger.warning(f"Could not load normas graph snapshot: {str(e)}")
+            return None
+
+    def _save_snapshot(self, graph: _GraphSnapshot):
+        if self._snapshot_dir() is None:
+            return
+        try:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "wb") as f:
+                _write_snapshot(f, graph)
+            os.replace(tmp_path, self.snapshot_path)
+            self._snapshot_mtime = os.path.getmtime(self.snapshot_path)
+        except Exception as e:
+            logger.warning(f"Could not save normas graph snapshot: {str(e)}")
+
+    def _build_from_database(self) -> _GraphSnapshot:
+        started = time.perf_counter()
+        reconstructor = get_norma_reconstructor()
+        with reconstructor.get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT norma_origen_infoleg_id, norma_destino_infoleg_id, tipo_relacion
+                    FROM normas_relaciones
+                    WHERE norma_origen_infoleg_id IS NOT NULL
+                      AND norma_destino_infoleg_id IS NOT NULL
+                """)
+                relations = [(row[0], row[1], row[2] or "") for row in cur.fetchall()]
+
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT ns.infoleg_id, ns.titulo_resumido, ns.titulo_sumario, ns.tipo_norma,
+                           nr.numero, ns.sancion
+                    FROM normas_structured ns
+                    LEFT JOIN normas_referencias nr ON ns.id = nr.norma_id
+                    WHERE ns.infoleg_id IN (
+                        SELECT norma_origen_infoleg_id FROM normas_relaciones
+                        UNION
+                        SELECT norma_destino_infoleg_id FROM normas_relaciones
+                    )
+                """)
+                nodes = {
+                    row['infoleg_id']: (
+                        row['titulo_resumido'], row['titulo_sumario'], row['tipo_norma'],
+                        row['numero'], row['sancion'],
+                    )
+                    for row in cur.fetchall()
+                }
+
+        graph = _GraphSnapshot.build(relations, nodes)
+        logger.info(
+            f"Built normas graph from database: {len(graph.ids)} nodes, {graph.edge_count} edges "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        self._save_snapshot(graph)
+        return graph
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def contains(self, infoleg_id: int) -> bool:
+        return infoleg_id in self.ensure_loaded().index
+
+    def get_node(self, infoleg_id: int) -> Optional[NodeInfo]:
+        return self.ensure_loaded().nodes.get(infoleg_id)
+
+    def neighbourhood(
+        self,
+        infoleg_id: int,
+        hops: int = 1,
+        direction: str = "both",
+        tipos: Optional[Set[str]] = None,
+        max_nodes: int = 1000,
+    ) -> Tuple[Set[int], List[Edge]]:
+        """
+        Breadth-first k-hop neighbourhood of a norma.
+
+        ``direction`` is "out" (normas it modifies), "in" (normas that modify it)
+        or "both". Returns the reached infoleg_ids (excluding the start) and the
+        traversed edges as (source, target, tipo_relacion).
+        """
+        graph = self.ensure_loaded()
+        start = graph.index.get(infoleg_id)
+        if start is None:
+            return set(), []
+
+        allowed = self._tipo_codes(graph, tipos)
+        visited = {start}
+        edges: List[Edge] = []
+        frontier = deque([(start, 0)])
+        while frontier:
+            node, depth = frontier.popleft()
+            if depth >= hops:
+                continue
+            if direction in ("out", "both"):
+                for target, code in graph.out_edges(node):
+                    if allowed is not None and code not in allowed:
+                        continue
+                    edges.append((graph.ids[node], graph.ids[target], graph.tipos[code]))
+                    if target not in visited and len(visited) < max_nodes:
+                        visited.add(target)
+                        frontier.append((target, depth + 1))
+            if direction in ("in", "both"):
+                for source, code in graph.in_edges(node):
+                    if allowed is not None and code not in allowed:
+                        continue
+                    edges.append((graph.ids[source], graph.ids[node], graph.tipos[code]))
+                    if source not in visited and len(visited) < max_nodes:
+                        visited.add(source)
+                        frontier.append((source, depth + 1))
+
+        reached = {graph.ids[i] for i in visited if i != start}
+        # Drop edges pointing past the node budget and the ones seen from both ends
+        kept = reached | {infoleg_id}
+        edges = [e for e in dict.fromkeys(edges) if e[0] in kept and e[1] in kept]
+        return reached, edges
+
+    def transitive_modifiers(
+        self,
+        infoleg_id: int,
+        max_depth: int = 10,
+        tipos: Optional[Set[str]] = None,
+        max_nodes: int = 1000,
+    ) -> Tuple[Set[int], List[Edge]]:
+        """Every norma that modifies this one directly or through a chain of modifications."""
+        return self.neighbourhood(infoleg_id, hops=max_depth, direction="in", tipos=tipos, max_nodes=max_nodes)
+
+    def sample_by_degree(self, limit: int) -> Tuple[Set[int], List[Edge]]:
+        """
+        Sample up to ``limit`` edges for the global graph, favouring the most
+        connected normas so the visualization shows the densest hubs first.
+        """
+        graph = self.ensure_loaded()
+        taken: Set[int] = set()
+        for node in graph.degree_order:
+            positions = list(range(graph.out_offsets[node], graph.out_offsets[node + 1]))
+            positions.extend(graph.in_edges_pos[graph.in_offsets[node]:graph.in_offsets[node + 1]])
+            for position in positions:
+                taken.add(position)
+                if len(taken) >= limit:
+                    break
+            if len(taken) >= limit:
+                break
+
+        # Recover the source of each edge from its slot in the outgoing arrays
+        edges: List[Edge] = []
+        for position in sorted(taken):
+            source = bisect_right(graph.out_offsets, position) - 1
+            edges.append((graph.ids[source], graph.ids[graph.out_targets[position]], graph.tipos[graph.out_types[position]]))
+
+        node_ids = {e[0] for e in edges} | {e[1] for e in edges}
+        return node_ids, edges
+
+    @staticmethod
+    def _tipo_codes(graph: _GraphSnapshot, tipos: Optional[Set[str]]) -> Optional[Set[int]]:
+        if not tipos:
+            return None
+        return {code for code, tipo in enumerate(graph.tipos) if tipo in tipos}
+
+    def stats(self) -> Dict[str, object]:
+        graph = self.ensure_loaded()
+        return {
+            "nodes": len(graph.ids),
+            "edges": graph.edge_count,
+            "tipos_relacion": list(graph.tipos),
+            "built_at": graph.built_at,
+        }
+
+
+_graph_index_instance = None
+
+
+def get_normas_graph_index() -> NormasGraphIndex:
+    """Get a singleton instance of the NormasGraphIndex."""
+    global _graph_index_instance
+    if _graph_index_instance is None:
+        _graph_index_instance = NormasGraphIndex()
+    return _graph_index_instance
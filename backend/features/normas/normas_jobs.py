@@ -0,0 +1,24 @@
+"""Background job handlers for the normas feature."""
+
+from datetime import date
+from typing import Any, Dict
+
+from features.jobs.jobs_service import JobContext
+from .normas_batch_service import run_daily_batch
+
+
+def run_normas_daily_batch_job(ctx: JobContext) -> Dict[str, Any]:
+    """Run the post-ingestion daily batch, resuming after the last completed refresh stage."""
+    batch_date = date.fromisoformat(ctx.payload["batch_date"])
+    completed_stages = list(ctx.checkpoint.get("completed_stages", []))
+
+    def on_stage_complete(stage: str):
+        completed_stages.append(stage)
+        ctx.save_checkpoint(completed_stages=completed_stages)
+        ctx.report_progress(25 * len(completed_stages), f"{stage} done")
+
+    return run_daily_batch(
+        batch_date,
+        completed_stages=set(completed_stages),
+        on_stage_complete=on_stage_complete
+    )
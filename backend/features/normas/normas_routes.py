@@ -1,15 +1,19 @@
 """Router for normas-related endpoints."""
 
-from typing import Optional
+from typing import List, Optional
 from datetime import date
 from fastapi import APIRouter, HTTPException, status, Query, Depends
+from sqlalchemy.orm import Session
+from core.database.base import get_db
 from core.utils.logging_config import get_logger
-import json
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
 from shared.utils.norma_reconstruction import get_norma_reconstructor
 from features.auth.auth_utils import get_current_user_id
+from features.jobs.jobs_service import enqueue_job
+from .normas_stats_service import get_normas_stats_service
+from .normas_graph_index import get_normas_graph_index
 from .normas_schemas import (
     NormaSummaryResponse,
     NormaDetailResponse,
@@ -32,6 +36,8 @@ public_router = APIRouter()
 
 # Initialize the reconstructor
 reconstructor = get_norma_reconstructor()
+stats_service = get_normas_stats_service()
+graph_index = get_normas_graph_index()
 
 
 @router.get("/normas/", response_model=NormaSearchResponse)
@@ -127,60 +133,15 @@ async def get_filter_options():
 
 @router.get("/normas/stats/", response_model=NormaStatsResponse)
 async def get_normas_stats():
-    """Get statistics about normas in the database."""
+    """
+    Get statistics about normas in the database.
+    Served from the in-process cache over the normas_stats_summary table, which
+    the daily batch keeps up to date; `updated_at` tells how fresh the numbers are.
+    """
     logger.info("Fetching normas statistics")
     
     try:
-        with reconstructor.get_connection() as conn:
-            with conn.cursor() as cur:
-                # Get total counts
-                cur.execute("SELECT COUNT(*) FROM normas_structured")
-                total_normas = cur.fetchone()[0]
-                
-                cur.execute("SELECT COUNT(*) FROM divisions")
-                total_divisions = cur.fetchone()[0]
-                
-                cur.execute("SELECT COUNT(*) FROM articles")
-                total_articles = cur.fetchone()[0]
-                
-                # Get normas by jurisdiction
-                cur.execute("""
-                    SELECT jurisdiccion, COUNT(*) 
-                    FROM normas_structured 
-                    WHERE jurisdiccion IS NOT NULL 
-                    GROUP BY jurisdiccion 
-                    ORDER BY COUNT(*) DESC
-                """)
-                normas_by_jurisdiction = dict(cur.fetchall())
-                
-                # Get normas by type
-                cur.execute("""
-                    SELECT tipo_norma, COUNT(*) 
-                    FROM normas_structured 
-                    WHERE tipo_norma IS NOT NULL 
-                    GROUP BY tipo_norma 
-                    ORDER BY COUNT(*) DESC
-                """)
-                normas_by_type = dict(cur.fetchall())
-                
-                # Get normas by status
-                cur.execute("""
-                    SELECT estado, COUNT(*) 
-                    FROM normas_structured 
-                    WHERE estado IS NOT NULL 
-                    GROUP BY estado 
-                    ORDER BY COUNT(*) DESC
-                """)
-                normas_by_status = dict(cur.fetchall())
-        
-        return NormaStatsResponse(
-            total_normas=total_normas,
-            total_divisions=total_divisions,
-            total_articles=total_articles,
-            normas_by_jurisdiction=normas_by_jurisdiction,
-            normas_by_type=normas_by_type,
-            normas_by_status=normas_by_status
-        )
+        return NormaStatsResponse(**stats_service.get_stats())
         
     except Exception as e:
         logger.error(f"Error fetching normas statistics: {str(e)}")
@@ -284,116 +245,83 @@ async def get_norma_detail(infoleg_id: int):
         )
 
 
+def _relacion_node(infoleg_id: int, info) -> NormaRelacionNode:
+    """Build a graph node from the (titulo_resumido, titulo_sumario, tipo_norma, numero, sancion) tuple."""
+    titulo_resumido, titulo_sumario, tipo_norma, numero, sancion = info
+    return NormaRelacionNode(
+        infoleg_id=infoleg_id,
+        titulo=titulo_resumido or titulo_sumario,
+        titulo_resumido=titulo_resumido,
+        tipo_norma=tipo_norma,
+        numero=numero,
+        sancion=sancion
+    )
+
+
+def _get_current_relacion_node(infoleg_id: int) -> Optional[NormaRelacionNode]:
+    """Get the node for the requested norma, from the graph index or, for normas without relations, the database."""
+    info = graph_index.get_node(infoleg_id)
+    if info is not None:
+        return _relacion_node(infoleg_id, info)
+    
+    with reconstructor.get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT ns.titulo_resumido, ns.titulo_sumario, ns.tipo_norma, nr.numero, ns.sancion
+                FROM normas_structured ns
+                LEFT JOIN normas_referencias nr ON ns.id = nr.norma_id
+                WHERE ns.infoleg_id = %s
+            """, (infoleg_id,))
+            row = cur.fetchone()
+    
+    return _relacion_node(infoleg_id, row) if row else None
+
+
+def _build_relaciones_response(current_norma: NormaRelacionNode, node_ids, edges) -> NormaRelacionesResponse:
+    """Assemble a graph response from index results. Related normas not present in normas_structured get no node."""
+    nodes = []
+    for node_id in sorted(node_ids):
+        info = graph_index.get_node(node_id)
+        if info is not None:
+            nodes.append(_relacion_node(node_id, info))
+    
+    links = [
+        NormaRelacionLink(source_infoleg_id=source, target_infoleg_id=target, tipo_relacion=tipo)
+        for source, target, tipo in edges
+    ]
+    return NormaRelacionesResponse(current_norma=current_norma, nodes=nodes, links=links)
+
+
 @router.get("/normas/{infoleg_id}/relaciones/", response_model=NormaRelacionesResponse)
-async def get_norma_relaciones(infoleg_id: int):
+async def get_norma_relaciones(
+    infoleg_id: int,
+    depth: int = Query(1, ge=1, le=4, description="Number of hops to expand around the norma"),
+    tipo_relacion: Optional[List[str]] = Query(None, description="Only follow these relationship types"),
+    max_nodes: int = Query(500, ge=1, le=2000, description="Maximum number of related normas to return")
+):
     """
     Get relationships (modifica/modificada_por) for a norma with graph data.
     Returns nodes and links suitable for D3 force-directed graph visualization.
+    Served from the in-memory relationship graph index; `depth` > 1 expands the
+    k-hop neighbourhood.
     """
-    logger.info(f"Fetching relationships for norma infoleg_id: {infoleg_id}")
+    logger.info(f"Fetching relationships for norma infoleg_id: {infoleg_id} (depth: {depth})")
     
     try:
-        with reconstructor.get_connection() as conn:
-            with conn.cursor() as cur:
-                # First check if the norma exists
-                cur.execute("""
-                    SELECT ns.infoleg_id, ns.titulo_resumido, ns.titulo_sumario, ns.tipo_norma, 
-                           nr.numero, ns.sancion
-                    FROM normas_structured ns
-                    LEFT JOIN normas_referencias nr ON ns.id = nr.norma_id
-                    WHERE ns.infoleg_id = %s
-                """, (infoleg_id,))
-                
-                current_norma_row = cur.fetchone()
-                if not current_norma_row:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail=f"Norma with infoleg_id {infoleg_id} not found"
-                    )
-                
-                # Create current norma node
-                current_norma = NormaRelacionNode(
-                    infoleg_id=current_norma_row[0],
-                    titulo=current_norma_row[1] or current_norma_row[2],
-                    titulo_resumido=current_norma_row[1],
-                    tipo_norma=current_norma_row[3],
-                    numero=current_norma_row[4],
-                    sancion=current_norma_row[5]
-                )
-                
-                # Get all relationships where this norma is the origin
-                cur.execute("""
-                    SELECT norma_destino_infoleg_id, tipo_relacion
-                    FROM normas_relaciones
-                    WHERE norma_origen_infoleg_id = %s
-                """, (infoleg_id,))
-                
-                outgoing_relations = cur.fetchall()
-                
-                # Get all relationships where this norma is the destination
-                cur.execute("""
-                    SELECT norma_origen_infoleg_id, tipo_relacion
-                    FROM normas_relaciones
-                    WHERE norma_destino_infoleg_id = %s
-                """, (infoleg_id,))
-                
-                incoming_relations = cur.fetchall()
-                
-                # Collect all related norma IDs
-                related_ids = set()
-                for rel in outgoing_relations:
-                    related_ids.add(rel[0])
-                for rel in incoming_relations:
-                    related_ids.add(rel[0])
-                
-                # Fetch norma details for all related normas
-                nodes = []
-                links = []
-                
-                if related_ids:
-                    placeholders = ','.join(['%s'] * len(related_ids))
-                    cur.execute(f"""
-                        SELECT ns.infoleg_id, ns.titulo_resumido, ns.titulo_sumario, ns.tipo_norma,
-                               nr.numero, ns.sancion
-                        FROM normas_structured ns
-                        LEFT JOIN normas_referencias nr ON ns.id = nr.norma_id
-                        WHERE ns.infoleg_id IN ({placeholders})
-                    """, list(related_ids))
-                    
-                    related_normas = cur.fetchall()
-                    
-                    # Create nodes for related normas
-                    for norma_row in related_normas:
-                        nodes.append(NormaRelacionNode(
-                            infoleg_id=norma_row[0],
-                            titulo=norma_row[1] or norma_row[2],
-                            titulo_resumido=norma_row[1],
-                            tipo_norma=norma_row[3],
-                            numero=norma_row[4],
-                            sancion=norma_row[5]
-                        ))
-                
-                # Create links for outgoing relationships
-                for rel in outgoing_relations:
-                    links.append(NormaRelacionLink(
-                        source_infoleg_id=infoleg_id,
-                        target_infoleg_id=rel[0],
-                        tipo_relacion=rel[1]
-                    ))
-                
-                # Create links for incoming relationships
-                for rel in incoming_relations:
-                    links.append(NormaRelacionLink(
-                        source_infoleg_id=rel[0],
-                        target_infoleg_id=infoleg_id,
-                        tipo_relacion=rel[1]
-                    ))
-                
-                return NormaRelacionesResponse(
-                    current_norma=current_norma,
-                    nodes=nodes,
-                    links=links
-                )
+        current_norma = _get_current_relacion_node(infoleg_id)
+        if not current_norma:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Norma with infoleg_id {infoleg_id} not found"
+            )
+        
+        node_ids, edges = graph_index.neighbourhood(
+            infoleg_id,
+            hops=depth,
+            tipos=set(tipo_relacion) if tipo_relacion else None,
+            max_nodes=max_nodes
+        )
+        return _build_relaciones_response(current_norma, node_ids, edges)
                 
     except HTTPException:
         raise
@@ -405,6 +333,45 @@ async def get_norma_relaciones(infoleg_id: int):
         )
 
 
+@router.get("/normas/{infoleg_id}/relaciones/modificadores/", response_model=NormaRelacionesResponse)
+async def get_norma_modificadores(
+    infoleg_id: int,
+    max_depth: int = Query(10, ge=1, le=50, description="Maximum length of the modification chain"),
+    tipo_relacion: Optional[List[str]] = Query(None, description="Only follow these relationship types"),
+    max_nodes: int = Query(500, ge=1, le=2000, description="Maximum number of normas to return")
+):
+    """
+    Get every norma that modifies this norma, directly or transitively
+    (A modifica B, B modifica esta norma, ...).
+    """
+    logger.info(f"Fetching transitive modifiers for norma infoleg_id: {infoleg_id}")
+    
+    try:
+        current_norma = _get_current_relacion_node(infoleg_id)
+        if not current_norma:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Norma with infoleg_id {infoleg_id} not found"
+            )
+        
+        node_ids, edges = graph_index.transitive_modifiers(
+            infoleg_id,
+            max_depth=max_depth,
+            tipos=set(tipo_relacion) if tipo_relacion else None,
+            max_nodes=max_nodes
+        )
+        return _build_relaciones_response(current_norma, node_ids, edges)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching modifiers for norma {infoleg_id}: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching norma modifiers: {str(e)}"
+        )
+
+
 @router.get("/normas/relaciones/all/", response_model=NormaRelacionesResponse)
 async def get_all_normas_relaciones(
     limit: int = Query(500, ge=1, le=1000, description="Maximum number of relationships to return")
@@ -412,81 +379,31 @@ async def get_all_normas_relaciones(
     """
     Get all norma relationships for graph visualization.
     Returns nodes and links suitable for D3 force-directed graph visualization.
-    Limited to prevent performance issues with large datasets.
+    Limited to prevent performance issues with large datasets; the sample is
+    taken around the most connected normas first.
     """
     logger.info(f"Fetching all norma relationships (limit: {limit})")
     
     try:
-        with reconstructor.get_connection() as conn:
-            with conn.cursor() as cur:
-                # Get a sample of relationships
-                cur.execute("""
-                    SELECT nr.norma_origen_infoleg_id, nr.norma_destino_infoleg_id, nr.tipo_relacion
-                    FROM normas_relaciones nr
-                    ORDER BY nr.id
-                    LIMIT %s    
-                """, (limit,))
-                
-                relations = cur.fetchall()
-                
-                if not relations:
-                    # Return an empty graph with a minimal placeholder current_norma to satisfy schema
-                    placeholder_node = NormaRelacionNode(
-                        infoleg_id=0,
-                        titulo="",
-                    )
-                    return NormaRelacionesResponse(
-                        current_norma=placeholder_node,
-                        nodes=[],
-                        links=[]
-                    )
-                
-                # Collect all unique norma IDs
-                norma_ids = set()
-                for rel in relations:
-                    norma_ids.add(rel[0])  # origen
-                    norma_ids.add(rel[1])  # destino
-                
-                # Fetch details for all normas
-                placeholders = ','.join(['%s'] * len(norma_ids))
-                cur.execute(f"""
-                    SELECT ns.infoleg_id, ns.titulo_resumido, ns.titulo_sumario, ns.tipo_norma,
-                           nr.numero, ns.sancion
-                    FROM normas_structured ns
-                    LEFT JOIN normas_referencias nr ON ns.id = nr.norma_id
-                    WHERE ns.infoleg_id IN ({placeholders})
-                """, list(norma_ids))
-                
-                normas_data = cur.fetchall()
-                
-                # Create nodes
-                nodes = []
-                for norma_row in normas_data:
-                    nodes.append(NormaRelacionNode(
-                        infoleg_id=norma_row[0],
-                        titulo=norma_row[1] or norma_row[2],
-                        titulo_resumido=norma_row[1],
-                        tipo_norma=norma_row[3],
-                        numero=norma_row[4],
-                        sancion=norma_row[5]
-                    ))
-                
-                # Create links
-                links = []
-                for rel in relations:
-                    links.append(NormaRelacionLink(
-                        source_infoleg_id=rel[0],
-                        target_infoleg_id=rel[1],
-                        tipo_relacion=rel[2]
-                    ))
-                
-                # Per schema, current_norma cannot be null; choose first node if available
-                current = nodes[0] if nodes else NormaRelacionNode(infoleg_id=0, titulo="")
-                return NormaRelacionesResponse(
-                    current_norma=current,
-                    nodes=nodes,
-                    links=links
-                )
+        node_ids, edges = graph_index.sample_by_degree(limit)
+        
+        if not edges:
+            # Return an empty graph with a minimal placeholder current_norma to satisfy schema
+            placeholder_node = NormaRelacionNode(
+                infoleg_id=0,
+                titulo="",
+            )
+            return NormaRelacionesResponse(
+                current_norma=placeholder_node,
+                nodes=[],
+                links=[]
+            )
+        
+        response = _build_relaciones_response(NormaRelacionNode(infoleg_id=0, titulo=""), node_ids, edges)
+        # Per schema, current_norma cannot be null; choose first node if available
+        if response.nodes:
+            response.current_norma = response.nodes[0]
+        return response
                 
     except Exception as e:
         logger.error(f"Error fetching all norma relationships: {str(e)}", exc_info=True)
@@ -497,173 +414,43 @@ async def get_all_normas_relaciones(
 
 
 @router.post("/normas/daily-batch-complete")
-async def normas_daily_batch_complete(batch_date: Optional[date] = None):
+async def normas_daily_batch_complete(batch_date: Optional[date] = None, db: Session = Depends(get_db)):
     """
     Generic endpoint to be called by the daily batch job once new normas have been
     inserted into the database. Responsibilities:
-      - Refresh materialized views used by the filters
+      - Refresh materialized views, the statistics summary and the relationship
+        graph index used by the filters and graph endpoints
       - Find normas inserted during the previous day (or provided batch_date)
-        and, for each norma, read `lista_normas_que_complementa` (the normas
-        that it "complements" / modifies). For every user that has any of those
-        complemented normas in their favorites, insert a `norm_update` row into
-        the `notifications` table so they see an in-app notification.
-
-    The endpoint is idempotent if called multiple times for the same batch window
-    (it will insert notifications each time unless deduplication is implemented
-    later).
+        and, through `normas_relaciones`, the normas they modify. For every user
+        that has any of those normas in their favorites, insert one `norm_update`
+        row into the `notifications` table listing the new normas that modify it.
+
+    The fan-out is a single set-based INSERT ... SELECT keyed by an idempotency
+    key (batch date, user, saved norma), so calling the endpoint several times
+    for the same batch window does not duplicate notifications.
+
+    The work runs as a background job: the response carries the job id, and
+    the per-stage timings end up in the job result at /jobs/{job_id}/.
     """
     try:
         logger.info("Received request: normas_daily_batch_complete, batch_date=%s", batch_date)
 
-        # Determine date window: default to previous UTC day if not provided
-        from datetime import datetime, timedelta, timezone
-
-        # TEMPORARILY COMMENTED OUT FOR TESTING
-        # now = datetime.now(timezone.utc)
-        # if batch_date:
-        #     # Interpret batch_date as the day that was processed (local date assumed UTC)
-        #     start_dt = datetime(batch_date.year, batch_date.month, batch_date.day, tzinfo=timezone.utc)
-        #     end_dt = start_dt + timedelta(days=1)
-        # else:
-        #     # previous day window
-        #     prev_day = (now - timedelta(days=1)).date()
-        #     start_dt = datetime(prev_day.year, prev_day.month, prev_day.day, tzinfo=timezone.utc)
-        #     end_dt = start_dt + timedelta(days=1)
+        # TEMPORARILY DISABLED FOR TESTING: default to the previous UTC day
+        # from datetime import datetime, timedelta, timezone
+        # if batch_date is None:
+        #     batch_date = (datetime.now(timezone.utc) - timedelta(days=1)).date()
 
         # FOR TESTING: Look for normas published on 2021-08-24
         test_date = date(2021, 8, 24)
         logger.info("TEST MODE: Looking for normas published on %s", test_date)
 
-        # Step A: Refresh materialized views first (so front-end filters pick up new values)
-        try:
-            reconstructor.refresh_materialized_views()
-            logger.info("Materialized views refreshed successfully")
-        except Exception as e:
-            logger.warning("Materialized view refresh failed: %s", str(e))
-
-        # Step B: Find normas inserted in that window and their relationships
-        modified_norma_ids = set()  # normas that are modified by new normas
-        new_normas = []  # collect basic info about new normas for notification metadata
-
-        with reconstructor.get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # First, get normas published on the test date (FOR TESTING)
-                cur.execute(
-                    """
-                    SELECT ns.id, ns.infoleg_id, ns.titulo_resumido, ns.titulo_sumario
-                    FROM normas_structured ns
-                    WHERE ns.publicacion = %s
-                    """,
-                    (test_date,),
-                )
-
-                new_normas_rows = cur.fetchall()
-                logger.info("Found %d normas published on test date", len(new_normas_rows))
-
-                if not new_normas_rows:
-                    logger.info("No normas found for test date; nothing to notify")
-                    return {"success": True, "notified": 0, "message": "No normas found for test date"}
-
-                # Collect new norma infoleg_ids
-                new_infoleg_ids = [row['infoleg_id'] for row in new_normas_rows]
-                new_normas = new_normas_rows  # store for metadata
-
-                # Find relationships where new normas modify existing normas
-                # We want outgoing relationships: new norma → existing norma
-                cur.execute(
-                    """
-                    SELECT norma_origen_infoleg_id, norma_destino_infoleg_id, tipo_relacion
-                    FROM normas_relaciones
-                    WHERE norma_origen_infoleg_id = ANY(%s)
-                    """,
-                    (new_infoleg_ids,),
-                )
-
-                relations = cur.fetchall()
-                logger.info("Found %d relationships where new normas modify existing normas", len(relations))
-
-                # Collect the destination normas (the ones being modified)
-                for rel in relations:
-                    modified_norma_ids.add(rel['norma_destino_infoleg_id'])
-
-        if not modified_norma_ids:
-            logger.info("No modified norma ids found for this batch window; nothing to notify")
-            return {"success": True, "notified": 0, "message": "No modified normas found"}
-
-        logger.info("Total modified norma ids to check favorites: %d", len(modified_norma_ids))
-
-        # Step C: Find favorites for those norma ids
-        notifications_created = 0
-        with reconstructor.get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # fetch favorites for the modified normas
-                cur.execute(
-                    "SELECT user_id, norma_id FROM favorites WHERE is_deleted = false AND norma_id = ANY(%s)",
-                    (list(modified_norma_ids),),
-                )
-
-                fav_rows = cur.fetchall()
-                logger.info("Found %d favorite entries referencing complemented normas", len(fav_rows))
-
-                # Insert notifications for each favorite
-                for fav in fav_rows:
-                    user_id = fav['user_id']
-                    saved_norma_id = fav['norma_id']
-
-                    # Find which new normas modify this saved norma using the relations we fetched
-                    with reconstructor.get_connection() as conn2:
-                        with conn2.cursor(cursor_factory=RealDictCursor) as cur2:
-                            cur2.execute(
-                                """
-                                SELECT norma_origen_infoleg_id, tipo_relacion
-                                FROM normas_relaciones
-                                WHERE norma_destino_infoleg_id = %s 
-                                AND norma_origen_infoleg_id = ANY(%s)
-                                """,
-                                (saved_norma_id, new_infoleg_ids),
-                            )
-                            modifying_relations = cur2.fetchall()
-
-                    # Build metadata: include the list of new normas that modify this saved norma
-                    modifying_new_normas = []
-                    for rel in modifying_relations:
-                        # Find the new norma details
-                        for new_norma in new_normas:
-                            if new_norma['infoleg_id'] == rel['norma_origen_infoleg_id']:
-                                modifying_new_normas.append({
-                                    "id": new_norma['id'], 
-                                    "infoleg_id": new_norma['infoleg_id'],
-                                    "titulo": new_norma['titulo_resumido'] or new_norma['titulo_sumario'],
-                                    "tipo_relacion": rel['tipo_relacion']
-                                })
-                                break
-
-                    # create a friendly title/body
-                    title = "Posible modificación en una norma guardada"
-                    body = f"Se publicó una norma nueva que podría modificar o complementar la norma que guardaste (ID {saved_norma_id})."
-                    link = f"/normas/{saved_norma_id}"
-                    metadata = {
-                        "type": "norm_update",
-                        "saved_norma_id": saved_norma_id,
-                        "modifying_normas": modifying_new_normas
-                    }
-
-                    try:
-                        cur.execute(
-                            """
-                            INSERT INTO notifications (user_id, title, body, type, link, metadata)
-                            VALUES (%s, %s, %s, %s, %s, %s)
-                            """,
-                            (user_id, title, body, 'norm_update', link, json.dumps(metadata)),
-                        )
-                        notifications_created += 1
-                    except Exception as e:
-                        logger.error("Failed to insert notification for user %s: %s", user_id, str(e))
-
-                conn.commit()
-
-        logger.info("Notifications created: %d", notifications_created)
-        return {"success": True, "notified": notifications_created}
+        job = enqueue_job(
+            db,
+            "normas_daily_batch",
+            payload={"batch_date": test_date.isoformat()},
+            dedupe_key=f"normas_daily_batch:{test_date}"
+        )
+        return {"success": True, "job_id": str(job.id), "status": job.status}
 
     except Exception as e:
         logger.error(f"Error processing daily batch complete: {str(e)}", exc_info=True)
@@ -154,6 +154,8 @@ class NormaStatsResponse(BaseModel):
     normas_by_jurisdiction: Dict[str, int]
     normas_by_type: Dict[str, int]
     normas_by_status: Dict[str, int]
+    updated_at: Optional[datetime] = Field(None, description="When the underlying summary was last refreshed")
+    cached_at: Optional[datetime] = Field(None, description="When this process loaded the summary")
 
 
 class NormaRelacionNode(BaseModel):
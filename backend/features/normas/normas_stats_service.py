@@ -0,0 +1,81 @@
+"""In-process cache for the precomputed normas statistics."""
+
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from shared.utils.norma_reconstruction import get_norma_reconstructor
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+class NormaStatsService:
+    """
+    Serves normas statistics from memory.
+
+    The numbers come from the normas_stats_summary table, which is maintained
+    by the daily batch (see NormaReconstructor.refresh_normas_stats). The
+    snapshot is kept in process and only re-read once it is older than the TTL
+    or after an explicit invalidation, so stats calls never touch the big tables.
+
+    The batch runs in a job worker process, so its invalidation only reaches
+    that process: API processes serve the previous numbers for up to
+    ``ttl_seconds`` (5 minutes by default) after a refresh.
+    """
+
+    def __init__(self, ttl_seconds: int = 300):
+        self.ttl_seconds = ttl_seconds
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._loaded_at: float = 0.0
+        self._lock = threading.Lock()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return the cached statistics, reloading them if the snapshot is stale."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+            return snapshot
+
+        with self._lock:
+            # Another request may have reloaded while we waited for the lock
+            if self._snapshot is not None and time.monotonic() - self._loaded_at < self.ttl_seconds:
+                return self._snapshot
+            self._snapshot = self._load()
+            self._loaded_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        """Drop this process' cached snapshot so its next call reads the summary table."""
+        with self._lock:
+            self._snapshot = None
+            self._loaded_at = 0.0
+
+    def refresh(self, full: bool = False) -> Dict[str, Any]:
+        """Update the summary table (delta or full rebuild) and drop this process' cached snapshot."""
+        result = get_norma_reconstructor().refresh_normas_stats(full=full)
+        self.invalidate()
+        return result
+
+    def _load(self) -> Dict[str, Any]:
+        reconstructor = get_norma_reconstructor()
+        summary = reconstructor.get_normas_stats_summary()
+        if summary is None:
+            # First run on this database: build the summary table once
+            logger.info("Normas statistics summary is empty, building it")
+            reconstructor.refresh_normas_stats(full=True)
+            summary = reconstructor.get_normas_stats_summary() or {}
+
+        summary['cached_at'] = datetime.now(timezone.utc)
+        return summary
+
+
+_stats_service_instance = None
+
+
+def get_normas_stats_service() -> NormaStatsService:
+    """Get a singleton instance of the NormaStatsService."""
+    global _stats_service_instance
+    if _stats_service_instance is None:
+        _stats_service_instance = NormaStatsService()
+    return _stats_service_instance
@@ -23,6 +23,8 @@ class Notification(Base):
     metadata_ = Column("metadata", JSONB, default={}, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     read_at = Column(DateTime(timezone=True), nullable=True)
+    # Deduplicates notifications generated by batch jobs (e.g. norm_update:<date>:<user>:<norma>)
+    idempotency_key = Column(String(255), nullable=True, unique=True)
     
     __table_args__ = (
         CheckConstraint(
@@ -0,0 +1,118 @@
+"""In-process caches for subscription tiers and per-user effective limits."""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from sqlalchemy.orm import Session
+
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+from features.subscription.subscription_models import SubscriptionTier
+
+logger = get_logger(__name__)
+
+_TIER_FIELDS = (
+    'name', 'display_name', 'max_tokens_per_day', 'max_tokens_per_month',
+    'max_messages_per_day', 'max_messages_per_hour', 'max_concurrent_chats', 'features'
+)
+
+
+class LimitsCache:
+    """
+    Effective limits per user, plus every tier definition.
+
+    - Tiers are loaded all at once and kept for ``tiers_ttl`` seconds (or
+      until an unknown tier id is requested).
+    - A user's limits are kept for ``ttl`` seconds, never past the expiry of
+      the subscription they came from. ``invalidate`` drops them right away
+      (upgrade, account deletion); other API workers see the change once
+      their entry expires.
+    - At most ``max_users`` users are kept, least recently used first out.
+    """
+
+    def __init__(self, ttl: float, tiers_ttl: float, max_users: int = 50000):
+        self.ttl = ttl
+        self.tiers_ttl = tiers_ttl
+        self.max_users = max_users
+        self._users: "OrderedDict[str, tuple]" = OrderedDict()
+        self._tiers: Dict[Any, Dict[str, Any]] = {}
+        self._tiers_loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Tiers
+    # ------------------------------------------------------------------
+
+    def _load_tiers(self, db: Session):
+        tiers = {
+            tier.id: {field: getattr(tier, field) for field in _TIER_FIELDS} | {'id': tier.id}
+            for tier in db.query(SubscriptionTier).all()
+        }
+        with self._lock:
+            self._tiers = tiers
+            self._tiers_loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(tiers)} subscription tiers")
+
+    def get_tier(self, db: Session, tier_id: Any) -> Optional[Dict[str, Any]]:
+        """Tier definition by id, from the process-wide tier cache."""
+        expired = time.monotonic() - self._tiers_loaded_at > self.tiers_ttl
+        if expired or tier_id not in self._tiers:
+            self._load_tiers(db)
+        return self._tiers.get(tier_id)
+
+    def invalidate_tiers(self):
+        with self._lock:
+            self._tiers_loaded_at = 0.0
+
+    # ------------------------------------------------------------------
+    # Per-user limits
+    # ------------------------------------------------------------------
+
+    def get(self, user_id: Any) -> Optional[Dict[str, Any]]:
+        """Cached limits for ``user_id``, or None on a miss."""
+        key = str(user_id)
+        with self._lock:
+            entry = self._users.get(key)
+            if entry is None:
+                return None
+            expires_at, limits = entry
+            if expires_at <= time.monotonic():
+                del self._users[key]
+                return None
+            self._users.move_to_end(key)
+            return dict(limits)
+
+    def put(self, user_id: Any, limits: Dict[str, Any], subscription_expires_at: Optional[datetime] = None):
+        ttl = self.ttl
+        if subscription_expires_at is not None:
+            ttl = min(ttl, (subscription_expires_at - datetime.now(timezone.utc)).total_seconds())
+        if ttl <= 0:
+            return
+        key = str(user_id)
+        with self._lock:
+            self._users[key] = (time.monotonic() + ttl, dict(limits))
+            self._users.move_to_end(key)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id: Any):
+        """Forget a user's limits (their subscription changed or the account is gone)."""
+        with self._lock:
+            self._users.pop(str(user_id), None)
+
+
+_cache_instance = None
+
+
+def get_limits_cache() -> LimitsCache:
+    """Get a singleton instance of the LimitsCache."""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = LimitsCache(
+            ttl=settings.SUBSCRIPTION_LIMITS_TTL_SECONDS,
+            tiers_ttl=settings.SUBSCRIPTION_TIERS_TTL_SECONDS
+        )
+    return _cache_instance
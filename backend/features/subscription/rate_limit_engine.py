@@ -0,0 +1,223 @@
+"""Pluggable rate-limit engines: sliding-window counters and GCRA (token bucket with burst)."""
+
+import json
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+ENGINE_FIXED = "fixed"
+ENGINE_SLIDING_WINDOW = "sliding_window"
+ENGINE_GCRA = "gcra"
+
+
+class RateLimitDecision:
+    """Outcome of evaluating one limit for one request."""
+
+    __slots__ = ("allowed", "current_usage", "limit", "retry_after", "reset_after")
+
+    def __init__(self, allowed: bool, current_usage: int, limit: int, retry_after: float, reset_after: float):
+        self.allowed = allowed
+        self.current_usage = current_usage
+        self.limit = limit
+        # Seconds until the request would be allowed (0 when allowed)
+        self.retry_after = retry_after
+        # Seconds until the usage is fully drained
+        self.reset_after = reset_after
+
+
+# Seconds a state is kept, or a function of the new state returning them
+StateTTL = Union[float, Callable[[Any], float]]
+
+
+class InMemoryStateStore:
+    """Per-key engine state in this process, dropped once its TTL has passed."""
+
+    def __init__(self, sweep_every: int = 10000):
+        self._states: Dict[str, Tuple[Any, float]] = {}
+        self._lock = threading.Lock()
+        self._sweep_every = sweep_every
+        self._writes = 0
+
+    def update(self, key: str, fn: Callable[[Any], Tuple[Any, Any]], ttl: StateTTL) -> Any:
+        """Atomically apply ``fn(state) -> (result, new_state)``; a None new_state is not written."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._states.get(key)
+            state = entry[0] if entry and entry[1] > now else None
+            result, new_state = fn(state)
+            if new_state is not None:
+                self._states[key] = (new_state, now + (ttl(new_state) if callable(ttl) else ttl))
+                self._writes += 1
+                if self._writes % self._sweep_every == 0:
+                    self._states = {k: v for k, v in self._states.items() if v[1] > now}
+            return result
+
+
+class RedisStateStore:
+    """Engine state shared by every API worker, updated with optimistic Redis transactions."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def update(self, key: str, fn: Callable[[Any], Tuple[Any, Any]], ttl: StateTTL) -> Any:
+        def _transaction(pipe):
+            raw = pipe.get(key)
+            result, new_state = fn(json.loads(raw) if raw is not None else None)
+            pipe.multi()
+            if new_state is not None:
+                seconds = ttl(new_state) if callable(ttl) else ttl
+                pipe.set(key, json.dumps(new_state), ex=max(1, math.ceil(seconds)))
+            return result
+
+        return self.client.transaction(_transaction, key, value_from_callable=True)
+
+
+class SlidingWindowEngine:
+    """
+    Sliding-window counter: the usage of the last ``window`` seconds is the
+    current fixed window's count plus the previous window's count weighted by
+    how much of it still overlaps. State per key is ``[window index, current,
+    previous]``, so each check is O(1) and a burst straddling a window boundary
+    can no longer reach twice the limit.
+    """
+
+    name = ENGINE_SLIDING_WINDOW
+
+    def __init__(self, store):
+        self.store = store
+
+    def _evaluate(self, state, limit: int, window: float, cost: int, now: float, consume: bool):
+        index = int(now // window)
+        current = previous = 0
+        if state:
+            if state[0] == index:
+                current, previous = state[1], state[2]
+            elif state[0] == index - 1:
+                previous = state[1]
+
+        elapsed = (now % window) / window
+        used = previous * (1 - elapsed) + current
+        allowed = used + cost <= limit
+
+        retry_after = 0.0
+        if not allowed:
+            if current + cost <= limit and previous:
+                # Wait until enough of the previous window has slid out
+                needed = 1 - (limit - current - cost) / previous
+                retry_after = max(0.0, (needed - elapsed) * window)
+            else:
+                retry_after = (1 - elapsed) * window
+
+        decision = RateLimitDecision(
+            allowed=allowed,
+            current_usage=int(math.ceil(used)),
+            limit=limit,
+            retry_after=retry_after,
+            reset_after=(2 - elapsed) * window if current else (1 - elapsed) * window
+        )
+        new_state = [index, current + cost, previous] if consume else None
+        return decision, new_state
+
+    def peek(self, key: str, limit: int, window: float, cost: int = 1, now: Optional[float] = None) -> RateLimitDecision:
+        now = time.time() if now is None else now
+        return self.store.update(key, lambda state: self._evaluate(state, limit, window, cost, now, False), window * 2)
+
+    def consume(self, key: str, limit: int, window: float, cost: int = 1, now: Optional[float] = None) -> RateLimitDecision:
+        now = time.time() if now is None else now
+        return self.store.update(key, lambda state: self._evaluate(state, limit, window, cost, now, True), window * 2)
+
+
+class GCRAEngine:
+    """
+    Generic cell rate algorithm (a token bucket stored as one timestamp).
+
+    ``limit`` units per ``window`` drip out at one every ``window / limit``
+    seconds, with up to ``burst_ratio * limit`` units allowed at once. State
+    per key is the theoretical arrival time of the next unit.
+
+    With the default ratio of 1 a user can spend the whole limit at once and
+    then gets one unit back every ``window / limit`` seconds; a ratio of 0.5
+    lets a 20 messages/hour tier send only 10 messages in a row.
+    """
+
+    name = ENGINE_GCRA
+
+    def __init__(self, store, burst_ratio: float = 1.0):
+        self.store = store
+        self.burst_ratio = burst_ratio
+
+    def _evaluate(self, state, limit: int, window: float, cost: int, now: float, consume: bool):
+        interval = window / limit
+        burst = max(1.0, limit * self.burst_ratio)
+        tat = max(state[0] if state else now, now)
+        new_tat = tat + cost * interval
+        allowed = new_tat - now <= burst * interval
+
+        decision = RateLimitDecision(
+            allowed=allowed,
+            current_usage=int(math.ceil((tat - now) / interval)),
+            limit=limit,
+            retry_after=0.0 if allowed else new_tat - now - burst * interval,
+            reset_after=tat - now
+        )
+        new_state = [new_tat] if consume else None
+        return decision, new_state
+
+    def peek(self, key: str, limit: int, window: float, cost: int = 1, now: Optional[float] = None) -> RateLimitDecision:
+        now = time.time() if now is None else now
+        return self.store.update(key, lambda state: self._evaluate(state, limit, window, cost, now, False), window)
+
+    def consume(self, key: str, limit: int, window: float, cost: int = 1, now: Optional[float] = None) -> RateLimitDecision:
+        now = time.time() if now is None else now
+        # Usage recorded past the limit pushes the arrival time beyond the window: keep it until then
+        return self.store.update(
+            key,
+            lambda state: self._evaluate(state, limit, window, cost, now, True),
+            lambda new_state: max(window, new_state[0] - now)
+        )
+
+
+def create_rate_limit_engine(name: str, store=None, burst_ratio: float = 1.0):
+    """Engine by name; None for the calendar buckets (``fixed``) handled by RateLimitService."""
+    if name == ENGINE_FIXED:
+        return None
+    store = store or InMemoryStateStore()
+    if name == ENGINE_SLIDING_WINDOW:
+        return SlidingWindowEngine(store)
+    if name == ENGINE_GCRA:
+        return GCRAEngine(store, burst_ratio=burst_ratio)
+    raise ValueError(f"Unknown rate limit engine: {name}")
+
+
+def _create_state_store():
+    if settings.REDIS_URL:
+        try:
+            return RedisStateStore(settings.REDIS_URL)
+        except Exception as e:
+            logger.warning(f"Could not use Redis for rate limit state, falling back to in-memory: {str(e)}")
+    return InMemoryStateStore()
+
+
+_engine_instance = None
+_engine_created = False
+
+
+def get_rate_limit_engine():
+    """Get the configured rate limit engine singleton (None when RATE_LIMIT_ENGINE is 'fixed')."""
+    global _engine_instance, _engine_created
+    if not _engine_created:
+        _engine_instance = create_rate_limit_engine(
+            settings.RATE_LIMIT_ENGINE,
+            store=None if settings.RATE_LIMIT_ENGINE == ENGINE_FIXED else _create_state_store(),
+            burst_ratio=settings.RATE_LIMIT_BURST_RATIO
+        )
+        _engine_created = True
+    return _engine_instance
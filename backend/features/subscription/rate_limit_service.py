@@ -1,20 +1,25 @@
 """Rate limiting service for subscription tiers."""
 
 import logging
-from datetime import datetime, timezone
-from typing import Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 
 from features.subscription.subscription_models import (
-    SubscriptionTier, 
     UserSubscription, 
     UserUsage
 )
 from features.subscription.subscription_schemas import RateLimitCheckSchema
+from features.subscription.usage_accumulator import get_usage_accumulator, PERIOD_TYPES, UsageTotals
+from features.subscription.limits_cache import get_limits_cache
+from features.subscription.rate_limit_engine import get_rate_limit_engine
 
 logger = logging.getLogger(__name__)
 
+# Window lengths for the sliding-window / GCRA engines
+_ENGINE_WINDOW_SECONDS = {"hour": 3600, "day": 86400}
+
 
 class RateLimitService:
     """Service for checking and enforcing rate limits."""
@@ -26,15 +31,22 @@ class RateLimitService:
         """
         Get user's current subscription tier and limits.
         
+        Served from the limits cache when possible (see LimitsCache).
+        
         Args:
             user_id: User ID
             
         Returns:
             Dictionary with tier info and effective limits, or None if no active subscription
         """
+        cache = get_limits_cache()
+        cached = cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         try:
-            # Get active subscription with tier info
-            subscription = self.db.query(UserSubscription).join(SubscriptionTier).filter(
+            # Get active subscription; the tier comes from the process-wide tier cache
+            subscription = self.db.query(UserSubscription).filter(
                 and_(
                     UserSubscription.user_id == user_id,
                     UserSubscription.is_active == True,
@@ -48,19 +60,21 @@ class RateLimitService:
             if not subscription:
                 return None
             
-            tier = subscription.tier
+            tier = cache.get_tier(self.db, subscription.tier_id)
+            if not tier:
+                return None
             
             # Calculate effective limits (custom limits override tier limits)
             effective_limits = {
-                'tier_id': tier.id,
-                'tier_name': tier.name,
-                'display_name': tier.display_name,
-                'max_tokens_per_day': tier.max_tokens_per_day,
-                'max_tokens_per_month': tier.max_tokens_per_month,
-                'max_messages_per_day': tier.max_messages_per_day,
-                'max_messages_per_hour': tier.max_messages_per_hour,
-                'max_concurrent_chats': tier.max_concurrent_chats,
-                'features': tier.features or {},
+                'tier_id': tier['id'],
+                'tier_name': tier['name'],
+                'display_name': tier['display_name'],
+                'max_tokens_per_day': tier['max_tokens_per_day'],
+                'max_tokens_per_month': tier['max_tokens_per_month'],
+                'max_messages_per_day': tier['max_messages_per_day'],
+                'max_messages_per_hour': tier['max_messages_per_hour'],
+                'max_concurrent_chats': tier['max_concurrent_chats'],
+                'features': tier['features'] or {},
                 'custom_limits': subscription.custom_limits or {}
             }
             
@@ -70,6 +84,7 @@ class RateLimitService:
                     if key in effective_limits:
                         effective_limits[key] = value
             
+            cache.put(user_id, effective_limits, subscription.expires_at)
             return effective_limits
             
         except Exception as e:
@@ -104,6 +119,42 @@ class RateLimitService:
             logger.error(f"Error getting current usage for user {user_id}, period {period_type}: {e}")
             return None
     
+    def _current_periods(self) -> Dict[str, Any]:
+        return {
+            period_type: (self._get_period_start(period_type), self._get_period_end(period_type))
+            for period_type in PERIOD_TYPES
+        }
+    
+    def _load_usage_totals(self, user_id: str, periods: Dict[str, Any]) -> UsageTotals:
+        """Usage stored in the database for the given periods, in a single query."""
+        rows = self.db.query(UserUsage).filter(
+            and_(
+                UserUsage.user_id == user_id,
+                or_(*(
+                    and_(UserUsage.period_type == period_type, UserUsage.period_start == period_start)
+                    for period_type, (period_start, _) in periods.items()
+                ))
+            )
+        ).all()
+        
+        totals: UsageTotals = {}
+        for row in rows:
+            tokens, messages = totals.get(row.period_type, (0, 0))
+            totals[row.period_type] = (tokens + (row.tokens_used or 0), messages + (row.messages_sent or 0))
+        return totals
+    
+    async def get_usage_totals(self, user_id: str) -> UsageTotals:
+        """
+        Current (tokens_used, messages_sent) for the hour, day and month,
+        including usage not yet flushed to the database.
+        """
+        periods = self._current_periods()
+        return get_usage_accumulator().totals(
+            user_id,
+            periods,
+            lambda: self._load_usage_totals(user_id, periods)
+        )
+    
     async def check_rate_limit(self, user_id: str, tokens_needed: int) -> RateLimitCheckSchema:
         """
         Check if user can make a request (MAIN FUNCTION).
@@ -133,9 +184,13 @@ class RateLimitService:
                     message="No subscription - using testing mode"
                 )
             
-            # 2. Check daily token limit
-            daily_usage = await self.get_current_usage(user_id, "day")
-            current_daily_tokens = daily_usage.tokens_used if daily_usage else 0
+            engine = get_rate_limit_engine()
+            if engine is not None:
+                return self._check_with_engine(engine, user_id, limits, tokens_needed)
+            
+            # 2. Check daily token limit (counters are kept in memory, see UsageAccumulator)
+            usage = await self.get_usage_totals(user_id)
+            current_daily_tokens, current_daily_messages = usage["day"]
             daily_limit = limits['max_tokens_per_day']
             
             # NULL means unlimited
@@ -150,8 +205,7 @@ class RateLimitService:
                 )
             
             # 3. Check hourly message limit
-            hourly_usage = await self.get_current_usage(user_id, "hour")
-            current_hourly_messages = hourly_usage.messages_sent if hourly_usage else 0
+            current_hourly_messages = usage["hour"][1]
             hourly_limit = limits['max_messages_per_hour']
             
             if hourly_limit is not None and (current_hourly_messages + 1) > hourly_limit:
@@ -165,7 +219,6 @@ class RateLimitService:
                 )
             
             # 4. Check daily message limit
-            current_daily_messages = daily_usage.messages_sent if daily_usage else 0
             daily_message_limit = limits['max_messages_per_day']
             
             if daily_message_limit is not None and (current_daily_messages + 1) > daily_message_limit:
@@ -199,10 +252,59 @@ class RateLimitService:
                 message="Rate limit check failed"
             )
     
+    def _engine_rules(self, limits: Dict[str, Any], tokens: int) -> List[Tuple[str, Optional[int], str, int, str]]:
+        """(name, limit, period_type, cost, message) for each limit enforced by the engine, in check order."""
+        return [
+            ("tokens:day", limits['max_tokens_per_day'], "day", tokens, "Daily token limit of {} exceeded"),
+            ("messages:hour", limits['max_messages_per_hour'], "hour", 1, "Hourly message limit of {} exceeded"),
+            ("messages:day", limits['max_messages_per_day'], "day", 1, "Daily message limit of {} exceeded"),
+        ]
+    
+    def _check_with_engine(self, engine, user_id: str, limits: Dict[str, Any], tokens_needed: int) -> RateLimitCheckSchema:
+        """
+        Check the limits over rolling windows (see rate_limit_engine) instead
+        of calendar buckets. ``reset_at`` is when the request would be allowed,
+        or when the daily token usage fully drains if it is allowed.
+        """
+        now = datetime.now(timezone.utc)
+        timestamp = now.timestamp()
+        token_decision = None
+        
+        for name, limit, period_type, cost, message in self._engine_rules(limits, tokens_needed):
+            # NULL means unlimited
+            if limit is None:
+                continue
+            decision = engine.peek(
+                f"ratelimit:{user_id}:{name}", limit, _ENGINE_WINDOW_SECONDS[period_type], cost, timestamp
+            )
+            if not decision.allowed:
+                return RateLimitCheckSchema(
+                    allowed=False,
+                    current_usage=decision.current_usage,
+                    limit=limit,
+                    period_type=period_type,
+                    reset_at=now + timedelta(seconds=decision.retry_after),
+                    message=message.format(limit)
+                )
+            if name == "tokens:day":
+                token_decision = decision
+        
+        return RateLimitCheckSchema(
+            allowed=True,
+            current_usage=token_decision.current_usage if token_decision else 0,
+            limit=limits['max_tokens_per_day'],  # None means unlimited
+            period_type="day",
+            reset_at=now + timedelta(seconds=token_decision.reset_after) if token_decision else self._get_period_end("day"),
+            message="Request allowed"
+        )
+    
     async def record_usage(self, user_id: str, tokens_used: int) -> bool:
         """
         Record usage after a successful request.
         
+        The hour/day/month counters are updated in memory right away and
+        written to ``user_usage`` by the accumulator's periodic flush.
+        
         Args:
             user_id: User ID
             tokens_used: Actual tokens used
@@ -211,48 +313,23 @@ class RateLimitService:
             True if successful, False otherwise
         """
         try:
-            logger.info(f"Starting to record usage for user {user_id}: {tokens_used} tokens")
-            period_types = ['hour', 'day', 'month']
-            
-            for period_type in period_types:
-                period_start = self._get_period_start(period_type)
-                period_end = self._get_period_end(period_type)
-                
-                # Try to get existing usage record
-                usage = self.db.query(UserUsage).filter(
-                    and_(
-                        UserUsage.user_id == user_id,
-                        UserUsage.period_start == period_start,
-                        UserUsage.period_type == period_type
-                    )
-                ).first()
-                
-                if usage:
-                    # Update existing record
-                    usage.tokens_used += tokens_used
-                    usage.messages_sent += 1
-                    usage.updated_at = datetime.now(timezone.utc)
-                else:
-                    # Create new record
-                    usage = UserUsage(
-                        user_id=user_id,
-                        period_start=period_start,
-                        period_end=period_end,
-                        period_type=period_type,
-                        tokens_used=tokens_used,
-                        messages_sent=1
-                    )
-                    self.db.add(usage)
+            get_usage_accumulator().record(user_id, self._current_periods(), tokens_used)
             
-            self.db.commit()
-            logger.info(f"Successfully recorded usage for user {user_id}: {tokens_used} tokens, 1 message")
+            engine = get_rate_limit_engine()
+            if engine is not None:
+                limits = await self.get_user_limits(user_id)
+                if limits:
+                    timestamp = datetime.now(timezone.utc).timestamp()
+                    for name, limit, period_type, cost, _ in self._engine_rules(limits, tokens_used):
+                        if limit is not None:
+                            engine.consume(
+                                f"ratelimit:{user_id}:{name}", limit, _ENGINE_WINDOW_SECONDS[period_type], cost, timestamp
+                            )
+            logger.info(f"Recorded usage for user {user_id}: {tokens_used} tokens, 1 message")
             return True
             
         except Exception as e:
             logger.error(f"Error recording usage for user {user_id}: {e}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            self.db.rollback()
             return False
     
     def _get_period_start(self, period_type: str) -> datetime:
@@ -273,10 +350,8 @@ class RateLimitService:
         start = self._get_period_start(period_type)
         
         if period_type == "hour":
-            from datetime import timedelta
             return start + timedelta(hours=1)
         elif period_type == "day":
-            from datetime import timedelta
             return start + timedelta(days=1)
         elif period_type == "month":
             if start.month == 12:
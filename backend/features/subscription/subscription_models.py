@@ -1,7 +1,7 @@
 """Subscription and rate limiting models."""
 
 from datetime import datetime
-from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Integer, JSON, Text, Numeric
+from sqlalchemy import Column, String, DateTime, Boolean, ForeignKey, Integer, JSON, Text, Numeric, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID as PostgresUUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -78,8 +78,8 @@ class UserUsage(Base):
     period_type = Column(String(20), nullable=False)  # 'hour', 'day', 'month'
     
     # Usage counters
-    tokens_used = Column(Integer, default=0)
-    messages_sent = Column(Integer, default=0)
+    tokens_used = Column(Integer, default=0, server_default="0", nullable=False)
+    messages_sent = Column(Integer, default=0, server_default="0", nullable=False)
     
     # Metadata
     created_at = Column(DateTime(timezone=True), default=func.now())
@@ -87,3 +87,8 @@ class UserUsage(Base):
     
     # Relationships
     user = relationship("User", back_populates="usage_records")
+    
+    # One row per user and period; usage is added with INSERT ... ON CONFLICT
+    __table_args__ = (
+        UniqueConstraint('user_id', 'period_type', 'period_start', name='uq_user_usage_period'),
+    )
@@ -22,6 +22,7 @@ from features.subscription.subscription_schemas import (
     UsageEventSchema
 )
 from features.subscription.rate_limit_service import RateLimitService
+from features.subscription.limits_cache import get_limits_cache
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/subscription", tags=["subscription"])
@@ -50,6 +51,7 @@ async def get_subscription_status(
                 )
                 db.add(subscription)
                 db.commit()
+                get_limits_cache().invalidate(current_user.id)
                 logger.info(f"Auto-assigned free tier to user: {current_user.email}")
                 
                 # Try to get limits again
@@ -62,8 +64,7 @@ async def get_subscription_status(
                 )
         
         # Get current usage
-        daily_usage = await rate_limit_service.get_current_usage(current_user.id, "day")
-        hourly_usage = await rate_limit_service.get_current_usage(current_user.id, "hour")
+        usage = await rate_limit_service.get_usage_totals(current_user.id)
         
         # Build response
         tier_schema = SubscriptionTierSchema(
@@ -83,9 +84,9 @@ async def get_subscription_status(
         return SubscriptionStatusSchema(
             tier=tier_schema,
             current_usage={
-                "tokens_today": daily_usage.tokens_used if daily_usage else 0,
-                "messages_today": daily_usage.messages_sent if daily_usage else 0,
-                "messages_this_hour": hourly_usage.messages_sent if hourly_usage else 0
+                "tokens_today": usage["day"][0],
+                "messages_today": usage["day"][1],
+                "messages_this_hour": usage["hour"][1]
             },
             limits={
                 "tokens_per_day": limits['max_tokens_per_day'],
@@ -156,6 +157,7 @@ async def upgrade_subscription(
         db.add(new_subscription)
         db.commit()
         db.refresh(new_subscription)
+        get_limits_cache().invalidate(current_user.id)
         
         logger.info(f"User {current_user.email} upgraded to {tier.name} tier")
         
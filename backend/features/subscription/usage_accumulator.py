@@ -0,0 +1,330 @@
+"""Write-behind usage counters for rate limiting."""
+
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from psycopg2.extras import execute_values
+
+from shared.utils.norma_reconstruction import get_norma_reconstructor
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+PERIOD_TYPES = ("hour", "day", "month")
+
+# {period_type: (period_start, period_end)}
+Periods = Dict[str, Tuple[datetime, datetime]]
+# {period_type: (tokens_used, messages_sent)}
+UsageTotals = Dict[str, Tuple[int, int]]
+
+UPSERT_USAGE_SQL = """
+    INSERT INTO user_usage
+        (id, user_id, period_start, period_end, period_type, tokens_used, messages_sent, created_at, updated_at)
+    SELECT gen_random_uuid(), v.user_id, v.period_start, v.period_end, v.period_type,
+           v.tokens_used, v.messages_sent, now(), now()
+    FROM (VALUES %s) AS v(user_id, period_start, period_end, period_type, tokens_used, messages_sent)
+    -- Skip users whose account was deleted after the usage was recorded
+    WHERE EXISTS (SELECT 1 FROM users u WHERE u.id = v.user_id)
+    ON CONFLICT (user_id, period_type, period_start) DO UPDATE SET
+        tokens_used = user_usage.tokens_used + EXCLUDED.tokens_used,
+        messages_sent = user_usage.messages_sent + EXCLUDED.messages_sent,
+        updated_at = now()
+"""
+UPSERT_USAGE_TEMPLATE = "(%s::uuid, %s::timestamptz, %s::timestamptz, %s, %s::int, %s::int)"
+
+
+def upsert_usage(rows: List[Tuple[str, datetime, datetime, str, int, int]]):
+    """
+    Add ``(user_id, period_start, period_end, period_type, tokens, messages)``
+    deltas to ``user_usage`` in one atomic statement (one round trip).
+    Concurrent writers for the same period serialize on the unique key, so
+    no increment is lost and no duplicate row is created.
+    """
+    if not rows:
+        return
+    with get_norma_reconstructor().get_connection() as conn:
+        with conn.cursor() as cur:
+            # A single page, so all periods go in the same statement
+            execute_values(cur, UPSERT_USAGE_SQL, rows, template=UPSERT_USAGE_TEMPLATE, page_size=len(rows))
+        conn.commit()
+
+
+class InMemoryCounterStore:
+    """
+    Process-local stand-in for the Redis commands the accumulator uses
+    (MGET, SET NX EX, INCRBY on existing keys). Keys expire after their TTL,
+    so counters seeded from the database are refreshed periodically.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: List[str]) -> List[Optional[int]]:
+        now = time.monotonic()
+        with self._lock:
+            values = []
+            for key in keys:
+                entry = self._values.get(key)
+                if entry and entry[1] <= now:
+                    del self._values[key]
+                    entry = None
+                values.append(entry[0] if entry else None)
+            return values
+
+    def seed_many(self, values: Dict[str, int], ttl_seconds: float):
+        """Set keys that do not exist yet (SET NX EX)."""
+        now = time.monotonic()
+        with self._lock:
+            for key, value in values.items():
+                entry = self._values.get(key)
+                if entry is None or entry[1] <= now:
+                    self._values[key] = (value, now + ttl_seconds)
+
+    def incr_existing_many(self, increments: Dict[str, int]):
+        """INCRBY keys that exist; missing keys are left to be seeded on the next read."""
+        now = time.monotonic()
+        with self._lock:
+            for key, amount in increments.items():
+                entry = self._values.get(key)
+                if entry and entry[1] > now:
+                    self._values[key] = (entry[0] + amount, entry[1])
+
+
+class RedisCounterStore:
+    """Counters shared by every API worker through Redis."""
+
+    _INCR_EXISTING = """
+        for i, key in ipairs(KEYS) do
+            if redis.call('EXISTS', key) == 1 then
+                redis.call('INCRBY', key, ARGV[i])
+            end
+        end
+        return 0
+    """
+
+    def __init__(self, url: str):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self._incr_existing = self.client.register_script(self._INCR_EXISTING)
+
+    def get_many(self, keys: List[str]) -> List[Optional[int]]:
+        return [int(value) if value is not None else None for value in self.client.mget(keys)]
+
+    def seed_many(self, values: Dict[str, int], ttl_seconds: float):
+        pipe = self.client.pipeline()
+        for key, value in values.items():
+            pipe.set(key, value, nx=True, ex=max(1, int(ttl_seconds)))
+        pipe.execute()
+
+    def incr_existing_many(self, increments: Dict[str, int]):
+        self._incr_existing(keys=list(increments), args=list(increments.values()))
+
+
+class UsageAccumulator:
+    """
+    Answers rate-limit checks from counters and writes usage to ``user_usage`` behind.
+
+    - ``record`` adds the message to the counters and to a pending buffer.
+    - A background thread flushes the buffer every ``flush_interval`` seconds
+      as one ``INSERT ... ON CONFLICT DO UPDATE`` for all users and periods.
+    - ``totals`` reads the counters, seeding missing ones from the database
+      plus this process' unflushed usage.
+
+    With Redis (``REDIS_URL``) the counters are shared by every worker. A seed
+    only holds the database and this process' unflushed usage, not what other
+    workers have not flushed yet, so seeded counters also expire after
+    ``counter_ttl`` seconds and are re-read from the database (the usage
+    recorded meanwhile is added to them by every worker). With the in-memory
+    store each worker seeds its own counters the same way, so usage recorded
+    by other workers is seen at most ``flush_interval + counter_ttl`` late.
+    """
+
+    def __init__(self, store, flush_interval: float, counter_ttl: float):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.counter_ttl = counter_ttl
+        # (user_id, period_type, period_start) -> [period_end, tokens, messages]
+        self._pending: Dict[Tuple[str, str, datetime], List] = {}
+        self._in_flight: Dict[Tuple[str, str, datetime], List] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _key(user_id: str, period_type: str, period_start: datetime, counter: str) -> str:
+        return f"usage:{user_id}:{period_type}:{int(period_start.timestamp())}:{counter}"
+
+    def _unflushed(self, user_id: str, period_type: str, period_start: datetime) -> Tuple[int, int]:
+        tokens = messages = 0
+        for buffer in (self._pending, self._in_flight):
+            entry = buffer.get((user_id, period_type, period_start))
+            if entry:
+                tokens += entry[1]
+                messages += entry[2]
+        return tokens, messages
+
+    def _ttl(self, period_end: datetime) -> float:
+        # Short-lived even in Redis: the seed may miss other workers' unflushed usage
+        return max(1.0, min(self.counter_ttl, (period_end - datetime.now(period_end.tzinfo)).total_seconds() + 60))
+
+    def totals(
+        self,
+        user_id: str,
+        periods: Periods,
+        load_from_db: Callable[[], UsageTotals]
+    ) -> UsageTotals:
+        """Current (tokens, messages) per period for ``user_id``."""
+        user_id = str(user_id)
+        keys = []
+        for period_type, (period_start, _) in periods.items():
+            keys.append(self._key(user_id, period_type, period_start, "tokens"))
+            keys.append(self._key(user_id, period_type, period_start, "messages"))
+
+        values = self.store.get_many(keys)
+        if any(value is None for value in values):
+            stored = load_from_db()
+            seed = {}
+            with self._lock:
+                for period_type, (period_start, period_end) in periods.items():
+                    db_tokens, db_messages = stored.get(period_type, (0, 0))
+                    local_tokens, local_messages = self._unflushed(user_id, period_type, period_start)
+                    period_seed = {
+                        self._key(user_id, period_type, period_start, "tokens"): db_tokens + local_tokens,
+                        self._key(user_id, period_type, period_start, "messages"): db_messages + local_messages
+                    }
+                    self.store.seed_many(period_seed, self._ttl(period_end))
+                    seed.update(period_seed)
+            values = self.store.get_many(keys)
+            # A key can only be missing here if it expired in between; fall back to the seed
+            values = [seed[key] if value is None else value for key, value in zip(keys, values)]
+
+        return {
+            period_type: (values[2 * index], values[2 * index + 1])
+            for index, period_type in enumerate(periods)
+        }
+
+    def record(self, user_id: str, periods: Periods, tokens: int, messages: int = 1):
+        """
+        Add usage to the counters and queue it for the next flush.
+
+        With a flush interval of 0 the usage is written through right away
+        (one upsert for all periods); it is only queued if that write fails.
+        """
+        user_id = str(user_id)
+        increments = {}
+        if self.flush_interval <= 0:
+            try:
+                upsert_usage([
+                    (user_id, period_start, period_end, period_type, tokens, messages)
+                    for period_type, (period_start, period_end) in periods.items()
+                ])
+            except Exception as e:
+                logger.error(f"Could not write usage for user {user_id}, queuing it: {str(e)}")
+            else:
+                for period_type, (period_start, _) in periods.items():
+                    increments[self._key(user_id, period_type, period_start, "tokens")] = tokens
+                    increments[self._key(user_id, period_type, period_start, "messages")] = messages
+                try:
+                    self.store.incr_existing_many(increments)
+                except Exception as e:
+                    # Already in user_usage: queuing it again would count it twice
+                    logger.error(f"Could not update usage counters for user {user_id}: {str(e)}")
+                return
+
+        with self._lock:
+            for period_type, (period_start, period_end) in periods.items():
+                entry = self._pending.setdefault((user_id, period_type, period_start), [period_end, 0, 0])
+                entry[1] += tokens
+                entry[2] += messages
+                increments[self._key(user_id, period_type, period_start, "tokens")] = tokens
+                increments[self._key(user_id, period_type, period_start, "messages")] = messages
+            self.store.incr_existing_many(increments)
+
+    def forget(self, user_id: str):
+        """Drop the unflushed usage of a deleted user."""
+        user_id = str(user_id)
+        with self._lock:
+            for key in [key for key in self._pending if key[0] == user_id]:
+                del self._pending[key]
+
+    def flush(self) -> int:
+        """Write the pending usage to the database. Returns the number of rows upserted."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._in_flight, self._pending = self._pending, {}
+                rows = [
+                    (user_id, period_start, entry[0], period_type, entry[1], entry[2])
+                    for (user_id, period_type, period_start), entry in self._in_flight.items()
+                ]
+
+            try:
+                upsert_usage(rows)
+            except Exception as e:
+                logger.error(f"Could not flush usage for {len(rows)} periods, will retry: {str(e)}")
+                with self._lock:
+                    # Put the deltas back so the next flush retries them
+                    for key, entry in self._in_flight.items():
+                        pending = self._pending.setdefault(key, [entry[0], 0, 0])
+                        pending[1] += entry[1]
+                        pending[2] += entry[2]
+                    self._in_flight = {}
+                return 0
+
+            with self._lock:
+                self._in_flight = {}
+            logger.debug(f"Flushed usage for {len(rows)} user periods")
+            return len(rows)
+
+    def _run(self):
+        # In write-through mode the thread only retries writes that failed
+        while not self._stop.wait(self.flush_interval if self.flush_interval > 0 else 5.0):
+            self.flush()
+        self.flush()
+
+    def start(self):
+        """Start the background flush thread (idempotent)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="usage-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread after a final flush."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+
+def _create_counter_store():
+    if settings.REDIS_URL:
+        try:
+            return RedisCounterStore(settings.REDIS_URL)
+        except Exception as e:
+            logger.warning(f"Could not use Redis for usage counters, falling back to in-memory: {str(e)}")
+    return InMemoryCounterStore()
+
+
+_accumulator_instance = None
+
+
+def get_usage_accumulator() -> UsageAccumulator:
+    """Get a singleton instance of the UsageAccumulator (its flush thread starts on first use)."""
+    global _accumulator_instance
+    if _accumulator_instance is None:
+        _accumulator_instance = UsageAccumulator(
+            store=_create_counter_store(),
+            flush_interval=settings.USAGE_FLUSH_INTERVAL_SECONDS,
+            counter_ttl=settings.USAGE_COUNTER_TTL_SECONDS
+        )
+        _accumulator_instance.start()
+    return _accumulator_instance
@@ -2,6 +2,7 @@
 
 import os
 import logging
+import threading
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -14,6 +15,7 @@ from features.conversations.models import Conversation, Message
 from features.conversations.feedback.feedback_models import MessageFeedback
 from features.subscription.subscription_models import SubscriptionTier, UserSubscription, UserUsage
 from features.digest.digest_models import DigestWeekly, DigestUserPreferences
+from features.jobs.jobs_models import BackgroundJob
 
 # Import feature routers
 from features.auth.auth_routes import router as auth_router
@@ -29,6 +31,9 @@ from features.norma_chat.routes import router as norma_chat_router
 from features.digest.digest_routes import router as digest_router
 from features.daily_digest.daily_digest_routes import router as daily_digest_router
 from features.notifications.notifications_routes import router as notifications_router
+from features.jobs.jobs_routes import router as jobs_router
+from features.jobs.jobs_worker import start_worker_pool, stop_worker_pool
+from features.subscription.usage_accumulator import get_usage_accumulator
 
 # Import core configuration and logging
 from core.config.config import settings
@@ -89,6 +94,45 @@ app.include_router(norma_chat_router, prefix="/api")
 app.include_router(digest_router, prefix="/api")
 app.include_router(daily_digest_router, prefix="/api")
 app.include_router(notifications_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
+
+
+@app.on_event("startup")
+async def warm_normas_graph_index():
+    """Load the normas relationship graph index in the background so requests don't pay for it."""
+    from features.normas.normas_graph_index import get_normas_graph_index
+
+    def _load():
+        try:
+            get_normas_graph_index().ensure_loaded()
+        except Exception as e:
+            app_logger.warning(f"Could not load normas graph index at startup: {str(e)}")
+
+    threading.Thread(target=_load, name="normas-graph-warmup", daemon=True).start()
+
+
+@app.on_event("startup")
+async def start_job_workers():
+    """Start the background job worker processes (JOB_WORKERS, 0 disables them)."""
+    start_worker_pool()
+
+
+@app.on_event("shutdown")
+async def stop_job_workers():
+    """Let the job workers finish their current job and stop."""
+    stop_worker_pool()
+
+
+@app.on_event("startup")
+async def start_usage_flush():
+    """Start flushing rate-limit usage counters to the database."""
+    get_usage_accumulator()
+
+
+@app.on_event("shutdown")
+async def flush_usage():
+    """Write the usage recorded since the last flush before exiting."""
+    get_usage_accumulator().stop()
 
 
 @app.get("/api/")
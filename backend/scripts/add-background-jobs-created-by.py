@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Migration script to add the requesting user to the background_jobs table."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+async def add_background_jobs_created_by():
+    """Add the created_by column to background_jobs table."""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return
+    
+    try:
+        # Create engine
+        engine = create_engine(database_url)
+        
+        print("✅ Connected to database")
+        
+        with engine.connect() as conn:
+            conn.execute(text("""
+                ALTER TABLE background_jobs 
+                ADD COLUMN IF NOT EXISTS created_by UUID REFERENCES users(id) ON DELETE SET NULL
+            """))
+            conn.commit()
+            
+            print("✅ Successfully added created_by column to 'background_jobs' table")
+        
+    except Exception as e:
+        print(f"❌ Failed to add column: {e}")
+        raise
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(add_background_jobs_created_by())
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""Migration script to add the rolling history summary columns to the conversations table."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+async def add_conversation_history_summary():
+    """Add history_summary and history_summarized_until columns to conversations table."""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return
+    
+    try:
+        # Create engine
+        engine = create_engine(database_url)
+        
+        print("✅ Connected to database")
+        
+        with engine.connect() as conn:
+            conn.execute(text("""
+                ALTER TABLE conversations 
+                ADD COLUMN IF NOT EXISTS history_summary TEXT,
+                ADD COLUMN IF NOT EXISTS history_summarized_until TIMESTAMP WITH TIME ZONE
+            """))
+            conn.commit()
+            
+            print("✅ Successfully added history summary columns to 'conversations' table")
+        
+    except Exception as e:
+        print(f"❌ Failed to add columns: {e}")
+        raise
+
+if __name__ == "__main__":
+    import asyncio
+    asyncio.run(add_conversation_history_summary())
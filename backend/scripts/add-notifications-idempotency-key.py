@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""Migration script to add the idempotency_key column to the notifications table."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def add_idempotency_key_column():
+    """Add idempotency_key column (unique) to the notifications table."""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return
+
+    try:
+        engine = create_engine(database_url)
+
+        print("✅ Connected to database")
+
+        with engine.connect() as conn:
+            result = conn.execute(text("""
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_name = 'notifications'
+                AND column_name = 'idempotency_key'
+            """))
+
+            if result.fetchone():
+                print("ℹ️  Column 'idempotency_key' already exists, skipping migration")
+                return
+
+            conn.execute(text("""
+                ALTER TABLE notifications
+                ADD COLUMN idempotency_key VARCHAR(255)
+            """))
+            conn.execute(text("""
+                ALTER TABLE notifications
+                ADD CONSTRAINT notifications_idempotency_key_key UNIQUE (idempotency_key)
+            """))
+            conn.commit()
+
+            print("✅ Successfully added 'idempotency_key' column to 'notifications' table")
+
+    except Exception as e:
+        print(f"❌ Failed to add column: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    add_idempotency_key_column()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Migration script for the atomic user_usage upsert: NOT NULL counters and a unique (user_id, period_type, period_start)."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def add_user_usage_period_unique():
+    """Make the counters NOT NULL, merge duplicate usage rows per user and period, then add the unique constraint."""
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return
+
+    try:
+        engine = create_engine(database_url)
+
+        print("✅ Connected to database")
+
+        with engine.begin() as conn:
+            # Block concurrent usage writes while rows are fixed and merged
+            conn.execute(text("LOCK TABLE user_usage IN SHARE ROW EXCLUSIVE MODE"))
+
+            # The upsert adds to the existing counters, so they can't be NULL
+            conn.execute(text("""
+                UPDATE user_usage
+                SET tokens_used = COALESCE(tokens_used, 0),
+                    messages_sent = COALESCE(messages_sent, 0)
+                WHERE tokens_used IS NULL OR messages_sent IS NULL
+            """))
+            conn.execute(text("""
+                ALTER TABLE user_usage
+                ALTER COLUMN tokens_used SET DEFAULT 0,
+                ALTER COLUMN tokens_used SET NOT NULL,
+                ALTER COLUMN messages_sent SET DEFAULT 0,
+                ALTER COLUMN messages_sent SET NOT NULL
+            """))
+            print("✅ Usage counters are NOT NULL DEFAULT 0")
+
+            result = conn.execute(text("""
+                SELECT 1
+                FROM pg_constraint
+                WHERE conname = 'uq_user_usage_period'
+            """))
+
+            if result.fetchone():
+                print("ℹ️  Constraint 'uq_user_usage_period' already exists, skipping deduplication")
+                return
+
+            conn.execute(text("""
+                CREATE TEMP TABLE user_usage_duplicates ON COMMIT DROP AS
+                SELECT
+                    user_id,
+                    period_type,
+                    period_start,
+                    (array_agg(id ORDER BY created_at, id))[1] AS keep_id,
+                    SUM(tokens_used) AS tokens_used,
+                    SUM(messages_sent) AS messages_sent
+                FROM user_usage
+                GROUP BY user_id, period_type, period_start
+                HAVING COUNT(*) > 1
+            """))
+
+            conn.execute(text("""
+                UPDATE user_usage u
+                SET tokens_used = d.tokens_used,
+                    messages_sent = d.messages_sent,
+                    updated_at = now()
+                FROM user_usage_duplicates d
+                WHERE u.id = d.keep_id
+            """))
+            deleted = conn.execute(text("""
+                DELETE FROM user_usage u
+                USING user_usage_duplicates d
+                WHERE u.user_id = d.user_id
+                  AND u.period_type = d.period_type
+                  AND u.period_start = d.period_start
+                  AND u.id <> d.keep_id
+            """)).rowcount
+            print(f"✅ Merged duplicate usage rows ({deleted} removed)")
+
+            conn.execute(text("""
+                ALTER TABLE user_usage
+                ADD CONSTRAINT uq_user_usage_period UNIQUE (user_id, period_type, period_start)
+            """))
+
+            print("✅ Successfully added 'uq_user_usage_period' constraint to 'user_usage' table")
+
+    except Exception as e:
+        print(f"❌ Failed to add constraint: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    add_user_usage_period_unique()
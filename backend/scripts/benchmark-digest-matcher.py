@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Benchmark the weekly digest preference matcher against per-user linear filtering."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+
+from features.digest.digest_matcher import PreferenceMatcher
+
+TIPOS = ["Ley", "Decreto", "Resolución", "Disposición", "Decisión Administrativa", "Acordada", "Circular"]
+DEPENDENCIAS = [f"Ministerio {i}" for i in range(40)] + [f"Secretaría {i}" for i in range(60)]
+VOCABULARY = [
+    "impuesto", "salud", "educación", "energía", "transporte", "vivienda", "trabajo", "jubilación",
+    "comercio exterior", "aduana", "minería", "pesca", "agricultura", "ganadería", "turismo",
+    "presupuesto", "deuda pública", "emergencia", "tarifas", "subsidios", "medio ambiente",
+    "seguridad social", "defensa", "cultura", "ciencia", "telecomunicaciones", "banco central",
+    "monotributo", "ganancias", "iva", "exportaciones", "importaciones", "contrataciones",
+]
+
+
+def _synthetic_normas(count: int, rng: random.Random):
+    normas = []
+    for i in range(count):
+        words = rng.sample(VOCABULARY, 4)
+        normas.append({
+            "infoleg_id": 100000 + i,
+            "tipo_norma": rng.choice(TIPOS),
+            "dependencia": rng.choice(DEPENDENCIAS),
+            "titulo_sumario": f"{words[0].upper()} - Régimen de {words[1]} y {words[2]}. Modificación {words[3]}.",
+        })
+    return normas
+
+
+def _synthetic_preferences(count: int, rng: random.Random):
+    preferences = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.1:
+            preferences.append({})
+            continue
+        prefs = {}
+        if rng.random() < 0.6:
+            prefs["tipo_norma"] = rng.sample(TIPOS, rng.randint(1, 3))
+        if rng.random() < 0.5:
+            prefs["dependencia"] = rng.sample(DEPENDENCIAS, rng.randint(1, 5))
+        if rng.random() < 0.7:
+            prefs["titulo_sumario"] = rng.sample(VOCABULARY, rng.randint(1, 6))
+        preferences.append(prefs)
+    return preferences
+
+
+def _filter_linear(preferences, normas):
+    """Reference implementation: scan every norma for every user."""
+    tipos = preferences.get("tipo_norma") or []
+    dependencias = preferences.get("dependencia") or []
+    keywords = preferences.get("titulo_sumario") or []
+    if isinstance(keywords, str):
+        keywords = [keywords]
+    if not (tipos or dependencias or keywords):
+        return normas
+    return [
+        norma for norma in normas
+        if norma.get("tipo_norma") in tipos
+        or norma.get("dependencia") in dependencias
+        or any(keyword.lower() in (norma.get("titulo_sumario") or "").lower() for keyword in keywords)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--normas", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    normas = _synthetic_normas(args.normas, rng)
+    preferences = _synthetic_preferences(args.users, rng)
+    print(f"📊 {args.users} users × {args.normas} normas")
+
+    started = time.perf_counter()
+    linear = [_filter_linear(prefs, normas) for prefs in preferences]
+    linear_seconds = time.perf_counter() - started
+    print(f"   Linear scan:        {linear_seconds:.3f}s")
+
+    started = time.perf_counter()
+    matcher = PreferenceMatcher(normas, preferences)
+    build_seconds = time.perf_counter() - started
+    compiled = [matcher.filter(prefs) for prefs in preferences]
+    compiled_seconds = time.perf_counter() - started
+    print(f"   Compiled matcher:   {compiled_seconds:.3f}s (index build {build_seconds:.3f}s)")
+    print(f"   Speedup:            {linear_seconds / compiled_seconds:.1f}x")
+
+    mismatches = sum(1 for a, b in zip(linear, compiled) if a != b)
+    if mismatches:
+        print(f"❌ {mismatches} users got different normas")
+        sys.exit(1)
+    print("✅ Results identical for every user")
+
+
+if __name__ == "__main__":
+    main()
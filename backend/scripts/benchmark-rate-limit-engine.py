@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Benchmark the sliding-window and GCRA rate limit engines (check + record per request)."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import random
+import time
+
+from features.subscription.rate_limit_engine import (
+    ENGINE_GCRA,
+    ENGINE_SLIDING_WINDOW,
+    create_rate_limit_engine,
+)
+
+HOUR = 3600
+TARGET_CHECKS_PER_SECOND = 10000
+
+
+def _boundary_burst(engine_name: str, limit: int) -> int:
+    """Requests allowed for one user sending `limit` right before and `limit` right after an hour boundary."""
+    engine = create_rate_limit_engine(engine_name)
+    boundary = 1_000 * HOUR
+    allowed = 0
+    for now in [boundary - 1] * limit + [boundary + 1] * limit:
+        if engine.peek("burst", limit, HOUR, 1, now).allowed:
+            engine.consume("burst", limit, HOUR, 1, now)
+            allowed += 1
+    return allowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    users = [f"user-{i}" for i in range(args.users)]
+    traffic = [(rng.choice(users), rng.randint(200, 4000)) for _ in range(args.requests)]
+    print(f"📊 {args.requests} requests from {args.users} users (3 limits checked and recorded per request)")
+
+    failed = False
+    for engine_name in (ENGINE_SLIDING_WINDOW, ENGINE_GCRA):
+        engine = create_rate_limit_engine(engine_name)
+        now = time.time()
+        rejected = 0
+        started = time.perf_counter()
+        for index, (user_id, tokens) in enumerate(traffic):
+            # Spread the traffic over an hour of simulated time
+            timestamp = now + index * HOUR / len(traffic)
+            rules = (
+                (f"{user_id}:tokens:day", 100000, 86400, tokens),
+                (f"{user_id}:messages:hour", 20, HOUR, 1),
+                (f"{user_id}:messages:day", 100, 86400, 1),
+            )
+            if all(engine.peek(key, limit, window, cost, timestamp).allowed for key, limit, window, cost in rules):
+                for key, limit, window, cost in rules:
+                    engine.consume(key, limit, window, cost, timestamp)
+            else:
+                rejected += 1
+        seconds = time.perf_counter() - started
+        rate = len(traffic) / seconds
+        print(f"   {engine_name:<15} {rate:>10,.0f} requests/s ({rejected} rejected)")
+        if rate < TARGET_CHECKS_PER_SECOND:
+            failed = True
+
+    print("📊 Burst across an hour boundary with a limit of 20 messages/hour")
+    print(f"   fixed           {2 * 20} allowed (each calendar hour starts from zero)")
+    for engine_name in (ENGINE_SLIDING_WINDOW, ENGINE_GCRA):
+        print(f"   {engine_name:<15} {_boundary_burst(engine_name, 20)} allowed")
+
+    if failed:
+        print(f"❌ Below {TARGET_CHECKS_PER_SECOND:,} requests/s")
+        sys.exit(1)
+    print(f"✅ Above {TARGET_CHECKS_PER_SECOND:,} requests/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""Migration script to create and fill the normas_stats_summary table."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from shared.utils.norma_reconstruction import get_norma_reconstructor
+
+
+def build_normas_stats_summary():
+    """Create the normas_stats_summary table if needed and rebuild it in full."""
+    if not os.getenv('DATABASE_URL'):
+        print("❌ DATABASE_URL environment variable not set")
+        return
+
+    try:
+        result = get_norma_reconstructor().refresh_normas_stats(full=True)
+        print(f"✅ Built normas statistics summary (watermark: norma id {result['watermark']})")
+
+    except Exception as e:
+        print(f"❌ Failed to build normas statistics summary: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    build_normas_stats_summary()
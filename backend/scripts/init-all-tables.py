@@ -16,6 +16,7 @@ from features.favorites.favorites_models import Favorite
 from features.conversations.models import Conversation, Message
 from features.conversations.feedback.feedback_models import MessageFeedback
 from features.subscription.subscription_models import SubscriptionTier, UserSubscription, UserUsage
+from features.jobs.jobs_models import BackgroundJob
 
 load_dotenv()
 
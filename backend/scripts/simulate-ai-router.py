@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Simulate the AI provider router against fake providers with injected latency and failures."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import time
+
+from features.conversations.ai_services import AIProviderRouter, FakeAIService, Message
+from features.conversations.ai_services.base import ROUTE_ANSWER, ROUTE_FAST, INBAND_ERROR_PREFIX
+
+
+async def _run(router: AIProviderRouter, requests: int, concurrency: int, route_class: str = ROUTE_ANSWER):
+    """Send ``requests`` generations, ``concurrency`` at a time. Returns (ttfts, errors)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    ttfts, errors = [], 0
+
+    async def _one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            first = None
+            async for chunk in router.generate_stream([Message("user", "hola")], "", route_class=route_class):
+                if first is None:
+                    first = chunk
+                    ttfts.append(time.perf_counter() - started)
+            if first is None or first.startswith(INBAND_ERROR_PREFIX):
+                errors += 1
+
+    await asyncio.gather(*(_one() for _ in range(requests)))
+    return ttfts, errors
+
+
+def _report(title: str, router: AIProviderRouter, ttfts, errors: int):
+    print(f"📊 {title}")
+    for stats in router.get_stats():
+        print(
+            f"   {stats['name']:<10} requests={stats['requests']:<5} failures={stats['failures']:<5} "
+            f"ttft={stats['ttft_seconds']}s error_rate={stats['error_rate']} cooling_down={stats['cooling_down']}"
+        )
+    p95 = statistics.quantiles(ttfts, n=20)[-1] if len(ttfts) > 1 else 0.0
+    print(f"   client ttft p50={statistics.median(ttfts):.3f}s p95={p95:.3f}s, failed requests: {errors}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    ok = True
+    # Failover is logged per request; keep the report readable
+    logging.getLogger("simpla").setLevel(logging.ERROR)
+
+    # 1. Primary slow: traffic should move to the fast backend
+    slow = FakeAIService("slow", first_chunk_latency=0.4, seed=1)
+    fast = FakeAIService("fast", first_chunk_latency=0.05, seed=2)
+    router = AIProviderRouter([("slow", slow, [ROUTE_ANSWER]), ("fast", fast, [ROUTE_ANSWER])], rng=rng)
+    ttfts, errors = await _run(router, args.requests, args.concurrency)
+    _report("Slow primary (400ms) vs fast secondary (50ms)", router, ttfts, errors)
+    ok &= fast.calls > slow.calls and errors == 0
+
+    # 2. Primary rate limited: fail over before the first chunk, then cool it down
+    limited = FakeAIService("limited", first_chunk_latency=0.01, error_rate=1.0, seed=3)
+    backup = FakeAIService("backup", first_chunk_latency=0.05, seed=4)
+    router = AIProviderRouter([("limited", limited, [ROUTE_ANSWER]), ("backup", backup, [ROUTE_ANSWER])], rng=rng)
+    ttfts, errors = await _run(router, args.requests, args.concurrency)
+    _report("Rate-limited primary (429 on every call)", router, ttfts, errors)
+    ok &= errors == 0 and limited.calls < args.concurrency * 2
+
+    # 3. Primary hangs: fail over after the first-chunk timeout
+    hung = FakeAIService("hung", first_chunk_latency=5.0, seed=5)
+    backup = FakeAIService("backup", first_chunk_latency=0.05, seed=6)
+    router = AIProviderRouter(
+        [("hung", hung, [ROUTE_ANSWER]), ("backup", backup, [ROUTE_ANSWER])], first_chunk_timeout=0.3, rng=rng
+    )
+    ttfts, errors = await _run(router, args.requests, args.concurrency)
+    _report("Hanging primary (first-chunk timeout 300ms)", router, ttfts, errors)
+    ok &= errors == 0
+
+    # 4. Flaky backend (30% errors, raised) mixed with a slower reliable one
+    flaky = FakeAIService("flaky", first_chunk_latency=0.02, error_rate=0.3, error="503 unavailable", inband_errors=False, seed=7)
+    steady = FakeAIService("steady", first_chunk_latency=0.08, seed=8)
+    router = AIProviderRouter([("flaky", flaky, [ROUTE_ANSWER]), ("steady", steady, [ROUTE_ANSWER])], rng=rng)
+    ttfts, errors = await _run(router, args.requests, args.concurrency)
+    _report("Flaky fast backend (30% errors) vs steady slower backend", router, ttfts, errors)
+    ok &= errors == 0
+
+    # 5. Routing classes: reformulation goes to the cheap model, answers to the strong one
+    cheap = FakeAIService("cheap", first_chunk_latency=0.01, seed=9)
+    strong = FakeAIService("strong", first_chunk_latency=0.1, seed=10)
+    router = AIProviderRouter([("strong", strong, [ROUTE_ANSWER]), ("cheap", cheap, [ROUTE_FAST])], rng=rng)
+    await _run(router, 50, args.concurrency, ROUTE_FAST)
+    await _run(router, 50, args.concurrency, ROUTE_ANSWER)
+    print(f"📊 Routing classes: cheap served {cheap.calls} fast calls, strong served {strong.calls} answers")
+    ok &= cheap.calls == 50 and strong.calls == 50
+
+    if not ok:
+        print("❌ Routing did not behave as expected")
+        sys.exit(1)
+    print("✅ Routing behaved as expected in every scenario")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
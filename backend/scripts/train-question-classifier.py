@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Train the reformulation pre-classifier from logged conversation outcomes."""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import random
+from collections import defaultdict
+
+from sqlalchemy import create_engine, text
+from dotenv import load_dotenv
+
+from features.conversations.question_classifier import (
+    DEFAULT_MODEL_PATH, NON_QUERY_MESSAGE_TYPES, extract_features, train_weights, choose_threshold, predict, same_query
+)
+
+load_dotenv()
+
+
+def load_examples(database_url: str, limit: int):
+    """
+    (question, context_messages, label) for every user message followed by
+    an assistant answer. Label 1 when the reformulation searched with the
+    question as written (the answer's ``reformulated_query`` matches it), 0
+    when it rewrote the question or answered NON-LEGAL, CLARIFICATION or
+    REFORMULATE_REQUEST. Answers routed by the classifier itself are left
+    out, as are answers logged without their query and questions that
+    follow a clarification request (the classifier never skips those).
+    """
+    engine = create_engine(database_url)
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT conversation_id, role, content, message_metadata
+            FROM conversation_messages
+            WHERE is_deleted = false AND role IN ('user', 'assistant')
+            ORDER BY created_at DESC
+            LIMIT :limit
+        """), {"limit": limit}).fetchall()
+
+    conversations = defaultdict(list)
+    for conversation_id, role, content, metadata in reversed(rows):
+        conversations[conversation_id].append({"role": role, "content": content, "metadata": metadata or {}})
+
+    examples = []
+    for messages in conversations.values():
+        for index in range(len(messages) - 1):
+            question, answer = messages[index], messages[index + 1]
+            if question["role"] != "user" or answer["role"] != "assistant":
+                continue
+            context = messages[max(0, index - 3):index]
+            if any(m["role"] == "assistant" and m["metadata"].get("message_type") in NON_QUERY_MESSAGE_TYPES for m in context):
+                continue
+            metadata = answer["metadata"]
+            if metadata.get("message_type") in NON_QUERY_MESSAGE_TYPES:
+                label = 0
+            elif "reformulated_query" in metadata and metadata.get("reformulation_source") != "classifier":
+                label = int(same_query(question["content"], metadata["reformulated_query"]))
+            else:
+                continue
+            examples.append((question["content"], context, label))
+    return examples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the question classifier that skips reformulation")
+    parser.add_argument("--limit", type=int, default=200000, help="Most recent messages to read")
+    parser.add_argument("--min-precision", type=float, default=0.97,
+                        help="Required share of skipped messages that really were standalone legal questions")
+    parser.add_argument("--output", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    database_url = os.getenv('DATABASE_URL')
+    if not database_url:
+        print("❌ DATABASE_URL environment variable not set")
+        return
+
+    examples = load_examples(database_url, args.limit)
+    positives = sum(label for _, _, label in examples)
+    print(f"📥 {len(examples)} labelled questions ({positives} searched as written, {len(examples) - positives} rewritten or not routed to search)")
+    if len(examples) < 50:
+        print("❌ Not enough labelled questions to train")
+        return
+
+    featurized = [(extract_features(question, bool(context)), label) for question, context, label in examples]
+    random.Random(args.seed).shuffle(featurized)
+    split = int(len(featurized) * 0.8)
+    train, held_out = featurized[:split], featurized[split:]
+
+    weights = train_weights(train, seed=args.seed)
+    scored = [(predict(weights, features), label) for features, label in held_out]
+    threshold, precision, skip_rate = choose_threshold(scored, args.min_precision)
+    print(f"🎯 Held-out: threshold {threshold:.3f} skips {skip_rate:.1%} of questions at {precision:.1%} precision")
+
+    # Final model on every example, with the threshold picked on the held-out split
+    weights = train_weights(featurized, seed=args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({
+            "weights": weights,
+            "threshold": round(threshold, 4),
+            "examples": len(featurized),
+            "precision": round(precision, 4),
+            "skip_rate": round(skip_rate, 4)
+        }, f, ensure_ascii=False, indent=2)
+    print(f"✅ Wrote {len(weights)} weights to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""Email dispatch engine shared by every feature that sends email through Resend."""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import resend
+from resend.exceptions import ResendError
+from psycopg2.extras import execute_values
+
+from shared.utils.norma_reconstruction import get_norma_reconstructor
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Resend accepts up to 100 emails per batch request
+EMAIL_BATCH_MAX = 100
+
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+
+# (idempotency key or None, Resend send params)
+OutgoingEmail = Tuple[Optional[str], Dict[str, Any]]
+
+
+def default_sender(display_name: str = "Simpla") -> str:
+    return f"{display_name} <{settings.EMAIL_FROM or 'no-reply@simplalegal.com'}>"
+
+
+def _error_code(error: BaseException) -> Optional[int]:
+    try:
+        return int(getattr(error, "code", None))
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_email_error(error: BaseException) -> bool:
+    """Rate limits, provider 5xx and network errors are retried; validation errors are not."""
+    if isinstance(error, ResendError):
+        code = _error_code(error)
+        return code is not None and (code == 429 or code >= 500)
+    return not isinstance(error, (ValueError, TypeError))
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket refilled at ``per_second``, with a burst of one
+    second worth of requests. ``reserve`` claims a slot and returns how long
+    the caller has to wait before using it, so sync and async callers share
+    the same quota.
+
+    The bucket lives in one process: every process that sends email gets
+    its share of the account limit (see ``get_email_dispatcher``).
+    """
+
+    def __init__(self, per_second: float):
+        self.rate = float(per_second)
+        self.capacity = max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float):
+        """Drain the bucket so nobody sends for ``seconds`` (after a 429)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class EmailDispatcher:
+    """
+    Sends every outgoing email of the app.
+
+    - A process-wide token bucket keeps requests under this process' share
+      of the provider rate.
+    - ``send_many`` packs emails into batch requests of up to 100 and runs
+      them concurrently in threads; ``send`` is the single-email path used by
+      the transactional emails (auth, contact, feedback).
+    - Rate limits, 5xx and network errors are retried with exponential
+      backoff. A batch rejected as invalid is retried one email at a time so
+      a single bad address does not sink the other 99.
+    - Emails with an idempotency key get their status stored in
+      ``email_deliveries``; keys already marked as sent are skipped, so a
+      retried job never emails anyone twice. If that status can't be read,
+      keyed sends fail instead of risking a duplicate.
+    - Sent/failed/skipped counts, requests, retries and throughput are kept
+      per category and logged after every ``send_many``.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: float,
+        max_concurrency: int = 4,
+        max_attempts: int = 4,
+        backoff_base_seconds: float = 1.0,
+        batch_size: int = EMAIL_BATCH_MAX
+    ):
+        self.limiter = RateLimiter(requests_per_second)
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self.backoff_base_seconds = backoff_base_seconds
+        self.batch_size = min(batch_size, EMAIL_BATCH_MAX)
+        self._metrics: Dict[str, Dict[str, float]] = {}
+        self._metrics_lock = threading.Lock()
+        self._table_ready = False
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def send(self, params: Dict[str, Any], category: str, key: Optional[str] = None) -> Optional[str]:
+        """
+        Send one email, blocking until it is accepted.
+
+        Returns the provider message id (None if ``key`` was already sent).
+        Raises the provider error once the retries are exhausted, or the
+        database error if the delivery status of ``key`` can't be read.
+        """
+        if key and self.sent_keys([key]):
+            self._count(category, skipped=1)
+            return None
+
+        try:
+            response = self._call_with_retries(lambda: resend.Emails.send(params), category)
+        except Exception as e:
+            self._count(category, failed=1)
+            self._record(category, [(key, params, STATUS_FAILED, None, str(e))])
+            raise
+
+        provider_id = response.get("id") if isinstance(response, dict) else None
+        self._count(category, sent=1)
+        self._record(category, [(key, params, STATUS_SENT, provider_id, None)])
+        return provider_id
+
+    async def send_async(self, params: Dict[str, Any], category: str, key: Optional[str] = None) -> Optional[str]:
+        """``send`` without blocking the event loop."""
+        return await asyncio.to_thread(self.send, params, category, key)
+
+    async def send_many(
+        self,
+        emails: List[OutgoingEmail],
+        category: str,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Send ``(key, params)`` emails through the batch API.
+
+        ``on_progress(done, total)`` is called as batches complete. Returns
+        the sent/skipped/failed counts and the throughput of this run. Nothing
+        is sent if the delivery status of the keyed emails can't be read.
+        """
+        started = time.perf_counter()
+
+        unique: Dict[Any, OutgoingEmail] = {}
+        for key, params in emails:
+            unique[key if key is not None else id(params)] = (key, params)
+        emails = list(unique.values())
+
+        already_sent = self.sent_keys([key for key, _ in emails if key])
+        pending = [(key, params) for key, params in emails if key not in already_sent]
+        skipped = len(emails) - len(pending)
+        self._count(category, skipped=skipped)
+
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        done = skipped
+        sent = failed = 0
+
+        async def _run(batch: List[OutgoingEmail]):
+            nonlocal done, sent, failed
+            async with semaphore:
+                batch_sent, batch_failed = await asyncio.to_thread(self._deliver_batch, batch, category)
+            sent += batch_sent
+            failed += batch_failed
+            done += len(batch)
+            if on_progress:
+                on_progress(done, len(emails))
+
+        await asyncio.gather(*(_run(batch) for batch in batches))
+
+        elapsed = time.perf_counter() - started
+        result = {
+            "total": len(emails),
+            "sent": sent,
+            "skipped": skipped,
+            "failed": failed,
+            "batches": len(batches),
+            "seconds": round(elapsed, 2),
+            "emails_per_second": round(sent / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        logger.info(
+            f"Email dispatch ({category}): {sent} sent, {skipped} already sent, {failed} failed "
+            f"in {result['seconds']}s ({result['emails_per_second']} emails/s, {len(batches)} batch requests)"
+        )
+        return result
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Cumulative counters per category since the process started."""
+        with self._metrics_lock:
+            return {category: dict(counters) for category, counters in self._metrics.items()}
+
+    # ------------------------------------------------------------------
+    # Delivery
+    # ------------------------------------------------------------------
+
+    def _call_with_retries(self, call: Callable[[], Any], category: str) -> Any:
+        resend.api_key = settings.RESEND_API_KEY
+        for attempt in range(self.max_attempts):
+            self.limiter.acquire()
+            self._count(category, requests=1)
+            try:
+                return call()
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not is_retryable_email_error(e):
+                    raise
+                delay = self.backoff_base_seconds * (2 ** attempt)
+                delay += random.uniform(0, delay * 0.1)
+                if _error_code(e) == 429:
+                    self.limiter.pause(delay)
+                self._count(category, retries=1)
+                logger.warning(f"Email send failed (attempt {attempt + 1}), retrying in {delay:.1f}s: {str(e)}")
+                time.sleep(delay)
+
+    def _deliver_batch(self, batch: List[OutgoingEmail], category: str) -> Tuple[int, int]:
+        """Send one batch request (runs in a worker thread). Returns (sent, failed)."""
+        try:
+            if len(batch) == 1:
+                response = {"data": [self._call_with_retries(lambda: resend.Emails.send(batch[0][1]), category)]}
+            else:
+                response = self._call_with_retries(lambda: resend.Batch.send([params for _, params in batch]), category)
+        except Exception as e:
+            if len(batch) > 1 and not is_retryable_email_error(e):
+                logger.warning(f"Batch of {len(batch)} emails rejected ({str(e)}), sending them one by one")
+                results = [self._deliver_batch([email], category) for email in batch]
+                return sum(r[0] for r in results), sum(r[1] for r in results)
+            logger.error(f"Could not send {len(batch)} {category} emails: {str(e)}")
+            self._count(category, failed=len(batch))
+            self._record(category, [(key, params, STATUS_FAILED, None, str(e)) for key, params in batch])
+            return 0, len(batch)
+
+        data = response.get("data") if isinstance(response, dict) else None
+        data = data or []
+        records = []
+        for index, (key, params) in enumerate(batch):
+            item = data[index] if index < len(data) else None
+            provider_id = item.get("id") if isinstance(item, dict) else None
+            records.append((key, params, STATUS_SENT, provider_id, None))
+        self._count(category, sent=len(batch))
+        self._record(category, records)
+        return len(batch), 0
+
+    # ------------------------------------------------------------------
+    # Delivery status
+    # ------------------------------------------------------------------
+
+    def _ensure_table(self, cur):
+        if self._table_ready:
+            return
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS email_deliveries (
+                idempotency_key VARCHAR(255) PRIMARY KEY,
+                category VARCHAR(50) NOT NULL,
+                recipient TEXT NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                provider_message_id VARCHAR(100),
+                attempts INTEGER NOT NULL DEFAULT 1,
+                last_error TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_email_deliveries_category_status "
+            "ON email_deliveries (category, status)"
+        )
+        self._table_ready = True
+
+    def sent_keys(self, keys: List[str]) -> Set[str]:
+        """
+        Keys already delivered.
+
+        A lookup failure is logged and raised: treating it as "none sent"
+        would email everyone again.
+        """
+        if not keys:
+            return set()
+        try:
+            with get_norma_reconstructor().get_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute(
+                        "SELECT idempotency_key FROM email_deliveries "
+                        "WHERE idempotency_key = ANY(%s) AND status = %s",
+                        (keys, STATUS_SENT)
+                    )
+                    rows = cur.fetchall()
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Could not read email delivery status, not sending: {str(e)}")
+            raise
+        return {row[0] for row in rows}
+
+    def _record(self, category: str, records: List[Tuple[Optional[str], Dict[str, Any], str, Optional[str], Optional[str]]]):
+        """Upsert the status of keyed emails; emails without a key are not tracked."""
+        rows = [
+            (key, category, ", ".join(params.get("to") or []), status, provider_id, error)
+            for key, params, status, provider_id, error in records
+            if key
+        ]
+        if not rows:
+            return
+        try:
+            with get_norma_reconstructor().get_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO email_deliveries
+                            (idempotency_key, category, recipient, status, provider_message_id, last_error)
+                        VALUES %s
+                        ON CONFLICT (idempotency_key) DO UPDATE SET
+                            status = EXCLUDED.status,
+                            provider_message_id = COALESCE(EXCLUDED.provider_message_id, email_deliveries.provider_message_id),
+                            last_error = EXCLUDED.last_error,
+                            attempts = email_deliveries.attempts + 1,
+                            updated_at = now()
+                        """,
+                        rows
+                    )
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Could not store delivery status for {len(rows)} {category} emails: {str(e)}")
+
+    def _count(self, category: str, **increments: int):
+        with self._metrics_lock:
+            counters = self._metrics.setdefault(
+                category, {"sent": 0, "failed": 0, "skipped": 0, "requests": 0, "retries": 0}
+            )
+            for name, value in increments.items():
+                counters[name] += value
+
+
+_dispatcher_instance = None
+
+
+def get_email_dispatcher() -> EmailDispatcher:
+    """
+    Get a singleton instance of the EmailDispatcher.
+
+    Its rate limiter is per process, so the account rate is split evenly
+    between the processes that send email.
+    """
+    global _dispatcher_instance
+    if _dispatcher_instance is None:
+        processes = settings.EMAIL_SENDER_PROCESSES or settings.JOB_WORKERS + 1
+        _dispatcher_instance = EmailDispatcher(
+            requests_per_second=settings.EMAIL_REQUESTS_PER_SECOND / processes,
+            max_concurrency=settings.EMAIL_MAX_CONCURRENCY
+        )
+    return _dispatcher_instance
@@ -0,0 +1,81 @@
+"""Helpers for packing several items into one LLM prompt and splitting the answer."""
+
+import json
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def pack_batches(
+    items: List[T],
+    size_of: Callable[[T], int],
+    max_chars: int,
+    max_items: int
+) -> List[List[T]]:
+    """
+    Greedily pack ``items`` into batches of at most ``max_items`` whose total
+    size stays under ``max_chars``. An item larger than the budget gets a
+    batch of its own. Order is preserved.
+    """
+    batches: List[List[T]] = []
+    current: List[T] = []
+    current_size = 0
+
+    for item in items:
+        size = size_of(item)
+        if current and (current_size + size > max_chars or len(current) >= max_items):
+            batches.append(current)
+            current, current_size = [], 0
+        current.append(item)
+        current_size += size
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_llm_json(response: str) -> Any:
+    """Parse a JSON answer, tolerating a surrounding ```json code fence."""
+    cleaned = response.strip()
+    if cleaned.startswith('```json'):
+        cleaned = cleaned[7:]
+    elif cleaned.startswith('```'):
+        cleaned = cleaned[3:]
+    if cleaned.endswith('```'):
+        cleaned = cleaned[:-3]
+    return json.loads(cleaned.strip())
+
+
+def split_batch_response(
+    response: str,
+    expected_ids: List[int],
+    validate: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]],
+    id_field: str = "infoleg_id"
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Split a JSON array answer into ``{id: item}`` for the expected ids.
+
+    ``validate`` returns the normalized item or None if it is unusable.
+    Items with unknown, duplicate or invalid entries are dropped, so the
+    caller can fall back to single-item calls for whatever is missing.
+    Raises ValueError if the answer is not a JSON array.
+    """
+    data = parse_llm_json(response)
+    if not isinstance(data, list):
+        raise ValueError("Batch response should be a JSON array")
+
+    expected = set(expected_ids)
+    results: Dict[int, Dict[str, Any]] = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            item_id = int(item.get(id_field))
+        except (TypeError, ValueError):
+            continue
+        if item_id not in expected or item_id in results:
+            continue
+        validated = validate(item)
+        if validated is not None:
+            results[item_id] = validated
+    return results
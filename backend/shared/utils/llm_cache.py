@@ -0,0 +1,193 @@
+"""Persistent, content-addressed cache for per-norma LLM results."""
+
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from psycopg2.extras import Json, execute_values
+
+from shared.utils.norma_reconstruction import get_norma_reconstructor
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+
+def content_hash(*parts: Optional[str]) -> str:
+    """SHA-256 of the norma content a prompt was built from."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update((part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+def truncated_version(prompt_version: str, max_chars: Optional[int]) -> str:
+    """
+    Prompt version for results produced from norma content truncated to ``max_chars``.
+
+    Batched prompts truncate each norma harder than single-norma ones; the
+    marker keeps those results apart from the ones built from the full
+    content under the same hash, and changing the limit invalidates them.
+    """
+    if max_chars is None:
+        return prompt_version
+    return f"{prompt_version}+truncated:{max_chars}"
+
+
+def describe_model(ai_service, route_class: str = "fast") -> str:
+    """
+    Best-effort model identifier for an AI service, used as part of the cache key.
+
+    For a provider router, the backends serving ``route_class`` (cached
+    results come from reformulation and digest calls, the "fast" class).
+    """
+    model_name_for = getattr(ai_service, "model_name_for", None)
+    if callable(model_name_for):
+        return model_name_for(route_class)
+    model = getattr(ai_service, "model", None)
+    return (
+        getattr(ai_service, "model_name", None)
+        or getattr(model, "model_name", None)
+        or (model if isinstance(model, str) else None)
+        or type(ai_service).__name__
+    )
+
+
+class LLMResultCache:
+    """
+    LLM results keyed by (infoleg_id, content hash, prompt version, model).
+
+    Used by the daily and weekly digests so a norma is only sent to the LLM
+    again when its content, the prompt or the model changes. Entries not
+    read for ``retention_days`` are purged.
+    """
+
+    def __init__(self, retention_days: int):
+        self.retention_days = retention_days
+        self._table_ready = False
+
+    def _ensure_table(self, cur):
+        if self._table_ready:
+            return
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS llm_result_cache (
+                infoleg_id INTEGER NOT NULL,
+                content_hash CHAR(64) NOT NULL,
+                prompt_version VARCHAR(100) NOT NULL,
+                model VARCHAR(100) NOT NULL,
+                result JSONB NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                last_used_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (infoleg_id, content_hash, prompt_version, model)
+            )
+        """)
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_result_cache_last_used ON llm_result_cache (last_used_at)"
+        )
+        self._table_ready = True
+
+    def get_many(
+        self,
+        prompt_version: str,
+        model: str,
+        keys: List[Tuple[int, str]]
+    ) -> Dict[Tuple[int, str], Any]:
+        """Look up ``(infoleg_id, content_hash)`` keys; returns the hits and marks them as used."""
+        if not keys:
+            return {}
+        try:
+            with get_norma_reconstructor().get_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute(
+                        """
+                        UPDATE llm_result_cache c SET last_used_at = now()
+                        FROM unnest(%s::int[], %s::text[]) AS k(infoleg_id, content_hash)
+                        WHERE c.infoleg_id = k.infoleg_id
+                          AND c.content_hash = k.content_hash
+                          AND c.prompt_version = %s
+                          AND c.model = %s
+                        RETURNING c.infoleg_id, c.content_hash, c.result
+                        """,
+                        ([key[0] for key in keys], [key[1] for key in keys], prompt_version, model)
+                    )
+                    rows = cur.fetchall()
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"LLM result cache lookup failed, treating as miss: {str(e)}")
+            return {}
+
+        hits = {(row[0], row[1].strip()): row[2] for row in rows}
+        logger.info(f"LLM result cache ({prompt_version}): {len(hits)}/{len(keys)} hits")
+        return hits
+
+    def get_first_many(
+        self,
+        prompt_versions: List[str],
+        model: str,
+        keys: List[Tuple[int, str]]
+    ) -> Dict[Tuple[int, str], Any]:
+        """``get_many`` over several prompt versions in order of preference; each key keeps its first hit."""
+        hits: Dict[Tuple[int, str], Any] = {}
+        for prompt_version in prompt_versions:
+            remaining = [key for key in keys if key not in hits]
+            if not remaining:
+                break
+            hits.update(self.get_many(prompt_version, model, remaining))
+        return hits
+
+    def put_many(self, prompt_version: str, model: str, entries: List[Tuple[int, str, Any]]):
+        """Store ``(infoleg_id, content_hash, result)`` entries, replacing existing ones."""
+        if not entries:
+            return
+        try:
+            with get_norma_reconstructor().get_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    execute_values(
+                        cur,
+                        """
+                        INSERT INTO llm_result_cache (infoleg_id, content_hash, prompt_version, model, result)
+                        VALUES %s
+                        ON CONFLICT (infoleg_id, content_hash, prompt_version, model)
+                        DO UPDATE SET result = EXCLUDED.result, last_used_at = now()
+                        """,
+                        [
+                            (infoleg_id, hash_, prompt_version, model, Json(result))
+                            for infoleg_id, hash_, result in entries
+                        ]
+                    )
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not store {len(entries)} LLM results in cache: {str(e)}")
+
+    def purge_expired(self) -> int:
+        """Delete entries not used within the retention window. Returns the number removed."""
+        try:
+            with get_norma_reconstructor().get_connection() as conn:
+                with conn.cursor() as cur:
+                    self._ensure_table(cur)
+                    cur.execute(
+                        "DELETE FROM llm_result_cache WHERE last_used_at < now() - make_interval(days => %s)",
+                        (self.retention_days,)
+                    )
+                    deleted = cur.rowcount
+                conn.commit()
+        except Exception as e:
+            logger.warning(f"Could not purge LLM result cache: {str(e)}")
+            return 0
+
+        if deleted:
+            logger.info(f"Purged {deleted} LLM cache entries unused for {self.retention_days} days")
+        return deleted
+
+
+_cache_instance = None
+
+
+def get_llm_result_cache() -> LLMResultCache:
+    """Get a singleton instance of the LLMResultCache."""
+    global _cache_instance
+    if _cache_instance is None:
+        _cache_instance = LLMResultCache(retention_days=settings.LLM_CACHE_RETENTION_DAYS)
+    return _cache_instance
@@ -0,0 +1,251 @@
+"""Shared scheduler for batch LLM calls (digests, analyses)."""
+
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple, TypeVar
+
+from core.config.config import settings
+from core.utils.logging_config import get_logger
+from shared.utils.token_counting import count_tokens
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Lower value = dispatched first
+PRIORITY_HIGH = 0      # Hero section, Leyes and Decretos
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+_RATE_LIMIT_MARKERS = ("429", "resource exhausted", "resourceexhausted", "quota", "rate limit", "too many requests")
+_RETRY_DELAY_PATTERN = re.compile(r"retry[_ ]?(?:delay|after)\D{0,20}(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+class LLMRateLimitError(Exception):
+    """The provider rejected the request because of its rate limit / quota."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an exception raised by a provider SDK is a 429 / quota error."""
+    if isinstance(error, LLMRateLimitError):
+        return True
+    if getattr(error, "code", None) == 429 or getattr(error, "status_code", None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _RATE_LIMIT_MARKERS)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after:
+        return float(retry_after)
+    match = _RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+
+def estimate_tokens(*texts: str) -> int:
+    """Token estimate for quota accounting (see shared.utils.token_counting)."""
+    return sum(count_tokens(text) for text in texts if text)
+
+
+async def gather_cancel_on_error(*coroutines: Awaitable[T]) -> List[T]:
+    """Like asyncio.gather, but cancels the remaining calls as soon as one fails."""
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class TokenBucket:
+    """Continuously refilled token bucket; capacity is the per-minute quota, so bursts are allowed."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until ``amount`` tokens are available (0 if they are now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMScheduler:
+    """
+    Process-wide scheduler for LLM requests.
+
+    Every call goes through ``run``/``complete``, which wait for:
+      - a free concurrency slot (``max_concurrency`` calls in flight at most),
+      - a request from the requests/minute bucket,
+      - the estimated prompt + output tokens from the tokens/minute bucket.
+
+    Waiting calls are dispatched by priority, then FIFO, so with a saturated
+    quota the important normas are analyzed first. When the provider answers
+    429 the whole scheduler pauses for the advertised retry delay (or an
+    exponential backoff) and the call is retried.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_concurrency: int,
+        max_retries: int = 4,
+        backoff_base_seconds: float = 5.0
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+
+        self._waiting: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[T]],
+        priority: int = PRIORITY_NORMAL,
+        estimated_tokens: int = 0
+    ) -> T:
+        """Run ``call`` once the quota allows it, retrying on rate-limit errors."""
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority, estimated_tokens)
+            try:
+                return await call()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_rate_limit_error(e):
+                    raise
+                delay = _retry_after(e) or self.backoff_base_seconds * (2 ** attempt)
+                delay += random.uniform(0, delay * 0.1)
+                self._pause(delay)
+                logger.warning(f"LLM rate limited (attempt {attempt + 1}), pausing scheduler for {delay:.1f}s")
+            finally:
+                self._release()
+
+    async def complete(
+        self,
+        ai_service,
+        messages: List[Any],
+        system_prompt: str,
+        priority: int = PRIORITY_NORMAL,
+        expected_output_tokens: int = 500,
+        route_class: str = "fast"
+    ) -> str:
+        """
+        Stream a completion through ``ai_service`` under the scheduler and return the full text.
+
+        Batch analyses default to the provider router's "fast" routing class.
+        """
+
+        async def _call() -> str:
+            chunks = []
+            async for chunk in ai_service.generate_stream(messages, system_prompt, route_class=route_class):
+                chunks.append(chunk)
+            response = "".join(chunks)
+            # Providers report streaming failures in-band as an "Error: ..." text
+            if response.startswith("Error:") and is_rate_limit_error(Exception(response)):
+                raise LLMRateLimitError(response, _retry_after(Exception(response)))
+            return response
+
+        estimated = estimate_tokens(system_prompt, *(m.content for m in messages)) + expected_output_tokens
+        return await self.run(_call, priority=priority, estimated_tokens=estimated)
+
+    async def _acquire(self, priority: int, estimated_tokens: int):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # Jobs run each in their own event loop; waiters of a finished loop are gone,
+            # but the buckets keep their state so the quota carries over
+            self._loop = loop
+            self._waiting = []
+            self._in_flight = 0
+            self._wakeup = None
+
+        future = loop.create_future()
+        heapq.heappush(self._waiting, (priority, next(self._sequence), estimated_tokens, future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted right before cancellation; give it back
+                self._release()
+            raise
+
+    def _release(self):
+        self._in_flight = max(0, self._in_flight - 1)
+        self._dispatch()
+
+    def _pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _dispatch(self):
+        """Grant slots to waiting calls in priority order while the quota allows it."""
+        if self._wakeup is not None:
+            self._wakeup.cancel()
+            self._wakeup = None
+
+        while self._waiting and self._in_flight < self.max_concurrency:
+            _, _, estimated_tokens, future = self._waiting[0]
+            if future.cancelled():
+                heapq.heappop(self._waiting)
+                continue
+
+            now = time.monotonic()
+            wait = max(
+                self._paused_until - now,
+                self.requests.wait_time(1, now),
+                self.tokens.wait_time(estimated_tokens, now)
+            )
+            if wait > 0:
+                self._wakeup = self._loop.call_later(wait, self._dispatch)
+                return
+
+            heapq.heappop(self._waiting)
+            self.requests.take(1, now)
+            self.tokens.take(estimated_tokens, now)
+            self._in_flight += 1
+            future.set_result(None)
+
+
+_scheduler_instance = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    """Get a singleton instance of the LLMScheduler."""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = LLMScheduler(
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY
+        )
+    return _scheduler_instance
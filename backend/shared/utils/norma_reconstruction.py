@@ -646,6 +646,182 @@ class NormaReconstructor:
             logger.error(f"Unexpected error during materialized view refresh: {str(e)}")
             raise
 
+    def _ensure_stats_table(self, cur):
+        """Create the normas_stats_summary table if it does not exist yet."""
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS normas_stats_summary (
+                dimension VARCHAR(50) NOT NULL,
+                value VARCHAR(255) NOT NULL,
+                count BIGINT NOT NULL DEFAULT 0,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                PRIMARY KEY (dimension, value)
+            )
+        """)
+
+    def refresh_normas_stats(self, full: bool = False, full_rebuild_days: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Bring the normas_stats_summary table up to date after batch inserts.
+
+        By default only the normas ingested since the last watermark (highest
+        normas_structured.id already counted) are aggregated and added to the
+        existing counters, so the daily batch rarely rescans the big tables.
+        The delta cannot see changes to already counted normas (a new estado)
+        or deletions, so a full rebuild is done when ``full`` is set, the
+        table is empty, or the last rebuild is older than
+        ``full_rebuild_days`` (NORMAS_STATS_FULL_REBUILD_DAYS by default).
+        """
+        if full_rebuild_days is None:
+            full_rebuild_days = settings.NORMAS_STATS_FULL_REBUILD_DAYS
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                    self._ensure_stats_table(cur)
+
+                    # Lock the watermark rows so concurrent refreshes serialize
+                    cur.execute("""
+                        SELECT value, count FROM normas_stats_summary
+                        WHERE dimension = 'watermark'
+                        FOR UPDATE
+                    """)
+                    watermarks = {row['value']: row['count'] for row in cur.fetchall()}
+                    watermark = watermarks.get('norma_id')
+                    # Epoch seconds of the last full rebuild
+                    rebuilt_at = watermarks.get('full_rebuild_at')
+
+                    cur.execute("""
+                        SELECT COALESCE(MAX(id), 0) AS max_id, EXTRACT(EPOCH FROM now())::bigint AS now
+                        FROM normas_structured
+                    """)
+                    row = cur.fetchone()
+                    max_id = row['max_id']
+                    rebuild_due = bool(full_rebuild_days) and (
+                        rebuilt_at is None or row['now'] - rebuilt_at >= full_rebuild_days * 86400
+                    )
+
+                    if full or watermark is None or rebuild_due:
+                        logger.info("Rebuilding normas statistics summary...")
+                        cur.execute("DELETE FROM normas_stats_summary")
+                        cur.execute("""
+                            INSERT INTO normas_stats_summary (dimension, value, count)
+                            SELECT 'totals', 'normas', COUNT(*) FROM normas_structured WHERE id <= %(max_id)s
+                            UNION ALL
+                            SELECT 'totals', 'divisions', COUNT(*) FROM divisions
+                            UNION ALL
+                            SELECT 'totals', 'articles', COUNT(*) FROM articles
+                            UNION ALL
+                            SELECT 'jurisdiccion', jurisdiccion, COUNT(*) FROM normas_structured
+                            WHERE jurisdiccion IS NOT NULL AND id <= %(max_id)s GROUP BY jurisdiccion
+                            UNION ALL
+                            SELECT 'tipo_norma', tipo_norma, COUNT(*) FROM normas_structured
+                            WHERE tipo_norma IS NOT NULL AND id <= %(max_id)s GROUP BY tipo_norma
+                            UNION ALL
+                            SELECT 'estado', estado, COUNT(*) FROM normas_structured
+                            WHERE estado IS NOT NULL AND id <= %(max_id)s GROUP BY estado
+                            UNION ALL
+                            SELECT 'watermark', 'norma_id', %(max_id)s
+                            UNION ALL
+                            SELECT 'watermark', 'full_rebuild_at', EXTRACT(EPOCH FROM now())::bigint
+                        """, {'max_id': max_id})
+                        mode = 'full'
+                        applied = max_id
+                    elif max_id > watermark:
+                        logger.info(f"Applying normas statistics delta for ids ({watermark}, {max_id}]")
+                        cur.execute("""
+                            WITH new_normas AS (
+                                SELECT id, jurisdiccion, tipo_norma, estado
+                                FROM normas_structured
+                                WHERE id > %(watermark)s AND id <= %(max_id)s
+                            ),
+                            new_divisions AS (
+                                SELECT d.id FROM divisions d
+                                JOIN new_normas n ON d.norma_id = n.id
+                            )
+                            INSERT INTO normas_stats_summary (dimension, value, count)
+                            SELECT 'totals', 'normas', COUNT(*) FROM new_normas
+                            UNION ALL
+                            SELECT 'totals', 'divisions', COUNT(*) FROM new_divisions
+                            UNION ALL
+                            SELECT 'totals', 'articles', COUNT(*) FROM articles a
+                            JOIN new_divisions d ON a.division_id = d.id
+                            UNION ALL
+                            SELECT 'jurisdiccion', jurisdiccion, COUNT(*) FROM new_normas
+                            WHERE jurisdiccion IS NOT NULL GROUP BY jurisdiccion
+                            UNION ALL
+                            SELECT 'tipo_norma', tipo_norma, COUNT(*) FROM new_normas
+                            WHERE tipo_norma IS NOT NULL GROUP BY tipo_norma
+                            UNION ALL
+                            SELECT 'estado', estado, COUNT(*) FROM new_normas
+                            WHERE estado IS NOT NULL GROUP BY estado
+                            ON CONFLICT (dimension, value) DO UPDATE
+                            SET count = normas_stats_summary.count + EXCLUDED.count,
+                                updated_at = now()
+                        """, {'watermark': watermark, 'max_id': max_id})
+                        cur.execute("""
+                            UPDATE normas_stats_summary SET count = %s, updated_at = now()
+                            WHERE dimension = 'watermark' AND value = 'norma_id'
+                        """, (max_id,))
+                        mode = 'delta'
+                        applied = max_id - watermark
+                    else:
+                        mode = 'noop'
+                        applied = 0
+
+                    conn.commit()
+                    logger.info(f"Normas statistics refreshed (mode={mode}, ids={applied})")
+                    return {'mode': mode, 'watermark': max_id}
+
+        except psycopg2.Error as e:
+            logger.error(f"Database error during normas statistics refresh: {str(e)}")
+            raise
+        except Exception as e:
+            logger.error(f"Unexpected error during normas statistics refresh: {str(e)}")
+            raise
+
+    def get_normas_stats_summary(self) -> Optional[Dict[str, Any]]:
+        """
+        Read the precomputed normas statistics.
+
+        Returns None when the summary table has not been built yet. Read
+        only: the table is created by ``refresh_normas_stats`` (run by the
+        daily batch, or once by scripts/build-normas-stats-summary.py).
+        """
+        with self.get_connection() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                try:
+                    cur.execute("""
+                        SELECT dimension, value, count, updated_at
+                        FROM normas_stats_summary
+                        ORDER BY dimension, count DESC
+                    """)
+                except psycopg2.errors.UndefinedTable:
+                    return None
+                rows = cur.fetchall()
+
+        if not rows:
+            return None
+
+        summary = {
+            'total_normas': 0,
+            'total_divisions': 0,
+            'total_articles': 0,
+            'normas_by_jurisdiction': {},
+            'normas_by_type': {},
+            'normas_by_status': {},
+            'updated_at': max(row['updated_at'] for row in rows),
+        }
+        grouped = {
+            'jurisdiccion': summary['normas_by_jurisdiction'],
+            'tipo_norma': summary['normas_by_type'],
+            'estado': summary['normas_by_status'],
+        }
+        for row in rows:
+            if row['dimension'] == 'totals':
+                summary[f"total_{row['value']}"] = row['count']
+            elif row['dimension'] in grouped and row['count'] > 0:
+                grouped[row['dimension']][row['value']] = row['count']
+
+        return summary
+
 
 # Convenience functions for quick access without needing to instantiate the class
 _reconstructor_instance = None
@@ -0,0 +1,47 @@
+"""Local token counting, used when the provider does not report usage."""
+
+import re
+import threading
+from typing import Dict
+
+# Approximates the provider's subword tokenizer on Spanish text: letters are
+# split into pieces of up to 6 characters (most common words are one token),
+# every digit and every punctuation mark counts on its own, whitespace is free
+_PIECE_PATTERN = re.compile(r"[^\W\d_]{1,6}|\d|[^\w\s]|_")
+
+# Prompt segments that are identical on every call (system prompts,
+# instruction blocks) and their precomputed counts
+_MAX_STATIC_SEGMENTS = 64
+_static_segments: Dict[str, int] = {}
+_static_lock = threading.Lock()
+
+
+def _count_pieces(text: str) -> int:
+    return len(_PIECE_PATTERN.findall(text))
+
+
+def static_segment(text: str) -> str:
+    """
+    Register ``text`` as a static prompt segment and return it unchanged.
+
+    ``count_tokens`` answers a registered segment, or any text starting with
+    one, from the precomputed count instead of tokenizing it again.
+    """
+    if text and text not in _static_segments:
+        with _static_lock:
+            if len(_static_segments) < _MAX_STATIC_SEGMENTS:
+                _static_segments[text] = _count_pieces(text)
+    return text
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count of ``text``."""
+    if not text:
+        return 0
+    count = _static_segments.get(text)
+    if count is not None:
+        return count
+    for segment, segment_count in list(_static_segments.items()):
+        if text.startswith(segment):
+            return segment_count + _count_pieces(text[len(segment):])
+    return _count_pieces(text)